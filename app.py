@@ -5,24 +5,34 @@ Chạy server API hệ thống chấm điểm tài chính
 
 import sys
 import os
+import argparse
 from datetime import datetime
 
 # Add src to path để import modules
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.api.scoring_api import FinancialScoringAPI
+from src.api.server import run_production, serving_config_from_env
 
 
-def print_startup_banner():
-    """In banner khởi động server"""
+def print_startup_banner(mode='development', host='0.0.0.0', port=5000):
+    """In banner khởi động server với địa chỉ thực sự được bind"""
     print("🚀 FINANCIAL SCORING API SERVER v2.0")
     print("=" * 50)
-    print("📡 Starting server...")
+    print(f"📡 Starting server ({mode})...")
     print("Available endpoints:")
     print("  POST /process-groups - Calculate weighted group scores for multiple companies")
+    print("  POST /process-groups/stream - Streaming NDJSON scoring (requires calibration)")
+    print("  GET  /scores/<taxcode>[/<year>], /scores?keys=... - Stored result lookups (SCORING_RESULT_STORE)")
+    print("  GET  /peers/<taxcode>/<year>, /peers/top?... - Sector/year peer ranking (SCORING_RESULT_STORE)")
     print("  GET  /health - Health check")
+    print("  GET  /health/live, /health/ready - Liveness / readiness probes")
+    print("  GET  /metrics - Prometheus metrics")
     print()
-    print("🌐 Server running at: http://localhost:5000")
+    # Bind mọi interface -> hiển thị localhost để mở được trên máy chạy server
+    display_host = 'localhost' if host in ('0.0.0.0', '::', '') else host
+    bind_note = f" (bind {host or '0.0.0.0'})" if display_host != host else ""
+    print(f"🌐 Server running at: http://{display_host}:{port}{bind_note}")
     print("📖 API Documentation: ./API_DOCUMENTATION.md")
     print()
     print("ℹ️  API now accepts numeric values and calculates weighted scores.")
@@ -33,15 +43,47 @@ def print_startup_banner():
     print("=" * 50)
 
 
+def parse_args(argv=None):
+    """Tham số dòng lệnh; mặc định lấy từ biến môi trường SCORING_*"""
+    config = serving_config_from_env()
+    parser = argparse.ArgumentParser(description="Financial Scoring API server")
+    parser.add_argument('--production', action='store_true',
+                        default=os.environ.get('SCORING_SERVER_MODE') == 'production',
+                        help="Chạy gunicorn pre-fork nhiều worker thay cho dev server")
+    parser.add_argument('--host', default=config['host'])
+    parser.add_argument('--port', type=int, default=config['port'])
+    parser.add_argument('--workers', type=int, default=config['workers'])
+    parser.add_argument('--threads', type=int, default=config['threads'])
+    parser.add_argument('--timeout', type=int, default=config['timeout'])
+    return parser.parse_args(argv)
+
+
 def main():
     """Main function để chạy Flask server"""
     try:
+        args = parse_args()
+
         # Print startup information
-        print_startup_banner()
+        print_startup_banner('production' if args.production else 'development', args.host, args.port)
         
         # Tạo và chạy API server
-        api = FinancialScoringAPI()
-        api.run(host='0.0.0.0', port=5000, debug=True)
+        # Calibration cố định (tùy chọn), tạo bằng FinancialScoringSystem.build_calibration
+        calibration_path = os.environ.get('SCORING_CALIBRATION_PATH')
+        api = FinancialScoringAPI(
+            calibration_path=calibration_path,
+            micro_batch=os.environ.get('SCORING_MICRO_BATCH', '0') == '1',
+            batch_window_ms=float(os.environ.get('SCORING_BATCH_WINDOW_MS', '2')),
+            batch_max_companies=int(os.environ.get('SCORING_BATCH_MAX_COMPANIES', '1024')),
+            server_timing=os.environ.get('SCORING_SERVER_TIMING', '0') == '1',
+            # Kho kết quả SQLite (tùy chọn), ghi bằng FinancialScoringSystem.save_results_store
+            result_store_path=os.environ.get('SCORING_RESULT_STORE')
+        )
+
+        if args.production:
+            # Trạng thái đã tải ở trên được chia sẻ copy-on-write giữa các worker
+            run_production(api, args.host, args.port, args.workers, args.threads, args.timeout)
+        else:
+            api.run(host=args.host, port=args.port, debug=True)
         
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
@@ -0,0 +1,71 @@
+"""
+Import-time benchmark cho entry point phục vụ API (app.py)
+Đo thời gian import trong một tiến trình mới và thất bại (exit code 1) nếu
+các thư viện vẽ, kiểm định thống kê hoặc ML bị kéo vào đường phục vụ.
+
+Chạy từ thư mục gốc:
+    python benchmarks/import_time.py [--max-ms 1500] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Các module không được phép xuất hiện khi chỉ import entry point phục vụ
+FORBIDDEN_MODULES = ['scipy', 'sklearn', 'matplotlib', 'seaborn']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"elapsed_ms": elapsed_ms, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure_once():
+    """Import app trong tiến trình Python mới, trả về (thời gian ms, danh sách module)."""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result['elapsed_ms'], result['modules']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time benchmark for app.py")
+    parser.add_argument('--max-ms', type=float, default=None, help="Ngưỡng thời gian import tối đa (ms)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    timings = []
+    modules = []
+    for _ in range(args.repeat):
+        elapsed_ms, modules = measure_once()
+        timings.append(elapsed_ms)
+
+    best_ms = min(timings)
+    print(f"import app: best {best_ms:.1f} ms over {args.repeat} runs ({len(modules)} modules)")
+
+    failed = False
+    leaked = sorted({m.split('.')[0] for m in modules} & set(FORBIDDEN_MODULES))
+    if leaked:
+        print(f"❌ Serving entry point imports heavy dependencies: {', '.join(leaked)}")
+        failed = True
+
+    if args.max_ms is not None and best_ms > args.max_ms:
+        print(f"❌ Import time {best_ms:.1f} ms exceeds budget {args.max_ms:.1f} ms")
+        failed = True
+
+    if not failed:
+        print("✅ Import-time check passed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
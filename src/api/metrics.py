@@ -0,0 +1,133 @@
+"""
+Đo đạc hiệu năng cho Financial Scoring API
+Thời gian từng giai đoạn, phân bố kích thước lô, số dòng và số lỗi,
+xuất ra định dạng text của Prometheus tại /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """Histogram tích lũy theo các bucket cố định (kiểu Prometheus)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class ScoringMetrics:
+    """
+    Bộ đếm và histogram thread-safe cho một tiến trình worker.
+    Với nhiều worker, mỗi worker có số liệu riêng (Prometheus cộng dồn theo instance).
+    """
+
+    STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    BATCH_BUCKETS = (1, 2, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = {}
+        self.batch_size = {}
+        self.requests_total = {}
+        self.rows_total = {}
+        self.errors_total = {}
+        self.last_rows_per_second = {}
+
+    @contextmanager
+    def stage(self, name, timings=None):
+        """
+        Đo thời gian một giai đoạn xử lý.
+        Nếu truyền timings (dict), thời gian (ms) cũng được cộng vào đó để tạo header Server-Timing.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                histogram = self.stage_seconds.get(name)
+                if histogram is None:
+                    histogram = self.stage_seconds[name] = Histogram(self.STAGE_BUCKETS)
+                histogram.observe(elapsed)
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + elapsed * 1000
+
+    def observe_batch(self, endpoint, n_rows, elapsed_seconds=None):
+        """Ghi nhận một request đã chấm xong n_rows công ty."""
+        with self._lock:
+            histogram = self.batch_size.get(endpoint)
+            if histogram is None:
+                histogram = self.batch_size[endpoint] = Histogram(self.BATCH_BUCKETS)
+            histogram.observe(n_rows)
+            self.requests_total[endpoint] = self.requests_total.get(endpoint, 0) + 1
+            self.rows_total[endpoint] = self.rows_total.get(endpoint, 0) + n_rows
+            if elapsed_seconds:
+                self.last_rows_per_second[endpoint] = n_rows / elapsed_seconds
+
+    def record_error(self, endpoint, kind):
+        """Đếm lỗi theo endpoint và loại lỗi (ví dụ 'invalid_input', 'internal')."""
+        key = (endpoint, kind)
+        with self._lock:
+            self.errors_total[key] = self.errors_total.get(key, 0) + 1
+
+    def render(self):
+        """Xuất toàn bộ số liệu theo định dạng text của Prometheus."""
+        lines = []
+        with self._lock:
+            lines.append("# HELP scoring_stage_seconds Time spent in each scoring stage")
+            lines.append("# TYPE scoring_stage_seconds histogram")
+            for stage, histogram in sorted(self.stage_seconds.items()):
+                lines.extend(_histogram_lines("scoring_stage_seconds", f'stage="{stage}"', histogram))
+
+            lines.append("# HELP scoring_batch_size Number of companies per request")
+            lines.append("# TYPE scoring_batch_size histogram")
+            for endpoint, histogram in sorted(self.batch_size.items()):
+                lines.extend(_histogram_lines("scoring_batch_size", f'endpoint="{endpoint}"', histogram))
+
+            lines.append("# HELP scoring_requests_total Successfully scored requests")
+            lines.append("# TYPE scoring_requests_total counter")
+            for endpoint, value in sorted(self.requests_total.items()):
+                lines.append(f'scoring_requests_total{{endpoint="{endpoint}"}} {value}')
+
+            lines.append("# HELP scoring_rows_total Companies scored")
+            lines.append("# TYPE scoring_rows_total counter")
+            for endpoint, value in sorted(self.rows_total.items()):
+                lines.append(f'scoring_rows_total{{endpoint="{endpoint}"}} {value}')
+
+            lines.append("# HELP scoring_rows_per_second Throughput of the most recent request")
+            lines.append("# TYPE scoring_rows_per_second gauge")
+            for endpoint, value in sorted(self.last_rows_per_second.items()):
+                lines.append(f'scoring_rows_per_second{{endpoint="{endpoint}"}} {value:.6g}')
+
+            lines.append("# HELP scoring_errors_total Failed requests by kind")
+            lines.append("# TYPE scoring_errors_total counter")
+            for (endpoint, kind), value in sorted(self.errors_total.items()):
+                lines.append(f'scoring_errors_total{{endpoint="{endpoint}",kind="{kind}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {count}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.total:.6g}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+def server_timing_header(timings):
+    """Dựng giá trị header Server-Timing từ dict {stage: ms}."""
+    return ", ".join(f"{name};dur={ms:.3f}" for name, ms in timings.items())
@@ -0,0 +1,119 @@
+"""
+Micro-batching cho các request /process-groups nhỏ chạy đồng thời
+Gom các request đến trong một cửa sổ thời gian ngắn thành một lô để chấm điểm vector hóa.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Gom request theo cửa sổ thời gian (window_ms) hoặc theo số công ty (max_companies),
+    chấm điểm cả lô bằng một lần gọi score_fn rồi chia kết quả về cho từng request.
+
+    Chỉ đúng khi kết quả của mỗi công ty không phụ thuộc các công ty khác trong lô,
+    tức là khi dùng calibration cố định.
+    """
+
+    def __init__(self, score_fn, window_ms=2.0, max_companies=1024):
+        """
+        Parameters:
+            score_fn: hàm (values, weights, context) -> dict {column: ndarray theo hàng}
+            window_ms: thời gian chờ tối đa để gom thêm request (ms)
+            max_companies: số công ty tối đa trong một lô
+        """
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_companies = max_companies
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def _ensure_worker(self):
+        # Thread không tồn tại sau fork, nên khởi động theo từng tiến trình khi có request đầu tiên
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != pid or not self._worker.is_alive():
+                if self._worker_pid != pid:
+                    self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name="scoring-micro-batcher", daemon=True)
+                self._worker_pid = pid
+                self._worker.start()
+
+    def is_alive(self):
+        """Worker của tiến trình hiện tại đang chạy (khởi động nếu chưa có, ví dụ ngay sau fork)."""
+        try:
+            self._ensure_worker()
+        except RuntimeError:
+            # Không tạo được thread mới
+            return False
+        return self._worker.is_alive()
+
+    def submit(self, values, weights=None, context=None):
+        """
+        Gửi ma trận giá trị (rows × fields) của một request, chờ và trả về kết quả
+        dạng dict {column: ndarray} chỉ gồm các hàng của request đó.
+        context (ví dụ plan mà values được dựng theo) được truyền nguyên cho score_fn;
+        request khác context không bao giờ chung lô.
+        """
+        self._ensure_worker()
+        future = Future()
+        key = (json.dumps(weights, sort_keys=True) if weights else None, id(context))
+        self._queue.put((values, weights, key, future, context))
+        return future.result()
+
+    def _collect(self):
+        """Lấy request đầu tiên (chờ vô hạn), sau đó gom thêm đến hết cửa sổ hoặc đủ số công ty."""
+        pending = [self._queue.get()]
+        n_companies = len(pending[0][0])
+        deadline = time.monotonic() + self.window
+
+        while n_companies < self.max_companies:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            n_companies += len(item[0])
+
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+
+            # Các request có trọng số (hoặc context) khác nhau được chấm thành các lô riêng
+            by_key = {}
+            for item in pending:
+                by_key.setdefault(item[2], []).append(item)
+
+            for items in by_key.values():
+                self._score_batch(items)
+
+    def _score_batch(self, items):
+        try:
+            values = np.vstack([item[0] for item in items])
+            results = self.score_fn(values, items[0][1], items[0][4])
+        except Exception as e:
+            for item in items:
+                item[3].set_exception(e)
+            return
+
+        start = 0
+        for item in items:
+            stop = start + len(item[0])
+            item[3].set_result({col: codes[start:stop] for col, codes in results.items()})
+            start = stop
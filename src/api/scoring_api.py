@@ -3,23 +3,288 @@ API Service cho hệ thống chấm điểm tài chính v2.0
 Tính toán điểm nhóm dựa trên giá trị số và trọng số.
 """
 
+import importlib
+import json
+import threading
+import time
+
 import pandas as pd
 import numpy as np
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from werkzeug.exceptions import BadRequest
 
 # Import thuật toán tính điểm và các file cấu hình
-from field_score import field_score, assign_scores_field
-from config.field_mapping import FIELD_MAPPING
-from config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.binning import tscore_codes, tscore_labels
+from src.core.field_score import ScoringPlan, assign_scores_field, assign_scores_matrix, numeric_values
+from src.core.calibration import Calibration
+from src.core.peer_rank import PeerRankIndex
+from src.api.micro_batcher import MicroBatcher
+from src.core.correlation_weights import GroupCorrelationScorer
+from src.api.metrics import ScoringMetrics, server_timing_header
+from src.utils.result_store import ResultStore
+from src.config import field_mapping, good_bad_mapping
+
+
+class ScoringState:
+    """
+    Plan chấm điểm và bộ trọng số tương quan dựng từ cùng một cấu hình.
+    Không thay đổi sau khi tạo: reload_plan thay cả bộ bằng một phép gán, mỗi request lấy
+    self.state một lần nên không bao giờ thấy plan mới với scorer cũ (hoặc ngược lại).
+    """
+
+    __slots__ = ('plan', 'correlation_scorer')
+
+    def __init__(self, plan, correlation_scorer):
+        self.plan = plan
+        self.correlation_scorer = correlation_scorer
+
 
 class FinancialScoringAPI:
     """
     Flask API cho hệ thống chấm điểm tài chính.
     """
     
-    def __init__(self):
+    # Số công ty xử lý mỗi lần trong endpoint streaming
+    STREAM_CHUNK_SIZE = 5000
+    # Số khóa tối đa mỗi request tra cứu GET /scores?keys=...
+    LOOKUP_MAX_KEYS = 1000
+    # k tối đa của GET /peers/top
+    TOP_MAX_K = 1000
+
+    def __init__(self, calibration_path=None, micro_batch=False, batch_window_ms=2.0, batch_max_companies=1024,
+                 server_timing=False, correlation_threshold=0.9, weight_cache_size=256, result_store_path=None):
+        """
+        Parameters:
+            calibration_path: file calibration JSON (tùy chọn)
+            micro_batch: gom các request nhỏ đồng thời thành một lô (yêu cầu calibration)
+            batch_window_ms: thời gian chờ gom lô (ms)
+            batch_max_companies: số công ty tối đa mỗi lô
+            server_timing: thêm header Server-Timing với thời gian từng giai đoạn
+            correlation_threshold: ngưỡng |corr| mặc định khi request gửi 'correlation_matrices'
+            weight_cache_size: số ma trận tương quan giữ trong cache trọng số (LRU)
+            result_store_path: kho kết quả SQLite (ResultStore) phục vụ qua GET /scores (tùy chọn)
+        """
         self.app = Flask(__name__)
+        self.metrics = ScoringMetrics()
+        self.server_timing = server_timing
+        # Calibration cố định (nếu có) được tải một lần khi khởi động
+        self.calibration_path = calibration_path
+        self.calibration = Calibration.load(calibration_path) if calibration_path else None
+        # Plan chấm điểm biên dịch một lần, dùng chung cho mọi request, cùng hệ số trọng số suy ra
+        # từ ma trận tương quan (cache theo hash ma trận + ngưỡng)
+        self.correlation_threshold = correlation_threshold
+        self.weight_cache_size = weight_cache_size
+        self.state = self._compile_state()
+        # Kết quả batch đã lưu, tra cứu theo (taxcode, yearreport) ở chế độ chỉ đọc
+        self.result_store = ResultStore(result_store_path, readonly=True) if result_store_path else None
+        # Chỉ mục xếp hạng cùng ngành / năm dựng từ kho kết quả, dựng lại khi kho có thế hệ dữ liệu mới
+        self.peer_index = None
+        self._peer_generation = None
+        self._peer_lock = threading.Lock()
+        if self.result_store is not None:
+            self.reload_peer_index()
+
+        self.batcher = None
+        if micro_batch:
+            if self.calibration is None:
+                raise ValueError("micro_batch requires a calibration: results must not depend on batch composition")
+            self.batcher = MicroBatcher(self.score_values, batch_window_ms, batch_max_companies)
+
         self.setup_routes()
+
+    def readiness_checks(self):
+        """
+        Trạng thái các thành phần mà request phụ thuộc lúc chạy: {tên: bool}.
+        Plan và calibration được tải trong constructor (lỗi thì server không khởi động) nên không cần kiểm tra.
+        """
+        checks = {}
+        if self.batcher is not None:
+            checks['micro_batcher'] = self.batcher.is_alive()
+        if self.result_store is not None:
+            checks['result_store'] = self.result_store.is_reachable()
+        return checks
+
+    def is_ready(self):
+        """Sẵn sàng nhận request: worker micro-batch đang chạy và kho kết quả đọc được (nếu được cấu hình)."""
+        return all(self.readiness_checks().values())
+
+    @property
+    def plan(self):
+        return self.state.plan
+
+    @property
+    def correlation_scorer(self):
+        return self.state.correlation_scorer
+
+    def score_values(self, values, weights=None, state=None):
+        """
+        Chấm ma trận giá trị theo thứ tự plan.fields của state (mặc định state hiện tại),
+        trả về dict {<group>_TScore: mã T uint8}.
+        """
+        plan = (state or self.state).plan
+        return assign_scores_matrix(plan.score_matrix(values, weights), plan.groups, self.calibration)
+
+    def _compile_state(self):
+        plan = ScoringPlan.compile(field_mapping.FIELD_MAPPING, good_bad_mapping.GOOD_BAD_MAPPING)
+        correlation_scorer = GroupCorrelationScorer(
+            plan.group_field_mapping, self.correlation_threshold,
+            dict(zip(plan.fields, plan.default_weights)), self.weight_cache_size
+        )
+        return ScoringState(plan, correlation_scorer)
+
+    def reload_plan(self, reload_config=True):
+        """
+        Biên dịch lại ScoringPlan (sau khi cấu hình thay đổi) mà không cần khởi động lại server.
+        Plan và scorer mới được dựng xong rồi mới thay cả bộ bằng một phép gán,
+        nên các request đang chạy vẫn dùng trọn bộ cũ.
+        """
+        if reload_config:
+            importlib.reload(field_mapping)
+            importlib.reload(good_bad_mapping)
+        state = self._compile_state()
+        self.state = state
+        return state.plan
+
+    def reload_peer_index(self):
+        """Dựng lại PeerRankIndex từ kho kết quả (sau khi pipeline batch ghi kết quả mới)."""
+        # Đọc thế hệ trước dữ liệu: lần ghi xen giữa sẽ làm request sau dựng lại lần nữa
+        generation = self.result_store.generation()
+        groups = list(self.state.plan.group_field_mapping.keys())
+        columns = ['taxcode', 'yearreport', 'sector_unique_id']
+        columns += [f"{g}_Score" for g in groups if f"{g}_Score" in self.result_store.columns]
+        index = PeerRankIndex.from_field_scores(self.result_store.read_frame(columns), groups)
+        self.peer_index, self._peer_generation = index, generation
+        return index
+
+    def current_peer_index(self):
+        """
+        PeerRankIndex khớp với dữ liệu hiện tại của kho: dựng lại nếu pipeline batch đã ghi thêm
+        (mỗi worker tự phát hiện qua ResultStore.generation, không cần khởi động lại server).
+        """
+        if self.result_store.generation() != self._peer_generation:
+            with self._peer_lock:
+                if self.result_store.generation() != self._peer_generation:
+                    self.reload_peer_index()
+        return self.peer_index
+
+    def score_columnar(self, data, weights=None, timings=None, state=None):
+        """
+        Chấm điểm body dạng cột: mỗi chỉ số là một mảng giá trị theo thứ tự 'taxcodes'.
+        Dữ liệu đi thẳng vào ma trận float, không dựng dict cho từng công ty.
+
+        Body:
+        {
+            "taxcodes": ["0106512583", "0100109106"],
+            "indicators": {"STD_RTD92": [1.5, 1.8], "STD_RTD8": [0.15, null]}
+        }
+        """
+        taxcodes = data.get('taxcodes')
+        indicators = data.get('indicators')
+        if not isinstance(taxcodes, list) or not isinstance(indicators, dict):
+            raise ValueError("Columnar body requires 'taxcodes' (list) and 'indicators' (object)")
+
+        n_rows = len(taxcodes)
+        state = state or self.state
+        plan = state.plan
+        present = [f for f in plan.fields if f in indicators]
+
+        # null và giá trị không phải số -> NaN, như đường DataFrame
+        with self.metrics.stage('build', timings):
+            values = np.empty((n_rows, len(present)), dtype=float)
+            for k, field in enumerate(present):
+                column = indicators[field]
+                if not isinstance(column, list) or len(column) != n_rows:
+                    raise ValueError(f"Indicator '{field}' must be a list with {n_rows} values")
+                values[:, k] = numeric_values(column)
+
+        if self.batcher is not None:
+            full_values = np.full((n_rows, len(plan.fields)), np.nan)
+            full_values[:, [plan.field_index[f] for f in present]] = values
+            with self.metrics.stage('micro_batch', timings):
+                t_scores = self.batcher.submit(full_values, weights, state)
+        else:
+            with self.metrics.stage('field_score', timings):
+                group_scores = plan.score_matrix(values, weights, [plan.field_index[f] for f in present])
+            with self.metrics.stage('assign_scores_field', timings):
+                t_scores = assign_scores_matrix(group_scores, plan.groups, self.calibration)
+
+        response_data = {"taxcodes": taxcodes}
+        for col in ('sector_unique_id_raw', 'yearreport'):
+            if col in data:
+                response_data[col] = data[col]
+        # Mã T -> nhãn chỉ ở bước xuất JSON
+        response_data["scores"] = {col: tscore_labels(codes).tolist() for col, codes in t_scores.items()}
+        return response_data
+
+    def companies_to_matrix(self, companies, plan):
+        """
+        Ghi trực tiếp các bản ghi công ty (định dạng 'companies') vào ma trận theo thứ tự plan.fields.
+        Giá trị không phải số -> NaN như đường DataFrame, nên một giá trị lỗi không làm hỏng cả lô.
+        """
+        cells = {}
+        for row, company in enumerate(companies):
+            for indicators in company.get('scores', {}).values():
+                for indicator_data in indicators:
+                    col = plan.field_index.get(indicator_data.get('indicator'))
+                    value = indicator_data.get('value')
+                    if col is not None and value is not None:
+                        cells[row, col] = value
+
+        values = np.full((len(companies), len(plan.fields)), np.nan)
+        if cells:
+            rows, cols = zip(*cells)
+            values[rows, cols] = numeric_values(list(cells.values()))
+        return values
+
+    @staticmethod
+    def company_records(companies, t_scores):
+        """
+        Ghép T-score (dict {column: mã T uint8}) với thông tin định danh của từng công ty.
+        Mọi đường chấm (DataFrame, micro-batch, stream) trả về cùng dạng bản ghi này.
+        """
+        labels = {col: tscore_labels(codes).tolist() for col, codes in t_scores.items()}
+        records = []
+        for row, company in enumerate(companies):
+            record = {
+                'taxcode': company.get('taxcode'),
+                'sector_unique_id_raw': company.get('sector_unique_id_raw'),
+                'yearreport': company.get('yearreport')
+            }
+            for col, col_labels in labels.items():
+                record[col] = col_labels[row]
+            records.append(record)
+        return records
+
+    def score_stream(self, lines, weights=None, chunk_size=None):
+        """
+        Chấm điểm luồng NDJSON theo từng khối cố định với calibration cố định.
+        Mỗi dòng vào là một công ty (định dạng như phần tử của 'companies'),
+        mỗi dòng ra là kết quả T-score của công ty đó. Bộ nhớ chỉ phụ thuộc chunk_size.
+        """
+        chunk_size = chunk_size or self.STREAM_CHUNK_SIZE
+        plan = self.state.plan
+        calibration = self.calibration
+
+        def flush(chunk):
+            started = time.perf_counter()
+            with self.metrics.stage('stream_chunk'):
+                group_scores = plan.score_matrix(self.companies_to_matrix(chunk, plan), weights)
+                t_scores = assign_scores_matrix(group_scores, plan.groups, calibration)
+            self.metrics.observe_batch('process_groups_stream', len(chunk), time.perf_counter() - started)
+            for record in self.company_records(chunk, t_scores):
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+
+        chunk = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield from flush(chunk)
+                chunk = []
+        if chunk:
+            yield from flush(chunk)
         
     def setup_routes(self):
         """Thiết lập các route API"""
@@ -31,15 +296,17 @@ class FinancialScoringAPI:
             
             Request body:
             {
+                "partition_by": ["sector_unique_id_raw", "yearreport"],   (tùy chọn, chia bin theo ngành/năm)
                 "weights": {
                     "STD_RTD92": 1.0,
                     "STD_RTD93": 0.8,
                     ...
                 },
-                "correlation_matrices": {
-                    "Liquidity": [[1.0, 0.8], [0.8, 1.0]],
+                "correlation_matrices": {                                  (tùy chọn, chia trọng số trong cụm tương quan)
+                    "Liquidity": {"fields": ["STD_RTD92", "STD_RTD93"], "matrix": [[1.0, 0.95], [0.95, 1.0]]},
                     ...
                 },
+                "correlation_threshold": 0.9,                             (tùy chọn)
                 "companies": [
                     {
                         "taxcode": "0106512583",
@@ -57,67 +324,282 @@ class FinancialScoringAPI:
                 ]
             }
             """
+            endpoint = 'process_groups'
+            timings = g.stage_timings = {}
+            started = time.perf_counter()
             try:
-                data = request.get_json()
+                with self.metrics.stage('parse', timings):
+                    data = request.get_json()
                 if not data:
+                    self.metrics.record_error(endpoint, 'invalid_input')
                     return jsonify({"error": "No data provided"}), 400
 
+                # Plan và scorer của cả request lấy từ cùng một bộ (reload_plan có thể thay giữa chừng)
+                state = self.state
                 weights = data.get('weights')
-                # correlation_matrices = data.get('correlation_matrices') # Tạm thời chưa sử dụng
+                partition_by = data.get('partition_by')
+                if partition_by is not None and (
+                        not isinstance(partition_by, list) or
+                        not set(partition_by) <= {'sector_unique_id_raw', 'yearreport'}):
+                    raise ValueError("'partition_by' must be a list of 'sector_unique_id_raw' and/or 'yearreport'")
+                if partition_by and (self.calibration is not None or 'indicators' in data):
+                    raise ValueError("'partition_by' is only supported for 'companies' without a calibration")
+
+                # Trọng số điều chỉnh theo tương quan: hệ số của mỗi ma trận được cache
+                correlation_matrices = data.get('correlation_matrices')
+                if correlation_matrices:
+                    threshold = data.get('correlation_threshold')
+                    if threshold is not None and not isinstance(threshold, (int, float)):
+                        raise ValueError("'correlation_threshold' must be a number")
+                    with self.metrics.stage('correlation_weights', timings):
+                        weights = state.correlation_scorer.adjusted_weights(correlation_matrices, weights, threshold)
+
+                # Định dạng dạng cột: {"taxcodes": [...], "indicators": {...}}
+                if 'indicators' in data:
+                    response_data = self.score_columnar(data, weights, timings, state)
+                    with self.metrics.stage('serialize', timings):
+                        response = jsonify(response_data)
+                    self.metrics.observe_batch(endpoint, len(response_data['taxcodes']), time.perf_counter() - started)
+                    return response, 200
+
                 companies_data = data.get('companies', [])
 
                 if not companies_data:
+                    self.metrics.record_error(endpoint, 'invalid_input')
                     return jsonify({"error": "List of 'companies' is required"}), 400
 
+                # Chế độ micro-batching: gom với các request đồng thời khác
+                # (micro-batching luôn có calibration nên không kết hợp với partition_by)
+                if self.batcher is not None:
+                    with self.metrics.stage('build', timings):
+                        values = self.companies_to_matrix(companies_data, state.plan)
+                    with self.metrics.stage('micro_batch', timings):
+                        t_scores = self.batcher.submit(values, weights, state)
+                    with self.metrics.stage('serialize', timings):
+                        response = jsonify({"results": self.company_records(companies_data, t_scores)})
+                    self.metrics.observe_batch(endpoint, len(companies_data), time.perf_counter() - started)
+                    return response, 200
+
                 # Chuẩn bị dữ liệu để đưa vào DataFrame
-                records = []
-                for company in companies_data:
-                    record = {
-                        'taxcode': company.get('taxcode'),
-                        'sector_unique_id_raw': company.get('sector_unique_id_raw')
-                    }
-                    for group, indicators in company.get('scores', {}).items():
-                        for indicator_data in indicators:
-                            indicator_name = indicator_data.get('indicator')
-                            value = indicator_data.get('value')
-                            if indicator_name:
-                                record[indicator_name] = value
-                    records.append(record)
-                
-                if not records:
-                    return jsonify({"results": []})
+                with self.metrics.stage('build', timings):
+                    records = []
+                    for company in companies_data:
+                        record = {
+                            'taxcode': company.get('taxcode'),
+                            'sector_unique_id_raw': company.get('sector_unique_id_raw')
+                        }
+                        if 'yearreport' in company:
+                            record['yearreport'] = company['yearreport']
+                        for group, indicators in company.get('scores', {}).items():
+                            for indicator_data in indicators:
+                                indicator_name = indicator_data.get('indicator')
+                                value = indicator_data.get('value')
+                                if indicator_name:
+                                    record[indicator_name] = value
+                        records.append(record)
 
-                # Tạo DataFrame từ dữ liệu của tất cả các công ty
-                input_df = pd.DataFrame(records)
+                    # Tạo DataFrame từ dữ liệu của tất cả các công ty
+                    input_df = pd.DataFrame(records)
 
-                # Bước 1: Gọi hàm tính điểm số thô có trọng số
-                numeric_scores_df = field_score(
-                    input_df,
-                    FIELD_MAPPING,
-                    GOOD_BAD_MAPPING,
-                    weights
-                )
+                # Bước 1: Tính điểm số thô có trọng số bằng plan đã biên dịch
+                plan = state.plan
+                with self.metrics.stage('field_score', timings):
+                    numeric_scores_df = plan.score(input_df, weights)
 
                 # Bước 2: Gán điểm T-Score dựa trên điểm số thô
-                t_scores_df = assign_scores_field(
-                    numeric_scores_df,
-                    FIELD_MAPPING
-                )
-
-                # Chuyển đổi kết quả DataFrame cuối cùng thành định dạng JSON mong muốn
-                t_scores_df.replace({np.nan: None}, inplace=True)
-                response_data = t_scores_df.to_dict(orient='records')
-                
-                return jsonify({"results": response_data}), 200
-                
+                with self.metrics.stage('assign_scores_field', timings):
+                    t_scores_df = assign_scores_field(
+                        numeric_scores_df,
+                        plan.group_field_mapping,
+                        self.calibration,
+                        partition_by=partition_by
+                    )
+
+                # Chuyển đổi kết quả thành định dạng JSON mong muốn (cùng dạng bản ghi với micro-batch / stream)
+                with self.metrics.stage('serialize', timings):
+                    t_scores = {
+                        f"{group}_TScore": tscore_codes(t_scores_df[f"{group}_TScore"]) for group in plan.groups
+                    }
+                    response = jsonify({"results": self.company_records(companies_data, t_scores)})
+
+                self.metrics.observe_batch(endpoint, len(companies_data), time.perf_counter() - started)
+                return response, 200
+
+            except (ValueError, TypeError, BadRequest) as e:
+                # Dữ liệu đầu vào không hợp lệ
+                self.metrics.record_error(endpoint, 'invalid_input')
+                return jsonify({"error": str(e)}), 400
             except Exception as e:
-                # Ghi log lỗi ở đây sẽ tốt hơn trong môi trường production
+                self.app.logger.exception("Unhandled error in /process-groups")
+                self.metrics.record_error(endpoint, 'internal')
                 return jsonify({"error": str(e)}), 500
         
+        @self.app.route('/process-groups/stream', methods=['POST'])
+        def process_groups_stream():
+            """
+            API streaming cho lô rất lớn: body là NDJSON, mỗi dòng một công ty
+            {"taxcode": ..., "sector_unique_id_raw": ..., "scores": {...}}.
+            Kết quả trả về dạng NDJSON theo từng khối. Bắt buộc có calibration.
+
+            Query params:
+                weights: JSON {indicator: weight} (tùy chọn)
+                chunk_size: số công ty mỗi khối (mặc định STREAM_CHUNK_SIZE)
+            """
+            if self.calibration is None:
+                self.metrics.record_error('process_groups_stream', 'invalid_input')
+                return jsonify({"error": "Streaming requires a calibration (SCORING_CALIBRATION_PATH)"}), 400
+
+            try:
+                weights = json.loads(request.args['weights']) if 'weights' in request.args else None
+                chunk_size = int(request.args.get('chunk_size', self.STREAM_CHUNK_SIZE))
+                if chunk_size <= 0:
+                    raise ValueError("'chunk_size' must be positive")
+            except ValueError as e:
+                self.metrics.record_error('process_groups_stream', 'invalid_input')
+                return jsonify({"error": str(e)}), 400
+
+            def generate():
+                try:
+                    yield from self.score_stream(request.stream, weights, chunk_size)
+                except Exception as e:
+                    # Header đã gửi đi, báo lỗi bằng một dòng cuối
+                    kind = 'invalid_input' if isinstance(e, ValueError) else 'internal'
+                    self.metrics.record_error('process_groups_stream', kind)
+                    yield json.dumps({"error": str(e)}) + "\n"
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        def lookup_response(endpoint, lookup):
+            """Chạy một tra cứu kho kết quả; 400 nếu chưa cấu hình kho hoặc tham số không hợp lệ."""
+            if self.result_store is None:
+                self.metrics.record_error(endpoint, 'invalid_input')
+                return jsonify({"error": "Result store is not configured (SCORING_RESULT_STORE)"}), 400
+            started = time.perf_counter()
+            try:
+                body, status, n_rows = lookup(self.result_store)
+            except ValueError as e:
+                self.metrics.record_error(endpoint, 'invalid_input')
+                return jsonify({"error": str(e)}), 400
+            self.metrics.observe_batch(endpoint, n_rows, time.perf_counter() - started)
+            return jsonify(body), status
+
+        @self.app.route('/scores/<taxcode>/<int:yearreport>', methods=['GET'])
+        def score_lookup(taxcode, yearreport):
+            """Kết quả đã lưu của một công ty trong một năm (404 nếu không có)."""
+            def lookup(store):
+                record = store.get(taxcode, yearreport)
+                if record is None:
+                    return {"error": f"No result for taxcode {taxcode} in {yearreport}"}, 404, 0
+                return record, 200, 1
+            return lookup_response('scores', lookup)
+
+        @self.app.route('/scores/<taxcode>', methods=['GET'])
+        def company_lookup(taxcode):
+            """Kết quả đã lưu của một công ty qua các năm (404 nếu không có)."""
+            def lookup(store):
+                records = store.get_company(taxcode)
+                if not records:
+                    return {"error": f"No result for taxcode {taxcode}"}, 404, 0
+                return {"taxcode": taxcode, "results": records}, 200, len(records)
+            return lookup_response('scores', lookup)
+
+        @self.app.route('/scores', methods=['GET'])
+        def bulk_lookup():
+            """
+            Tra cứu nhiều khóa: GET /scores?keys=0106512583:2022,0101234567:2023
+            Trả về {"results": [...], "missing": ["taxcode:year", ...]}.
+            """
+            def lookup(store):
+                raw = [k for k in request.args.get('keys', '').split(',') if k]
+                if not raw:
+                    raise ValueError("Query parameter 'keys' (taxcode:yearreport,...) is required")
+                if len(raw) > self.LOOKUP_MAX_KEYS:
+                    raise ValueError(f"At most {self.LOOKUP_MAX_KEYS} keys per request")
+                keys = []
+                for item in raw:
+                    taxcode, sep, year = item.rpartition(':')
+                    if not sep or not taxcode or not year.isdigit():
+                        raise ValueError(f"Invalid key '{item}', expected taxcode:yearreport")
+                    keys.append((taxcode, int(year)))
+                records = store.get_many(keys)
+                found = {(r['taxcode'], r['yearreport']) for r in records}
+                missing = [f"{t}:{y}" for t, y in dict.fromkeys(keys) if (t, y) not in found]
+                return {"results": records, "missing": missing}, 200, len(records)
+            return lookup_response('scores_bulk', lookup)
+
+        @self.app.route('/peers/<taxcode>/<int:yearreport>', methods=['GET'])
+        def peer_rank(taxcode, yearreport):
+            """
+            Hạng / phân vị của công ty trong ngành và năm của nó theo điểm nhóm.
+            Query params: group (tùy chọn, mặc định mọi nhóm)
+            """
+            def lookup(store):
+                record = self.current_peer_index().rank(taxcode, yearreport, request.args.get('group'))
+                if record is None:
+                    return {"error": f"No result for taxcode {taxcode} in {yearreport}"}, 404, 0
+                return record, 200, 1
+            return lookup_response('peers', lookup)
+
+        @self.app.route('/peers/top', methods=['GET'])
+        def peer_top():
+            """
+            Top-k công ty theo điểm nhóm trong một ngành / năm:
+            GET /peers/top?sector_unique_id=24&yearreport=2022&group=Liquidity&k=10
+            """
+            def lookup(store):
+                missing = [p for p in ('sector_unique_id', 'yearreport', 'group') if p not in request.args]
+                if missing:
+                    raise ValueError(f"Missing query parameters: {missing}")
+                try:
+                    k = int(request.args.get('k', 10))
+                except ValueError:
+                    raise ValueError("'k' must be an integer") from None
+                if k > self.TOP_MAX_K:
+                    raise ValueError(f"'k' must be at most {self.TOP_MAX_K}")
+                sector, year, group = request.args['sector_unique_id'], request.args['yearreport'], request.args['group']
+                results = self.current_peer_index().top(sector, year, group, k)
+                return {"sector_unique_id": sector, "yearreport": year, "group": group, "results": results}, 200, len(results)
+            return lookup_response('peers_top', lookup)
+
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics():
+            """Số liệu hiệu năng theo định dạng Prometheus (của tiến trình worker hiện tại)"""
+            return Response(self.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+        @self.app.after_request
+        def add_server_timing(response):
+            timings = g.get('stage_timings')
+            if self.server_timing and timings:
+                response.headers['Server-Timing'] = server_timing_header(timings)
+            return response
+
         @self.app.route('/health', methods=['GET'])
         def health_check():
             """Health check endpoint"""
-            return jsonify({"status": "healthy", "service": "Financial Scoring API v2.0"}), 200
+            return jsonify({
+                "status": "healthy",
+                "service": "Financial Scoring API v2.0",
+                "calibration": self.calibration is not None,
+                "result_store": self.result_store is not None
+            }), 200
+
+        @self.app.route('/health/live', methods=['GET'])
+        def liveness():
+            """Liveness: tiến trình còn phục vụ được request"""
+            return jsonify({"status": "alive"}), 200
+
+        @self.app.route('/health/ready', methods=['GET'])
+        def readiness():
+            """Readiness: worker micro-batch còn chạy và kho kết quả đọc được (503 nếu không)"""
+            checks = self.readiness_checks()
+            if not all(checks.values()):
+                return jsonify({"status": "not_ready", "checks": checks}), 503
+            return jsonify({
+                "status": "ready",
+                "calibration": self.calibration is not None,
+                "micro_batch": self.batcher is not None,
+                "checks": checks
+            }), 200
     
     def get_app(self):
         """Lấy Flask app instance"""
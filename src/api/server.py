@@ -0,0 +1,51 @@
+"""
+Chế độ chạy production cho Financial Scoring API
+Pre-fork nhiều worker bằng gunicorn, trạng thái được tải sẵn trước khi fork.
+"""
+
+import gc
+import os
+
+
+def serving_config_from_env():
+    """Đọc cấu hình chạy server từ biến môi trường"""
+    return {
+        'host': os.environ.get('SCORING_HOST', '0.0.0.0'),
+        'port': int(os.environ.get('SCORING_PORT', '5000')),
+        'workers': int(os.environ.get('SCORING_WORKERS', str(os.cpu_count() or 1))),
+        'threads': int(os.environ.get('SCORING_THREADS', '4')),
+        'timeout': int(os.environ.get('SCORING_TIMEOUT', '120')),
+    }
+
+
+def run_production(api, host='0.0.0.0', port=5000, workers=2, threads=4, timeout=120):
+    """
+    Chạy API bằng gunicorn (pre-fork, nhiều worker, mỗi worker nhiều thread).
+
+    `api` đã được khởi tạo (calibration, ScoringPlan) trong tiến trình master nên các worker
+    dùng chung trạng thái này theo cơ chế copy-on-write sau khi fork.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError as e:
+        raise RuntimeError("Production mode requires gunicorn: pip install gunicorn") from e
+
+    app = api.get_app()
+
+    class ScoringApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{host}:{port}")
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread' if threads > 1 else 'sync')
+            self.cfg.set('timeout', timeout)
+            self.cfg.set('preload_app', True)
+
+        def load(self):
+            return app
+
+    # Đưa các object đã tải vào thế hệ GC cố định để GC của worker không ghi vào các trang dùng chung
+    gc.collect()
+    gc.freeze()
+
+    ScoringApplication().run()
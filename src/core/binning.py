@@ -0,0 +1,378 @@
+"""
+Kernel chia bin T1-T8 vector hóa cho nhiều chỉ số cùng lúc
+Sắp xếp mỗi cột một lần, tính biên phân vị (đã cắt outlier) cho mọi chỉ số trên mảng 2D
+và gán mã T bằng searchsorted.
+
+Mã T được biểu diễn bằng số nguyên: 1 = T1 (cao nhất) ... 8 = T8 (thấp nhất), 0 = không có điểm.
+"""
+
+import numpy as np
+import pandas as pd
+
+N_BINS = 8
+
+# Mã T -> nhãn, vị trí 0 là "không có điểm" (None khi xuất JSON)
+T_LABELS = np.array([None] + [f"T{i}" for i in range(1, N_BINS + 1)], dtype=object)
+
+# Kiểu Categorical cố định cho các cột T-score trong DataFrame (1 byte mỗi ô thay vì chuỗi Python)
+TSCORE_DTYPE = pd.CategoricalDtype([f"T{i}" for i in range(1, N_BINS + 1)], ordered=True)
+
+
+def tscore_categorical(codes, index=None, name=None):
+    """Dựng Series Categorical (TSCORE_DTYPE) từ mã T uint8, 0 -> NaN. Không tạo chuỗi nào."""
+    codes = np.asarray(codes, dtype=np.int8) - 1
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=TSCORE_DTYPE), index=index, name=name)
+
+
+def tscore_codes(series):
+    """Mã T uint8 (0 = không có điểm) từ cột T-score (Categorical hoặc chuỗi "T1".."T8")."""
+    if not isinstance(series.dtype, pd.CategoricalDtype) or series.dtype != TSCORE_DTYPE:
+        series = series.astype(TSCORE_DTYPE)
+    return (series.cat.codes.to_numpy() + 1).astype(np.uint8)
+
+
+def tscore_labels(codes):
+    """Nhãn "T1".."T8" (None nếu không có điểm) - chỉ dùng ở bước xuất kết quả."""
+    return T_LABELS[np.asarray(codes, dtype=np.intp)]
+
+
+def tscore_points(codes):
+    """Đổi mã T sang điểm để cộng có trọng số: T1 -> 8 ... T8 -> 1, không có điểm -> NaN."""
+    codes = np.asarray(codes)
+    points = (N_BINS + 1 - codes).astype(float)
+    points[codes == 0] = np.nan
+    return points
+
+
+def _lerp(a, b, t):
+    """Nội suy tuyến tính giống numpy.percentile (method='linear')."""
+    diff = b - a
+    result = a + diff * t
+    return np.where(t >= 0.5, b - diff * (1 - t), result)
+
+
+def sorted_quantile(sorted_values, counts, q):
+    """
+    Phân vị q của từng cột trong mảng đã sắp xếp (NaN ở cuối mỗi cột).
+
+    Parameters:
+        sorted_values: ndarray (rows × cols), mỗi cột tăng dần, NaN ở cuối
+        counts: số giá trị hợp lệ của từng cột
+        q: phân vị trong [0, 1]
+
+    Return:
+        ndarray (cols,), NaN với cột không có dữ liệu
+    """
+    counts = np.asarray(counts)
+    position = np.maximum(counts - 1, 0) * q
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    frac = position - lower
+
+    a = np.take_along_axis(sorted_values, lower[None, :], axis=0)[0]
+    b = np.take_along_axis(sorted_values, upper[None, :], axis=0)[0]
+    result = _lerp(a, b, frac)
+    result[counts == 0] = np.nan
+    return result
+
+
+def counted_quantile(values, counts, q):
+    """
+    Phân vị q (giống sorted_quantile trên mảng đầy đủ) từ các giá trị khác nhau tăng dần
+    và số lần xuất hiện của từng giá trị, không cần dựng lại mảng đầy đủ.
+
+    Parameters:
+        values: ndarray (k,) giá trị khác nhau tăng dần
+        counts: ndarray (k,) số lần xuất hiện (> 0)
+        q: phân vị hoặc mảng phân vị trong [0, 1]
+
+    Return:
+        ndarray cùng shape với q, NaN nếu không có dữ liệu
+    """
+    q = np.asarray(q, dtype=float)
+    cumulative = np.cumsum(counts)
+    if cumulative.size == 0 or cumulative[-1] == 0:
+        return np.full(q.shape, np.nan)
+    last = cumulative[-1] - 1
+    position = last * q
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, last)
+    # Giá trị ở hạng r (từ 0) là giá trị đầu tiên có số lần xuất hiện tích lũy > r
+    a = values[np.searchsorted(cumulative, lower, side='right')]
+    b = values[np.searchsorted(cumulative, upper, side='right')]
+    return _lerp(a, b, position - lower)
+
+
+def column_bin_stats(values, lower_cut=0.05, upper_cut=0.95):
+    """
+    Thống kê chia bin cho mọi cột của ma trận giá trị.
+
+    - q_low, q_high: phân vị cắt outlier (giống Series.quantile)
+    - edges: 9 phân vị của tập giá trị *khác nhau* nằm trong [q_low, q_high]
+      (giống np.percentile(series_inliers.unique(), ...))
+
+    Parameters:
+        values: ndarray (rows × cols), NaN = không tham gia chia bin
+
+    Return:
+        dict {count, q_low, q_high, n_unique: (cols,), edges: (cols × 9)}
+    """
+    values = np.asarray(values, dtype=float)
+    sorted_values = np.sort(values, axis=0)
+    counts = (~np.isnan(values)).sum(axis=0)
+
+    q_low = sorted_quantile(sorted_values, counts, lower_cut)
+    q_high = sorted_quantile(sorted_values, counts, upper_cut)
+
+    with np.errstate(invalid='ignore'):
+        inliers = (sorted_values >= q_low) & (sorted_values <= q_high)
+
+    # Giữ lần xuất hiện đầu tiên của mỗi giá trị trong các inlier
+    first = np.ones(sorted_values.shape, dtype=bool)
+    first[1:] = sorted_values[1:] != sorted_values[:-1]
+    keep = inliers & first
+    n_unique = keep.sum(axis=0)
+
+    # Dồn các giá trị khác nhau lên đầu cột, giữ nguyên thứ tự tăng dần
+    rows = np.cumsum(keep, axis=0) - 1
+    cols = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    unique_sorted = np.full(values.shape, np.nan)
+    unique_sorted[rows[keep], cols[keep]] = sorted_values[keep]
+
+    edges = np.column_stack([
+        sorted_quantile(unique_sorted, n_unique, p) for p in np.linspace(0, 1, N_BINS + 1)
+    ])
+
+    return {
+        'count': counts,
+        'q_low': q_low,
+        'q_high': q_high,
+        'n_unique': n_unique,
+        'edges': edges,
+    }
+
+
+def assign_bin_codes(values, stats, high_good, min_count=3):
+    """
+    Gán mã T (uint8) cho ma trận giá trị theo thống kê chia bin của từng cột.
+
+    Parameters:
+        values: ndarray (rows × cols), NaN = không chấm
+        stats: kết quả column_bin_stats
+        high_good: mảng bool (cols,), hướng chấm điểm của từng cột
+        min_count: số giá trị tối thiểu để chấm một cột
+
+    Return:
+        ndarray uint8 (rows × cols), 0 = không có điểm
+    """
+    values = np.asarray(values, dtype=float)
+    codes = np.zeros(values.shape, dtype=np.uint8)
+
+    for j in range(values.shape[1]):
+        if stats['count'][j] < min_count:
+            continue
+
+        col = values[:, j]
+        valid = ~np.isnan(col)
+        v = col[valid]
+        hg = bool(high_good[j])
+
+        if stats['n_unique'][j] < 2:
+            # Inlier không đủ đa dạng -> T4, outlier hai phía -> T1/T8 theo hướng
+            bins = np.full(v.shape, 4, dtype=np.uint8)
+            bins[v < stats['q_low'][j]] = 8 if hg else 1
+            bins[v > stats['q_high'][j]] = 1 if hg else 8
+            codes[valid, j] = bins
+            continue
+
+        edges = np.unique(stats['edges'][j])
+        # Bin đóng bên phải (a, b] như pd.cut; dưới biên đầu -> bin 0, trên biên cuối -> bin cuối của thang 8
+        idx = np.searchsorted(edges[1:-1], v, side='left')
+        idx[v > edges[-1]] = N_BINS - 1
+        codes[valid, j] = (idx + 1) if hg else (N_BINS - idx)
+
+    return codes
+
+
+# ----------------------------------------------------------------------
+# Chia bin theo partition (ví dụ ngành × năm)
+# ----------------------------------------------------------------------
+def partition_levels(df, keys):
+    """
+    Các cấp partition từ chi tiết nhất đến toàn cục, mỗi cấp bỏ bớt khóa cuối:
+    [sector, year] -> [sector] -> [] (toàn bộ dữ liệu).
+
+    Return:
+        list (keys, ids, n_parts): ids là mã partition liên tiếp 0..n_parts-1 của từng dòng
+    """
+    keys = list(keys or [])
+    levels = []
+    for k in range(len(keys), -1, -1):
+        level_keys = keys[:k]
+        if level_keys:
+            ids = df.groupby(level_keys, sort=False, dropna=False).ngroup().to_numpy(dtype=np.intp)
+            n_parts = int(ids.max()) + 1 if len(ids) else 0
+        else:
+            ids = np.zeros(len(df), dtype=np.intp)
+            n_parts = 1
+        levels.append((level_keys, ids, n_parts))
+    return levels
+
+
+def segment_quantile(sorted_values, starts, counts, q):
+    """
+    Phân vị q trong từng đoạn [start, start + count) của mảng đã sắp xếp theo (partition, giá trị).
+
+    Parameters:
+        sorted_values: ndarray (cols × rows), mỗi dòng là một cột dữ liệu
+        starts: (parts,) vị trí bắt đầu của từng partition
+        counts: (cols × parts) số giá trị hợp lệ (nằm ở đầu đoạn) của từng partition
+        q: phân vị trong [0, 1]
+
+    Return:
+        ndarray (cols × parts), NaN với partition không có dữ liệu
+    """
+    last = np.maximum(counts - 1, 0)
+    position = last * q
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, last)
+    frac = position - lower
+
+    a = np.take_along_axis(sorted_values, starts[None, :] + lower, axis=1)
+    b = np.take_along_axis(sorted_values, starts[None, :] + upper, axis=1)
+    result = _lerp(a, b, frac)
+    result[counts == 0] = np.nan
+    return result
+
+
+def partition_level_codes(values, part_ids, n_parts, high_good, lower_cut=0.05, upper_cut=0.95, min_count=3):
+    """
+    Chia bin như column_bin_stats + assign_bin_codes nhưng riêng cho từng (partition, cột),
+    trong một lần sắp xếp cho mọi partition - không lặp Python theo partition.
+
+    Mỗi cột được sắp theo khóa nguyên (partition, hạng toàn cục của giá trị) nên mỗi partition
+    là một đoạn liên tiếp tăng dần (NaN ở cuối đoạn). Phân vị, cắt outlier, dồn giá trị khác nhau
+    và gán mã đều tính theo đoạn; mã được ghi lại đúng thứ tự dòng ban đầu.
+
+    Return:
+        (codes, counts): codes uint8 (rows × cols), 0 = không có điểm hoặc partition có ít hơn
+        min_count giá trị; counts (parts × cols) số giá trị hợp lệ của từng partition
+    """
+    # Bố cục cột liên tục (cols × rows) để sắp xếp theo từng cột nhanh hơn
+    values_t = np.ascontiguousarray(np.asarray(values, dtype=float).T)
+    n_cols, n_rows = values_t.shape
+    high_good = np.asarray(high_good, dtype=bool)
+
+    # Hạng toàn cục của giá trị, rồi sắp theo khóa (partition, là NaN, hạng).
+    # NaN được đưa về cuối đoạn nhờ khóa, nên có thể thay bằng 0 trước khi argsort (nhanh hơn)
+    missing = np.isnan(values_t)
+    order = np.argsort(np.where(missing, 0.0, values_t), axis=1)
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(n_rows)[None, :], axis=1)
+    composite = np.sort((part_ids[None, :] * 2 + missing) * n_rows + rank, axis=1)
+    rows = np.take_along_axis(order, composite % n_rows, axis=1)
+    sorted_values = np.take_along_axis(values_t, rows, axis=1)
+
+    sizes = np.bincount(part_ids, minlength=n_parts)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+    nonempty = sizes > 0
+
+    def per_segment_sum(mask):
+        totals = np.zeros((n_cols, n_parts), dtype=np.intp)
+        totals[:, nonempty] = np.add.reduceat(mask, starts[nonempty], axis=1)
+        return totals
+
+    def per_element(param):
+        # Giá trị của partition chứa từng phần tử (phần tử đã xếp theo partition)
+        return np.repeat(param, sizes, axis=-1)
+
+    counts = per_segment_sum(~np.isnan(sorted_values))
+    q_low = per_element(segment_quantile(sorted_values, starts, counts, lower_cut))
+    q_high = per_element(segment_quantile(sorted_values, starts, counts, upper_cut))
+
+    with np.errstate(invalid='ignore'):
+        inliers = (sorted_values >= q_low) & (sorted_values <= q_high)
+
+    # Giữ lần xuất hiện đầu tiên của mỗi giá trị trong các inlier của đoạn
+    first = np.ones(sorted_values.shape, dtype=bool)
+    first[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    first[:, starts[nonempty]] = True
+    keep = inliers & first
+    n_unique = per_segment_sum(keep)
+
+    # Dồn các giá trị khác nhau lên đầu đoạn, giữ nguyên thứ tự tăng dần
+    cumulative = np.cumsum(keep, axis=1)
+    before = np.hstack([np.zeros((n_cols, 1), dtype=cumulative.dtype), cumulative])[:, starts]
+    target = per_element(starts) + cumulative - 1 - per_element(before)
+    col_index = np.broadcast_to(np.arange(n_cols)[:, None], sorted_values.shape)
+    unique_sorted = np.full(sorted_values.shape, np.nan)
+    unique_sorted[col_index[keep], target[keep]] = sorted_values[keep]
+
+    edges = [segment_quantile(unique_sorted, starts, n_unique, p) for p in np.linspace(0, 1, N_BINS + 1)]
+
+    # Số biên trong (khác nhau, khác min/max) nhỏ hơn v = searchsorted 'left' trên np.unique(edges)[1:-1]
+    idx = np.zeros(sorted_values.shape, dtype=np.uint8)
+    for k in range(1, N_BINS):
+        # Biên trùng được thay bằng +inf để không bao giờ được đếm
+        inner = np.where((edges[k] != edges[k - 1]) & (edges[k] != edges[N_BINS]), edges[k], np.inf)
+        idx += per_element(inner) < sorted_values
+    top = per_element(edges[N_BINS])
+    idx[sorted_values > top] = N_BINS - 1
+    codes_sorted = np.where(high_good[:, None], idx + 1, N_BINS - idx)
+
+    # Inlier không đủ đa dạng -> T4, outlier hai phía -> T1/T8 theo hướng
+    few = per_element(n_unique < 2)
+    if few.any():
+        low_code = np.where(high_good, 8, 1)[:, None]
+        high_code = np.where(high_good, 1, 8)[:, None]
+        flat = np.where(sorted_values < q_low, low_code, np.where(sorted_values > q_high, high_code, 4))
+        codes_sorted = np.where(few, flat, codes_sorted)
+
+    scored = ~np.isnan(sorted_values) & (per_element(counts) >= min_count)
+    codes_sorted = np.where(scored, codes_sorted, 0).astype(np.uint8)
+
+    # Trả mã về đúng thứ tự dòng ban đầu
+    codes_t = np.empty_like(codes_sorted)
+    np.put_along_axis(codes_t, rows, codes_sorted, axis=1)
+    return codes_t.T, counts.T
+
+
+def partitioned_bin_codes(values, levels, high_good, lower_cut=0.05, upper_cut=0.95,
+                          min_count=3, min_partition_size=30):
+    """
+    Gán mã T theo partition với fallback: mỗi ô dùng cấp partition chi tiết nhất có ít nhất
+    min_partition_size giá trị hợp lệ trong cột đó, nếu không thì lùi về cấp cha (cấp cuối cùng
+    - toàn cục - luôn được dùng, với điều kiện min_count như chấm toàn cục).
+    Mỗi cấp chỉ tính trên các cột còn ô chưa được gán.
+
+    Parameters:
+        values: ndarray (rows × cols)
+        levels: kết quả partition_levels
+        high_good: mảng bool (cols,)
+
+    Return:
+        ndarray uint8 (rows × cols)
+    """
+    values = np.asarray(values, dtype=float)
+    high_good = np.asarray(high_good, dtype=bool)
+    codes = np.zeros(values.shape, dtype=np.uint8)
+    pending = ~np.isnan(values)
+
+    for level, (_, part_ids, n_parts) in enumerate(levels):
+        cols = np.flatnonzero(pending.any(axis=0))
+        if cols.size == 0:
+            break
+
+        is_last = level == len(levels) - 1
+        threshold = min_count if is_last else max(min_count, min_partition_size)
+        level_codes, counts = partition_level_codes(
+            values[:, cols], part_ids, n_parts, high_good[cols], lower_cut, upper_cut, threshold
+        )
+
+        use = pending[:, cols] & (counts[part_ids] >= threshold)
+        block = codes[:, cols]
+        block[use] = level_codes[use]
+        codes[:, cols] = block
+        pending[:, cols] &= ~use
+
+    return codes
@@ -0,0 +1,108 @@
+"""
+Calibration snapshot cho hệ thống chấm điểm
+Lưu biên các bin T1-T8 của điểm nhóm tính từ một tập dữ liệu tham chiếu,
+để chấm điểm lô nhỏ (kể cả một công ty) ổn định mà không cần gửi cả quần thể.
+"""
+
+import json
+
+import numpy as np
+
+from src.core.field_score import field_score, group_edges_from_scores, tscores_from_edges
+
+
+class Calibration:
+    """
+    Biên bin T1-T8 cố định, xây dựng offline từ toàn bộ dữ liệu.
+
+    - group_edges: {group: [9 biên tăng dần]} cho điểm nhóm thô (cách chia min-max của API)
+
+    Điểm nhóm thô tính trực tiếp từ giá trị chỉ số nên API không cần biên theo chỉ số;
+    khóa 'indicator_edges' trong file calibration cũ được bỏ qua khi tải.
+    """
+
+    VERSION = 1
+
+    def __init__(self, group_edges=None, lower_cut=0.05, upper_cut=0.95, metadata=None):
+        self.group_edges = {
+            group: (np.asarray(edges, dtype=float) if edges is not None else None)
+            for group, edges in (group_edges or {}).items()
+        }
+        self.lower_cut = lower_cut
+        self.upper_cut = upper_cut
+        self.metadata = metadata or {}
+
+    # ------------------------------------------------------------------
+    # Xây dựng
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_population(cls, data_df, group_field_mapping, good_bad_mapping, weights=None,
+                        lower_cut=0.05, upper_cut=0.95):
+        """
+        Xây dựng calibration từ dữ liệu gốc của toàn bộ quần thể.
+
+        Parameters:
+            data_df: DataFrame chứa các cột chỉ số thô
+            group_field_mapping: dict {group: [fields]}
+            good_bad_mapping: dict {field: 'high_good' | 'low_good'}
+            weights: dict {field: weight} dùng khi tính điểm nhóm thô
+        """
+        # Biên theo nhóm, tính trên điểm nhóm thô như API
+        field_scores_df = field_score(data_df, group_field_mapping, good_bad_mapping, weights)
+        group_edges = {}
+        for group in group_field_mapping.keys():
+            score_col_name = f"{group}_Score"
+            if score_col_name in field_scores_df.columns:
+                edges = group_edges_from_scores(field_scores_df[score_col_name])
+                group_edges[group] = edges.tolist() if edges is not None else None
+
+        metadata = {'n_rows': int(len(data_df))}
+        return cls(group_edges, lower_cut, upper_cut, metadata)
+
+    # ------------------------------------------------------------------
+    # Lưu / tải
+    # ------------------------------------------------------------------
+    def to_dict(self):
+        return {
+            'version': self.VERSION,
+            'lower_cut': self.lower_cut,
+            'upper_cut': self.upper_cut,
+            'metadata': self.metadata,
+            'group_edges': {
+                group: (edges.tolist() if edges is not None else None)
+                for group, edges in self.group_edges.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        version = data.get('version', cls.VERSION)
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported calibration version: {version}")
+        return cls(
+            group_edges=data.get('group_edges'),
+            lower_cut=data.get('lower_cut', 0.05),
+            upper_cut=data.get('upper_cut', 0.95),
+            metadata=data.get('metadata')
+        )
+
+    def save(self, path):
+        """Ghi calibration ra file JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Đọc calibration từ file JSON"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    # ------------------------------------------------------------------
+    # Tra cứu
+    # ------------------------------------------------------------------
+    def has_group(self, group):
+        return group in self.group_edges
+
+    def group_tscores(self, group, values):
+        """Gán mã T (uint8, 0 nếu thiếu) cho điểm nhóm thô theo biên đã lưu của nhóm."""
+        return tscores_from_edges(values, self.group_edges.get(group))
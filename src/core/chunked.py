@@ -0,0 +1,218 @@
+"""
+Pipeline chấm điểm theo khối (out-of-core) cho dữ liệu không vừa bộ nhớ
+Đọc file theo từng khối nhiều lần thay vì giữ toàn bộ DataFrame:
+
+1. Pass 1: sketch phân vị (QuantileSketch) cho từng chỉ số + thống kê tương quan (RunningCorrelation)
+   -> biên bin từng chỉ số và trọng số theo tương quan
+2. Pass 2: chấm chỉ số, tính điểm nhóm thô -> sketch phân vị của điểm nhóm -> biên bin nhóm
+3. Pass 3 (iter_scored): chấm lại từng khối với các biên cố định và trả kết quả theo khối
+
+Cột có không quá max_distinct giá trị khác nhau (ví dụ điểm nhóm) được đếm tần số từng giá trị, nên
+phân vị cắt outlier và biên bin tính chính xác như chấm trong bộ nhớ: mã T giống hệt process_file.
+Cột vượt max_distinct lấy cả hai từ sketch (quy ước hạng 'linear' như Series.quantile):
+- biên là phân vị giá trị của phần inlier, không phải phân vị của các giá trị khác nhau, nên chỉ
+  khớp bộ nhớ khi cột ít giá trị trùng (chỉ số liên tục);
+- sai số hạng cỡ 1.5 / sketch_k. Trên 50.000 dòng dữ liệu mẫu, khi buộc mọi chỉ số dùng sketch
+  (max_distinct=0), tỉ lệ ô chỉ số lệch so với process_file là ~1.2% với sketch_k=200 (cột tệ nhất ~2.3%),
+  ~0.35% với 1000 (mặc định, cột tệ nhất ~1%) và ~0.1% khi sketch chưa nén; ô lệch chỉ lệch một bậc.
+"""
+
+import numpy as np
+
+from src.core.binning import N_BINS, assign_bin_codes, counted_quantile, sorted_quantile, tscore_categorical
+from src.core.correlation import CorrelationAnalyzer
+from src.core.correlation_cache import group_slices
+from src.core.sketch import QuantileSketch, RunningCorrelation
+
+INFO_COLS = ['taxcode', 'sector_unique_id', 'yearreport']
+
+
+class DistinctValues:
+    """
+    Các giá trị khác nhau (tăng dần) của một cột và số lần xuất hiện của từng giá trị,
+    bỏ theo dõi (values = counts = None) khi vượt max_distinct.
+    """
+
+    def __init__(self, max_distinct=100_000):
+        self.max_distinct = max_distinct
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def update(self, values):
+        if self.values is None:
+            return self
+        values = np.asarray(values, dtype=float).ravel()
+        values, counts = np.unique(values[~np.isnan(values)], return_counts=True)
+        merged, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        if merged.size > self.max_distinct:
+            self.values = self.counts = None
+            return self
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts]),
+                                  minlength=merged.size).astype(np.int64)
+        self.values = merged
+        return self
+
+    def quantiles(self, qs):
+        """Phân vị chính xác (như Series.quantile) của mọi giá trị đã thấy."""
+        return counted_quantile(self.values, self.counts, qs)
+
+
+def sketch_bin_stats(sketches, distinct=None, lower_cut=0.05, upper_cut=0.95):
+    """
+    Thống kê chia bin (cùng định dạng column_bin_stats) từ các sketch phân vị.
+    Cột mà distinct còn theo dõi được tính chính xác từ tần số (giống column_bin_stats);
+    cột còn lại: q_low, q_high và 9 biên (phân vị giá trị của phần inlier) lấy từ sketch.
+    """
+    inlier_qs = lower_cut + (upper_cut - lower_cut) * np.linspace(0, 1, N_BINS + 1)
+    count = np.array([s.count for s in sketches], dtype=np.intp)
+    cuts = np.array([s.quantiles([lower_cut, upper_cut]) for s in sketches]).reshape(len(sketches), 2)
+    edges = np.array([s.quantiles(inlier_qs) for s in sketches]).reshape(len(sketches), N_BINS + 1)
+    # Inlier chỉ có một giá trị khi biên đầu và cuối trùng nhau
+    n_unique = np.where(edges[:, -1] > edges[:, 0], N_BINS + 1, 1)
+
+    for j, tracker in enumerate(distinct or []):
+        if tracker.values is None:
+            continue
+        cuts[j] = tracker.quantiles([lower_cut, upper_cut])
+        inliers = tracker.values[(tracker.values >= cuts[j, 0]) & (tracker.values <= cuts[j, 1])]
+        n_unique[j] = inliers.size
+        if inliers.size:
+            edges[j] = [sorted_quantile(inliers[:, None], [inliers.size], p)[0] for p in np.linspace(0, 1, N_BINS + 1)]
+    return {
+        'count': count,
+        'q_low': cuts[:, 0],
+        'q_high': cuts[:, 1],
+        'n_unique': n_unique,
+        'edges': edges,
+    }
+
+
+class ChunkedScoringPipeline:
+    """
+    Chấm điểm T1-T8 theo khối với biên bin xấp xỉ từ sketch.
+
+    chunk_source là hàm không tham số trả về một iterator mới các DataFrame (mỗi pass gọi lại một lần),
+    ví dụ: lambda: DataProcessor.iter_chunks("data.csv", 100_000)
+    """
+
+    def __init__(self, group_field_mapping, good_bad_mapping, lower_cut=0.05, upper_cut=0.95,
+                 sketch_k=1000, max_distinct=100_000, scorer=None, correlation_analyzer=None):
+        if scorer is None:
+            from src.core.scoring import FinancialScorer
+            scorer = FinancialScorer()
+
+        self.group_field_mapping = group_field_mapping
+        self.good_bad_mapping = good_bad_mapping
+        self.lower_cut = lower_cut
+        self.upper_cut = upper_cut
+        self.sketch_k = sketch_k
+        self.max_distinct = max_distinct
+        self.scorer = scorer
+        self.correlation_analyzer = correlation_analyzer or CorrelationAnalyzer()
+        self._reset()
+
+    def _reset(self):
+        """Xóa trạng thái đã fit (biên bin, trọng số, số dòng)."""
+        self.fields = None
+        self.indicator_stats = None
+        self.weights = None
+        self.correlation_statistics = None
+        self.correlation_matrices = None
+        self.group_stats = None
+        self.n_rows = 0
+
+    # ------------------------------------------------------------------
+    # Chấm một khối
+    # ------------------------------------------------------------------
+    def _masked_values(self, chunk):
+        values = chunk.reindex(columns=self.fields).to_numpy(dtype=float, na_value=np.nan, copy=True)
+        excluded, override = self.scorer.special_case_masks(chunk, self.fields)
+        values[excluded] = np.nan
+        return values, override
+
+    def score_indicators(self, chunk):
+        """Mã T từng chỉ số của một khối theo biên đã fit. Trả về DataFrame info + <field>_Tscore."""
+        values, override = self._masked_values(chunk)
+        high_good = np.array([self.good_bad_mapping[f] == "high_good" for f in self.fields])
+        codes = assign_bin_codes(values, self.indicator_stats, high_good, min_count=3)
+        codes = np.where(override > 0, override, codes)
+
+        scored = chunk[[c for c in INFO_COLS if c in chunk.columns]].copy()
+        for j, field in enumerate(self.fields):
+            scored[f"{field}_Tscore"] = tscore_categorical(codes[:, j], index=chunk.index)
+        return scored
+
+    def group_scores(self, scored):
+        return self.correlation_analyzer.field_score(scored, self.group_field_mapping, self.weights)
+
+    def final_scores(self, field_scores):
+        """Mã T từng nhóm theo biên bin nhóm đã fit. Trả về DataFrame info + <group>_TScore."""
+        groups = list(self.group_field_mapping.keys())
+        values = field_scores[[f"{g}_Score" for g in groups]].to_numpy(dtype=float, na_value=np.nan)
+        codes = assign_bin_codes(values, self.group_stats, np.ones(len(groups), dtype=bool), min_count=1)
+
+        final_scores = field_scores[[c for c in INFO_COLS if c in field_scores.columns]].copy()
+        for j, group in enumerate(groups):
+            final_scores[f"{group}_TScore"] = tscore_categorical(codes[:, j], index=field_scores.index)
+        return final_scores
+
+    def transform(self, chunk):
+        """Chấm một khối: {'scored_individual', 'field_scores', 'final_scores'} như process_file."""
+        scored = self.score_indicators(chunk)
+        field_scores = self.group_scores(scored)
+        return {'scored_individual': scored, 'field_scores': field_scores, 'final_scores': self.final_scores(field_scores)}
+
+    # ------------------------------------------------------------------
+    # Fit / chấm cả luồng
+    # ------------------------------------------------------------------
+    def fit(self, chunk_source):
+        """
+        Pass 1 và 2: tính biên bin chỉ số, trọng số tương quan và biên bin nhóm.
+        Gọi lại fit() trên nguồn khác sẽ fit lại từ đầu, không cộng dồn với lần trước.
+        """
+        self._reset()
+        sketches = distinct = correlation = None
+
+        for chunk in chunk_source():
+            if self.fields is None:
+                self.fields = [f for f in self.good_bad_mapping if f in chunk.columns]
+                sketches = [QuantileSketch(self.sketch_k) for _ in self.fields]
+                distinct = [DistinctValues(self.max_distinct) for _ in self.fields]
+                correlation = RunningCorrelation(self.fields)
+
+            values, _ = self._masked_values(chunk)
+            for j, (sketch, tracker) in enumerate(zip(sketches, distinct)):
+                sketch.update(values[:, j])
+                tracker.update(values[:, j])
+            # Tương quan tính trên giá trị gốc, như correlation_analysis trong bộ nhớ
+            correlation.update(chunk.reindex(columns=self.fields).to_numpy(dtype=float, na_value=np.nan))
+            self.n_rows += len(chunk)
+
+        if self.fields is None:
+            raise ValueError("Chunk source produced no data")
+
+        self.indicator_stats = sketch_bin_stats(sketches, distinct, self.lower_cut, self.upper_cut)
+
+        self.correlation_statistics = correlation
+        self.correlation_matrices = group_slices(correlation.correlation_frame(), self.group_field_mapping)
+        self.weights = self.correlation_analyzer.weights_from_correlation(self.correlation_matrices)
+
+        # Pass 2: biên bin của điểm nhóm thô
+        groups = list(self.group_field_mapping.keys())
+        group_sketches = [QuantileSketch(self.sketch_k) for _ in groups]
+        group_distinct = [DistinctValues(self.max_distinct) for _ in groups]
+        for chunk in chunk_source():
+            field_scores = self.group_scores(self.score_indicators(chunk))
+            for group, sketch, tracker in zip(groups, group_sketches, group_distinct):
+                values = field_scores[f"{group}_Score"].to_numpy(dtype=float, na_value=np.nan)
+                sketch.update(values)
+                tracker.update(values)
+        self.group_stats = sketch_bin_stats(group_sketches, group_distinct, self.lower_cut, self.upper_cut)
+        return self
+
+    def iter_scored(self, chunk_source):
+        """Pass 3: trả kết quả chấm từng khối (bộ nhớ chỉ phụ thuộc kích thước khối)."""
+        if self.group_stats is None:
+            raise RuntimeError("Pipeline is not fitted; call fit() first")
+        for chunk in chunk_source():
+            yield self.transform(chunk)
@@ -0,0 +1,91 @@
+"""
+Gom cụm chỉ số theo tương quan (single linkage / thành phần liên thông)
+Hai chỉ số cùng cụm nếu nối được bằng một chuỗi cặp có |corr| > ngưỡng, nên kết quả bắc cầu
+và không phụ thuộc thứ tự cột. Cây khung lớn nhất (maximum spanning tree) trên |corr| được tính
+một lần; cụm ở mọi ngưỡng là thành phần liên thông của các cạnh trên cây có |corr| > ngưỡng.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def linkage_edges(corr):
+    """
+    Cây khung lớn nhất trên |corr| (thuật toán Prim, O(k²)).
+
+    Parameters:
+        corr: ndarray hoặc DataFrame (k × k); NaN = không có cạnh
+
+    Return:
+        ndarray (k-1 × 3): các cạnh (i, j, |corr|) sắp xếp giảm dần theo |corr|
+        (cạnh nối hai phần không liên thông có |corr| = -inf)
+    """
+    strength = np.abs(np.asarray(corr, dtype=float))
+    strength = np.where(np.isnan(strength), -np.inf, strength)
+    k = strength.shape[0]
+    if k < 2:
+        return np.empty((0, 3))
+
+    in_tree = np.zeros(k, dtype=bool)
+    in_tree[0] = True
+    best = strength[0].copy()
+    parent = np.zeros(k, dtype=np.intp)
+    edges = []
+    for _ in range(k - 1):
+        remaining = np.flatnonzero(~in_tree)
+        node = remaining[np.argmax(best[remaining])]
+        edges.append((parent[node], node, best[node]))
+        in_tree[node] = True
+        closer = strength[node] > best
+        best = np.where(closer, strength[node], best)
+        parent = np.where(closer, node, parent)
+
+    edges = np.array(edges, dtype=float)
+    return edges[np.argsort(-edges[:, 2], kind='stable')]
+
+
+def cluster_labels(k, edges, threshold):
+    """Nhãn cụm (0..) của k chỉ số: thành phần liên thông của các cạnh có |corr| > threshold."""
+    labels = np.arange(k)
+    for i, j, strength in edges:
+        if not strength > threshold:
+            break
+        a, b = labels[int(i)], labels[int(j)]
+        if a != b:
+            labels[labels == max(a, b)] = min(a, b)
+    # Đánh số lại theo thứ tự xuất hiện
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def cluster_weights(columns, labels, base_weight=1.0):
+    """Trọng số <field>_Tscore: base_weight chia đều cho các chỉ số trong cùng cụm."""
+    sizes = np.bincount(labels)
+    return {f"{col}_Tscore": float(base_weight / sizes[label]) for col, label in zip(columns, labels)}
+
+
+def correlation_clusters(corr, threshold):
+    """Danh sách cụm (mỗi cụm là list tên cột, theo thứ tự cột) của một ma trận tương quan DataFrame."""
+    columns = list(corr.columns)
+    if not columns:
+        return []
+    labels = cluster_labels(len(columns), linkage_edges(corr), threshold)
+    return [[col for col, label in zip(columns, labels) if label == c] for c in range(labels.max() + 1)]
+
+
+def threshold_sweep(correlation_matrices, thresholds, base_weight=1.0):
+    """
+    Trọng số theo cụm cho nhiều ngưỡng từ một lần tính linkage mỗi nhóm.
+
+    Return:
+        DataFrame (khóa trọng số <field>_Tscore × ngưỡng); weights của một ngưỡng t là cột .to_dict()
+    """
+    thresholds = list(thresholds)
+    columns = {t: {} for t in thresholds}
+
+    for corr in correlation_matrices.values():
+        cols = list(corr.columns)
+        edges = linkage_edges(corr)
+        for t in thresholds:
+            columns[t].update(cluster_weights(cols, cluster_labels(len(cols), edges, t), base_weight))
+
+    return pd.DataFrame(columns, columns=thresholds)
@@ -5,8 +5,11 @@ Xử lý tương quan và điều chỉnh trọng số
 
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+
+from src.core.binning import tscore_codes, tscore_points
+from src.core.clustering import cluster_labels, cluster_weights, linkage_edges, threshold_sweep
+from src.core.correlation_cache import CorrelationCache, group_slices
+from src.core.sketch import RunningCorrelation
 
 
 class CorrelationAnalyzer:
@@ -14,8 +17,10 @@ class CorrelationAnalyzer:
     Phân tích tương quan và điều chỉnh trọng số
     """
     
-    def __init__(self, threshold=0.9):
+    def __init__(self, threshold=0.9, cache=None):
         self.threshold = threshold
+        # Ma trận tương quan của mọi chỉ số tính một lần cho mỗi bộ dữ liệu, các nhóm dùng lát cắt
+        self.cache = cache if cache is not None else CorrelationCache()
     
     def analyze_correlation_by_group(self, df, group_field_mapping, show_plots=True):
         """
@@ -23,16 +28,14 @@ class CorrelationAnalyzer:
         """
         correlation_results = {}
         
-        for group, fields in group_field_mapping.items():
-            cols = [f for f in fields if f in df.columns]
-            if len(cols) < 2:
-                continue
-            
-            # Tính ma trận tương quan
-            corr = df[cols].corr()
+        for group, corr in self.cache.group_correlations(df, group_field_mapping, min_fields=2).items():
+            cols = list(corr.columns)
             
             if show_plots:
-                # Vẽ heatmap
+                # Vẽ heatmap (chỉ import thư viện vẽ khi cần)
+                import seaborn as sns
+                import matplotlib.pyplot as plt
+
                 plt.figure(figsize=(max(8, len(cols)*0.5), max(6, len(cols)*0.5)))
                 sns.heatmap(corr, annot=True, cmap='coolwarm', vmin=-1, vmax=1)
                 plt.title(f'Correlation matrix: {group}')
@@ -66,79 +69,93 @@ class CorrelationAnalyzer:
         """
         Điều chỉnh trọng số dựa trên tương quan giữa các chỉ số trong cùng một nhóm.
         """
-        weights = {}
+        correlation_matrices = self.cache.group_correlations(df, group_field_mapping)
+        return self.weights_from_correlation(correlation_matrices, base_weight)
 
-        for group, fields in group_field_mapping.items():
-            cols = [f for f in fields if f in df.columns]
-            if not cols:
-                continue
+    def correlation_statistics(self, df, group_field_mapping, statistics=None):
+        """
+        Thống kê tương quan dạng luồng (RunningCorrelation) trên mọi chỉ số của các nhóm có trong df.
+        Truyền statistics đã có (ví dụ của các quý trước) để cập nhật thêm df thay vì tính lại từ đầu.
+        """
+        if statistics is None:
+            columns = [col for col in dict.fromkeys(f for fields in group_field_mapping.values() for f in fields)
+                       if col in df.columns]
+            statistics = RunningCorrelation(columns)
+        return statistics.update(df)
+
+    def weights_from_statistics(self, statistics, group_field_mapping, base_weight=1.0):
+        """Trọng số theo cụm tương quan từ RunningCorrelation (như adjust_weights_for_correlation)."""
+        correlation_matrices = group_slices(statistics.correlation_frame(), group_field_mapping)
+        return self.weights_from_correlation(correlation_matrices, base_weight)
 
-            # Tính ma trận tương quan tuyệt đối
-            corr = df[cols].corr().abs()
-            visited = set()
-
-            for i, col in enumerate(cols):
-                if col in visited:
-                    continue
-
-                # Tìm cụm biến có tương quan cao với col (bao gồm chính nó)
-                cluster = [col]
-                for j in range(i + 1, len(cols)):
-                    other = cols[j]
-                    if other in visited:
-                        continue
-                    if corr.loc[col, other] > self.threshold:
-                        cluster.append(other)
-
-                # Nếu cụm có nhiều biến → chia đều trọng số
-                if len(cluster) > 1:
-                    w_each = base_weight / len(cluster)
-                    for c in cluster:
-                        weights[f"{c}_Tscore"] = w_each
-                        visited.add(c)
-                else:
-                    # Không có cụm → giữ weight=base_weight
-                    weights[f"{col}_Tscore"] = base_weight
-                    visited.add(col)
-
-            # Nếu còn biến chưa gán trọng số
-            for c in cols:
-                if f"{c}_Tscore" not in weights:
-                    weights[f"{c}_Tscore"] = base_weight
+    def weights_from_correlation(self, correlation_matrices, base_weight=1.0, threshold=None):
+        """
+        Trọng số theo cụm tương quan từ các ma trận tương quan đã tính sẵn
+        ({group: DataFrame tương quan, index/columns là tên chỉ số}), ví dụ từ RunningCorrelation.
 
+        Cụm là thành phần liên thông của đồ thị |corr| > threshold (single linkage, bắc cầu, không
+        phụ thuộc thứ tự cột); mỗi chỉ số trong cụm kích thước s nhận base_weight / s.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        weights = {}
+        for corr in correlation_matrices.values():
+            cols = list(corr.columns)
+            labels = cluster_labels(len(cols), linkage_edges(corr), threshold)
+            weights.update(cluster_weights(cols, labels, base_weight))
         return weights
+
+    def weights_for_thresholds(self, df, group_field_mapping, thresholds, base_weight=1.0):
+        """
+        Trọng số cho nhiều ngưỡng tương quan trong một lần gọi (dùng khi tinh chỉnh correlation_threshold):
+        ma trận tương quan lấy từ cache, linkage tính một lần cho mỗi nhóm.
+
+        Return:
+            DataFrame (khóa trọng số <field>_Tscore × ngưỡng); result[t].to_dict() là weights của ngưỡng t
+        """
+        correlation_matrices = self.cache.group_correlations(df, group_field_mapping)
+        return threshold_sweep(correlation_matrices, thresholds, base_weight)
     
     def field_score(self, df, group_field_mapping, weights=None):
         """
         Tính điểm tổng hợp theo nhóm chỉ số, trả về DataFrame gồm:
         taxcode, sector_unique_id, yearreport và 6 cột điểm nhóm.
+
+        Đọc các cột <field>_Tscore (kết quả assign_scores_df) dưới dạng mã T số nguyên,
+        đổi sang điểm T1 -> 8 ... T8 -> 1 rồi cộng có trọng số (khóa trọng số <field>_Tscore
+        như adjust_weights_for_correlation). Nếu không có cột _Tscore thì dùng giá trị thô.
         """
         # Các cột thông tin cần giữ
         info_cols = ['taxcode', 'sector_unique_id', 'yearreport']
         result = df[info_cols].copy()
 
         for group, fields in group_field_mapping.items():
-            # Lọc các field thực sự có trong df
-            valid_fields = [f for f in fields if f in df.columns]
-            if not valid_fields:
+            # Lọc các field thực sự có trong df (ưu tiên cột T-score)
+            columns = {}
+            for f in fields:
+                if f"{f}_Tscore" in df.columns:
+                    columns[f"{f}_Tscore"] = tscore_points(tscore_codes(df[f"{f}_Tscore"]))
+                elif f in df.columns:
+                    columns[f] = pd.to_numeric(df[f], errors='coerce').to_numpy(dtype=float)
+            if not columns:
                 result[f"{group}_Score"] = np.nan
                 continue
 
             # Lấy trọng số
             if weights is None:
-                group_weights = {col: 1.0 for col in valid_fields}
+                group_weights = {col: 1.0 for col in columns}
             else:
-                group_weights = {col: weights.get(col, 1.0) for col in valid_fields}
+                group_weights = {col: weights.get(col, 1.0) for col in columns}
 
             # Tính tổng có trọng số
-            weighted_sum = pd.Series(0, index=df.index, dtype=float)
-            total_weight = pd.Series(0, index=df.index, dtype=float)
-            
-            for col in valid_fields:
+            weighted_sum = np.zeros(len(df), dtype=float)
+            total_weight = np.zeros(len(df), dtype=float)
+
+            for col, values in columns.items():
                 w = group_weights.get(col, 1.0)
-                weighted_sum += df[col].fillna(0) * w
-                total_weight += w * df[col].notna().astype(float)
-            
+                present = ~np.isnan(values)
+                weighted_sum += np.where(present, values, 0.0) * w
+                total_weight += w * present
+
             with np.errstate(divide='ignore', invalid='ignore'):
                 group_raw = weighted_sum / total_weight
                 group_raw[total_weight == 0] = np.nan
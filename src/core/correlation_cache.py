@@ -0,0 +1,127 @@
+"""
+Cache ma trận tương quan theo dấu vân tay (fingerprint) của dữ liệu
+Ma trận tương quan pairwise-complete của mọi chỉ số được tính một lần (một lượt nhân ma trận),
+các nhóm chỉ lấy lát cắt. Kết quả được giữ trong bộ nhớ và (nếu có cache_dir) lưu ra file .npz
+để lần chạy sau trên cùng dữ liệu bỏ qua bước tính.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.core.sketch import RunningCorrelation
+
+
+def data_fingerprint(values, columns, sample_rows=4096):
+    """
+    Dấu vân tay nội dung rẻ của các cột: tên cột, số dòng, và với mỗi cột: số giá trị thiếu,
+    tổng, tổng bình phương, tổng có trọng số theo vị trí dòng (nhạy với hoán vị),
+    cộng với bytes của một mẫu dòng cách đều. Chỉ vài phép rút gọn vector trên dữ liệu.
+
+    Parameters:
+        values: ndarray float (rows × columns)
+    """
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    filled = np.where(missing, 0.0, values)
+    position = np.linspace(1.0, 2.0, len(values))
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((list(columns), values.shape)).encode())
+    for stat in (missing.sum(axis=0), filled.sum(axis=0), (filled ** 2).sum(axis=0), position @ filled):
+        digest.update(np.ascontiguousarray(stat, dtype=float).data)
+    step = max(1, len(values) // sample_rows)
+    digest.update(np.ascontiguousarray(values[::step]).data)
+    return digest.hexdigest()
+
+
+def correlation_matrix(values):
+    """
+    Ma trận tương quan Pearson pairwise-complete (như DataFrame.corr()) của ndarray (rows × cols)
+    trong một lượt nhân ma trận.
+    """
+    values = np.asarray(values, dtype=float)
+    return RunningCorrelation(range(values.shape[1])).update(values).correlation()
+
+
+def group_slices(corr, group_field_mapping, min_fields=1):
+    """{group: lát cắt của ma trận tương quan chung cho các chỉ số của nhóm}, bỏ nhóm có ít hơn min_fields chỉ số."""
+    slices = {}
+    for group, fields in group_field_mapping.items():
+        cols = [f for f in fields if f in corr.columns]
+        if len(cols) >= max(min_fields, 1):
+            slices[group] = corr.loc[cols, cols]
+    return slices
+
+
+class CorrelationCache:
+    """
+    Cache ma trận tương quan theo fingerprint dữ liệu.
+
+    Parameters:
+        cache_dir: thư mục lưu file corr_<fingerprint>.npz (None = chỉ cache trong bộ nhớ)
+        max_entries: số ma trận tối đa giữ trong bộ nhớ
+    """
+
+    def __init__(self, cache_dir=None, max_entries=8):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, fingerprint):
+        return os.path.join(self.cache_dir, f"corr_{fingerprint}.npz")
+
+    def _remember(self, fingerprint, corr):
+        self._entries[fingerprint] = corr
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def correlation(self, df, columns):
+        """Ma trận tương quan (DataFrame columns × columns) của df[columns], lấy từ cache nếu có."""
+        columns = list(columns)
+        values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+        fingerprint = data_fingerprint(values, columns)
+
+        corr = self._entries.get(fingerprint)
+        if corr is not None:
+            self.hits += 1
+            self._entries.move_to_end(fingerprint)
+            return corr
+
+        if self.cache_dir and os.path.exists(self._path(fingerprint)):
+            with np.load(self._path(fingerprint), allow_pickle=False) as data:
+                if list(data['columns']) == columns:
+                    corr = pd.DataFrame(data['corr'], index=columns, columns=columns)
+
+        if corr is None:
+            self.misses += 1
+            corr = pd.DataFrame(correlation_matrix(values), index=columns, columns=columns)
+            if self.cache_dir:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez(self._path(fingerprint), columns=np.array(columns, dtype=str), corr=corr.to_numpy())
+        else:
+            self.hits += 1
+
+        self._remember(fingerprint, corr)
+        return corr
+
+    def group_correlations(self, df, group_field_mapping, min_fields=1):
+        """
+        {group: ma trận tương quan của các chỉ số trong nhóm có trong df}, lát cắt từ một ma trận
+        chung của mọi chỉ số; bỏ qua nhóm có ít hơn min_fields chỉ số.
+        """
+        columns = [col for col in dict.fromkeys(f for fields in group_field_mapping.values() for f in fields)
+                   if col in df.columns]
+        if not columns:
+            return {}
+        return group_slices(self.correlation(df, columns), group_field_mapping, min_fields)
+
+    def clear(self):
+        """Xóa cache trong bộ nhớ (file trên đĩa được giữ lại)."""
+        self._entries.clear()
@@ -0,0 +1,214 @@
+"""
+Trọng số điều chỉnh theo tương quan do client gửi (API /process-groups, process_with_new_algorithm)
+Client gửi ma trận tương quan của từng nhóm chỉ số; các chỉ số tương quan mạnh (cùng cụm
+|corr| > ngưỡng) chia nhau trọng số. Hệ số suy ra từ mỗi ma trận được cache LRU theo hash của
+(nhóm, danh sách chỉ số, ma trận, ngưỡng), nên ma trận gửi lặp lại chỉ được phân tích một lần.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.core.binning import N_BINS, T_LABELS, tscore_codes, tscore_points
+from src.core.clustering import cluster_labels, linkage_edges
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCorrelationScorer:
+    """
+    Suy ra trọng số theo cụm tương quan từ ma trận tương quan của từng nhóm.
+
+    Ma trận của một nhóm có thể gửi dưới dạng:
+        - list k × k theo thứ tự chỉ số của nhóm trong group_field_mapping
+          (list sai kích thước, ví dụ ma trận con 2 × 2, bị bỏ qua kèm cảnh báo trong log)
+        - {"fields": [...], "matrix": [[...]]} với thứ tự chỉ số tùy ý
+        - DataFrame (index/columns là tên chỉ số)
+
+    Parameters:
+        group_field_mapping: dict {group: [fields]}
+        threshold: ngưỡng |corr| để gom cụm (mặc định như CorrelationAnalyzer)
+        default_weights: dict {field: weight} dùng khi request không gửi weight cho chỉ số
+        cache_size: số ma trận tối đa giữ trong cache LRU
+    """
+
+    def __init__(self, group_field_mapping, threshold=0.9, default_weights=None, cache_size=256):
+        self.group_field_mapping = group_field_mapping
+        self.threshold = threshold
+        self.default_weights = dict(default_weights or {})
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse_matrix(self, group, matrix):
+        """
+        (fields, ndarray k × k) từ ma trận gửi lên; ValueError nếu không hợp lệ.
+        Trả về None nếu là list không đủ k × k: không biết list ứng với chỉ số nào nên bỏ qua.
+        """
+        if group not in self.group_field_mapping:
+            raise ValueError(f"Unknown group '{group}' in 'correlation_matrices'")
+
+        if isinstance(matrix, pd.DataFrame):
+            fields, values = list(matrix.columns), matrix.to_numpy(dtype=float, na_value=np.nan)
+        elif isinstance(matrix, dict):
+            fields, values = matrix.get('fields'), matrix.get('matrix')
+            if not isinstance(fields, list) or not set(fields) <= set(self.group_field_mapping[group]):
+                raise ValueError(f"'fields' of correlation matrix '{group}' must list indicators of the group")
+        else:
+            fields, values = list(self.group_field_mapping[group]), matrix
+
+        try:
+            values = np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError(f"Correlation matrix '{group}' must contain numbers") from None
+        if values.shape != (len(fields), len(fields)) and not isinstance(matrix, (dict, pd.DataFrame)):
+            logger.warning(
+                "Ignoring correlation matrix '%s' of shape %s: a list must be %d x %d in mapping order, "
+                "send {'fields': [...], 'matrix': [...]} for a subset of indicators",
+                group, values.shape, len(fields), len(fields)
+            )
+            return None
+        if values.shape != (len(fields), len(fields)):
+            raise ValueError(f"Correlation matrix '{group}' must be {len(fields)} x {len(fields)}")
+        return fields, values
+
+    def group_factors(self, group, matrix, threshold=None):
+        """
+        Hệ số trọng số {field: 1 / kích thước cụm} của một nhóm, lấy từ cache nếu ma trận đã gặp
+        ({} nếu ma trận bị bỏ qua).
+        """
+        threshold = self.threshold if threshold is None else float(threshold)
+        parsed = self.parse_matrix(group, matrix)
+        if parsed is None:
+            return {}
+        fields, values = parsed
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((group, fields, threshold)).encode())
+        digest.update(np.ascontiguousarray(values).data)
+        key = digest.hexdigest()
+
+        with self._lock:
+            factors = self._cache.get(key)
+            if factors is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return factors
+
+        labels = cluster_labels(len(fields), linkage_edges(values), threshold)
+        sizes = np.bincount(labels) if len(fields) else np.empty(0)
+        factors = {field: 1.0 / sizes[label] for field, label in zip(fields, labels)}
+
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = factors
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return factors
+
+    def adjusted_weights(self, correlation_matrices, weights=None, threshold=None):
+        """
+        Trọng số chỉ số sau điều chỉnh tương quan: weight gửi lên (hoặc mặc định) × hệ số cụm.
+        Các chỉ số không nằm trong ma trận nào giữ nguyên weight gửi lên.
+        """
+        if not isinstance(correlation_matrices, dict):
+            raise ValueError("'correlation_matrices' must be an object mapping group -> matrix")
+        if weights is not None and not isinstance(weights, dict):
+            raise ValueError("'weights' must be an object mapping indicator -> weight")
+
+        adjusted = dict(weights or {})
+        for group, matrix in correlation_matrices.items():
+            for field, factor in self.group_factors(group, matrix, threshold).items():
+                base = adjusted.get(field, self.default_weights.get(field, 1.0))
+                adjusted[field] = float(base) * factor
+        return adjusted
+
+    def score(self, correlation_matrices, group_scores, threshold=None):
+        """
+        Điểm T của từng nhóm cho một công ty: trung bình có trọng số (hệ số cụm) của điểm T các chỉ số.
+
+        Parameters:
+            group_scores: {group: {field: 'T1'..'T8'}} hoặc {group: [T-score theo thứ tự chỉ số của ma trận]}
+
+        Return:
+            {group: 'T1'..'T8' hoặc None nếu nhóm không có điểm}
+        """
+        results = {}
+        for group, scores in group_scores.items():
+            matrix = correlation_matrices.get(group)
+            if matrix is not None:
+                factors = self.group_factors(group, matrix, threshold)
+            else:
+                factors = {}
+
+            if not isinstance(scores, dict):
+                fields = list(factors) if factors else list(self.group_field_mapping.get(group, []))
+                if len(scores) != len(fields):
+                    raise ValueError(f"Group '{group}' has {len(scores)} scores for {len(fields)} indicators")
+                scores = dict(zip(fields, scores))
+
+            fields = list(scores)
+            points = tscore_points(tscore_codes(pd.Series([scores[f] for f in fields], dtype=object)))
+            weight = np.array([factors.get(f, 1.0) for f in fields])
+            present = ~np.isnan(points)
+            if not present.any():
+                results[group] = None
+                continue
+
+            mean_points = np.average(points[present], weights=weight[present])
+            code = int(np.clip(N_BINS + 1 - np.floor(mean_points + 0.5), 1, N_BINS))
+            results[group] = T_LABELS[code]
+        return results
+
+    def score_frame(self, correlation_matrices, scored_df, threshold=None):
+        """
+        Điểm T từng nhóm cho MỌI công ty trong scored_df (cột <field>_Tscore), cùng công thức với score():
+        mỗi nhóm là một phép nhân ma trận (dòng × chỉ số) @ hệ số cụm, chi phí tuyến tính theo dòng × chỉ số.
+
+        Return:
+            {group: ndarray uint8 mã T (0 = không có điểm)}
+        """
+        results = {}
+        for group, fields in self.group_field_mapping.items():
+            fields = [f for f in fields if f"{f}_Tscore" in scored_df.columns]
+            matrix = correlation_matrices.get(group)
+            factors = self.group_factors(group, matrix, threshold) if matrix is not None else {}
+            if not fields:
+                results[group] = np.zeros(len(scored_df), dtype=np.uint8)
+                continue
+
+            points = np.column_stack([tscore_points(tscore_codes(scored_df[f"{f}_Tscore"])) for f in fields])
+            weight = np.array([factors.get(f, 1.0) for f in fields])
+            present = ~np.isnan(points)
+            weighted_sum = np.where(present, points, 0.0) @ weight
+            total_weight = present @ weight
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean_points = weighted_sum / total_weight
+            codes = np.clip(N_BINS + 1 - np.floor(mean_points + 0.5), 1, N_BINS)
+            results[group] = np.where(total_weight > 0, codes, 0).astype(np.uint8)
+        return results
+
+    def cache_info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache), 'max_size': self.cache_size}
+
+
+def process_company_scoring(group_correlation_matrices, group_scores, epsilon=0.1, group_field_mapping=None):
+    """
+    Điểm T từng nhóm của một công ty với trọng số theo cụm tương quan, ngưỡng |corr| > 1 - epsilon.
+
+    Parameters:
+        group_correlation_matrices: {group: ma trận tương quan (DataFrame hoặc list)}
+        group_scores: {group: {field: T-score}} hoặc {group: [T-score theo thứ tự ma trận]}
+    """
+    if group_field_mapping is None:
+        from src.config.field_mapping import FIELD_MAPPING as group_field_mapping
+    scorer = GroupCorrelationScorer(group_field_mapping, threshold=1 - epsilon)
+    return scorer.score(group_correlation_matrices, group_scores)
@@ -1,116 +1,344 @@
-import pandas as pd
-import numpy as np
-
-def field_score(data_df, group_field_mapping, good_bad_mapping, weights=None):
-    
-    """
-    Tính điểm tổng hợp theo nhóm chỉ số từ DataFrame, trả về DataFrame gồm:
-    taxcode, sector_unique_id_raw và các cột điểm nhóm.
-
-    Parameters:
-        data_df: pandas DataFrame (dữ liệu gốc)
-        group_field_mapping: dict {group: [fields]}
-        good_bad_mapping: dict {field: 'high' or 'low'}
-        weights: dict {field: weight}, nếu None thì mỗi field có weight=1
-
-    Return:
-        DataFrame gồm các cột: taxcode, sector_unique_id_raw, <group>_Score
-    """
-    
-    # Lấy các cột thông tin tồn tại trong DataFrame
-    info_cols = ['taxcode', 'sector_unique_id_raw', 'yearreport']
-    valid_info_cols = [col for col in info_cols if col in data_df.columns]
-    result_df = data_df[valid_info_cols].copy()
-
-    for group, fields in group_field_mapping.items():
-        # Lọc các field thực sự có trong data_df
-        valid_fields = [f for f in fields if f in data_df.columns]
-        if not valid_fields:
-            result_df[f"{group}_Score"] = np.nan
-            continue
-
-        # Lấy trọng số (mặc định 1.0)
-        if weights is None:
-            group_weights = {col: 1.0 for col in valid_fields}
-        else:
-            group_weights = {col: weights.get(col, 1.0) for col in valid_fields}
-
-        # Xác định hướng tốt (good_bad_mapping) để áp dấu
-        signs = {}
-        for col in valid_fields:
-            direction = good_bad_mapping.get(col, "")
-            is_low_good = isinstance(direction, str) and "low" in direction.lower()
-            signs[col] = -1.0 if is_low_good else 1.0
-
-        # Tính tổng có trọng số và tổng trọng số
-        weighted_sum = pd.Series(0.0, index=data_df.index)
-        total_abs_weight = pd.Series(0.0, index=data_df.index)
-
-        for field in valid_fields:
-            w = group_weights[field]
-            # Bỏ qua các trường có trọng số bằng 0 để không ảnh hưởng đến mẫu số
-            if w == 0:
-                continue
-
-            values = pd.to_numeric(data_df[field], errors='coerce')
-            s = signs[field]
-            
-            # Cộng vào tổng có trọng số, bỏ qua NaN
-            weighted_sum += (values * w * s).fillna(0)
-            
-            # Cộng vào tổng trọng số tuyệt đối cho các giá trị không phải NaN
-            total_abs_weight += (~values.isna()) * np.abs(w)
-
-        # Tính điểm trung bình có trọng số, tránh chia cho 0
-        group_score = weighted_sum.divide(total_abs_weight).replace([np.inf, -np.inf], np.nan)
-        result_df[f"{group}_Score"] = group_score
-
-    return result_df
-
-
-def assign_scores_field(field_scores_df, group_field_mapping):
-    """
-    Chia thang điểm T1–T8 cho từng nhóm theo khoảng min–max của toàn bộ dữ liệu.
-    - Chia đều thành 8 phần
-    - Cao nhất → T1, thấp nhất → T8
-    """
-    # Lấy các cột thông tin tồn tại
-    info_cols = ['taxcode', 'sector_unique_id_raw', 'yearreport']
-    valid_info_cols = [col for col in info_cols if col in field_scores_df.columns]
-    result_df = field_scores_df[valid_info_cols].copy()
-
-    for group in group_field_mapping.keys():
-        score_col_name = f"{group}_Score"
-        t_score_col_name = f"{group}_TScore"
-
-        if score_col_name not in field_scores_df.columns:
-            result_df[t_score_col_name] = ""
-            continue
-
-        series = field_scores_df[score_col_name].dropna()
-        
-        # Khởi tạo cột TScore
-        result_df[t_score_col_name] = pd.Series(dtype='object')
-
-        if series.empty:
-            continue
-
-        min_val, max_val = series.min(), series.max()
-
-        if min_val == max_val:
-            # Nếu tất cả giá trị bằng nhau -> gán T4
-            result_df.loc[series.index, t_score_col_name] = "T4"
-            continue
-
-        # Tạo 8 bins từ min đến max
-        bins = np.linspace(min_val, max_val, 9)
-        
-        # Nhãn: T8 (thấp nhất) -> T1 (cao nhất)
-        labels = [f"T{i}" for i in range(8, 0, -1)]
-
-        # Dùng pd.cut để gán nhãn
-        t_scores = pd.cut(series, bins=bins, labels=labels, include_lowest=True)
-        
-        result_df.loc[series.index, t_score_col_name] = t_scores.astype(str)
-
-    return result_df
+import pandas as pd
+import numpy as np
+
+from src.core.binning import N_BINS, partition_levels, tscore_categorical
+
+def field_score(data_df, group_field_mapping, good_bad_mapping, weights=None):
+    
+    """
+    Tính điểm tổng hợp theo nhóm chỉ số từ DataFrame, trả về DataFrame gồm:
+    taxcode, sector_unique_id_raw và các cột điểm nhóm.
+
+    Parameters:
+        data_df: pandas DataFrame (dữ liệu gốc)
+        group_field_mapping: dict {group: [fields]}
+        good_bad_mapping: dict {field: 'high' or 'low'}
+        weights: dict {field: weight}, nếu None thì mỗi field có weight=1
+
+    Return:
+        DataFrame gồm các cột: taxcode, sector_unique_id_raw, <group>_Score
+    """
+    
+    plan = ScoringPlan.compile(group_field_mapping, good_bad_mapping)
+    return plan.score(data_df, weights)
+
+
+class ScoringPlan:
+    """
+    Kế hoạch chấm điểm biên dịch sẵn từ FIELD_MAPPING / GOOD_BAD_MAPPING.
+
+    Giữ chỉ mục field -> cột, field -> nhóm, vector dấu và vector trọng số mặc định dưới dạng
+    mảng NumPy để mỗi request chỉ còn việc chọn cột và (nếu có) ghi đè trọng số.
+    Đối tượng không thay đổi sau khi biên dịch nên có thể dùng chung giữa các thread.
+    """
+
+    info_cols = ['taxcode', 'sector_unique_id_raw', 'yearreport']
+
+    def __init__(self, group_field_mapping, fields, groups, membership, signs, default_weights):
+        self.group_field_mapping = group_field_mapping
+        self.fields = fields
+        self.groups = groups
+        self.field_index = {f: i for i, f in enumerate(fields)}
+        self.group_index = {g: j for j, g in enumerate(groups)}
+        # membership: (fields × groups) bool
+        self.membership = membership
+        self.signs = signs
+        self.default_weights = default_weights
+        self.default_weight_matrix = self._build_weight_matrix(default_weights)
+
+    @classmethod
+    def compile(cls, group_field_mapping, good_bad_mapping, default_weights=None):
+        """
+        Biên dịch plan từ các mapping cấu hình.
+
+        Parameters:
+            group_field_mapping: dict {group: [fields]}
+            good_bad_mapping: dict {field: 'high' or 'low'}
+            default_weights: dict {field: weight}, nếu None thì mỗi field có weight=1
+        """
+        groups = list(group_field_mapping.keys())
+        fields = []
+        for group_fields in group_field_mapping.values():
+            for f in group_fields:
+                if f not in fields:
+                    fields.append(f)
+
+        field_index = {f: i for i, f in enumerate(fields)}
+        membership = np.zeros((len(fields), len(groups)), dtype=bool)
+        for j, group in enumerate(groups):
+            for f in group_field_mapping[group]:
+                membership[field_index[f], j] = True
+
+        # Xác định hướng tốt (good_bad_mapping) để áp dấu
+        signs = np.ones(len(fields), dtype=float)
+        for i, f in enumerate(fields):
+            direction = good_bad_mapping.get(f, "")
+            if isinstance(direction, str) and "low" in direction.lower():
+                signs[i] = -1.0
+
+        weights = np.ones(len(fields), dtype=float)
+        if default_weights:
+            for f, w in default_weights.items():
+                if f in field_index:
+                    weights[field_index[f]] = float(w)
+
+        return cls(dict(group_field_mapping), fields, groups, membership, signs, weights)
+
+    def _build_weight_matrix(self, weight_vector):
+        return self.membership * (self.signs * weight_vector)[:, None]
+
+    def weight_matrix(self, weights=None):
+        """
+        Ma trận trọng số có dấu (fields × groups). Không có weights -> dùng ma trận dựng sẵn,
+        ngược lại chỉ ghi đè các phần tử được gửi lên trên vector mặc định.
+        """
+        if not weights:
+            return self.default_weight_matrix
+        if not isinstance(weights, dict):
+            raise ValueError("'weights' must be an object mapping indicator -> weight")
+
+        overrides = [(self.field_index[f], w) for f, w in weights.items() if f in self.field_index]
+        if not overrides:
+            return self.default_weight_matrix
+
+        weight_vector = self.default_weights.copy()
+        idx, values = zip(*overrides)
+        weight_vector[list(idx)] = np.asarray(values, dtype=float)
+        return self._build_weight_matrix(weight_vector)
+
+    def score_matrix(self, values, weights=None, field_positions=None):
+        """
+        Điểm nhóm cho ma trận giá trị (rows × fields).
+
+        Parameters:
+            values: ndarray, cột theo thứ tự self.fields hoặc theo field_positions
+            field_positions: chỉ số field trong plan tương ứng với từng cột của values
+
+        Return:
+            ndarray (rows × groups)
+        """
+        matrix = self.weight_matrix(weights)
+        if field_positions is not None:
+            matrix = matrix[field_positions]
+        return weighted_group_scores(values, matrix)
+
+    def score(self, data_df, weights=None):
+        """
+        Tính điểm tổng hợp theo nhóm, trả về DataFrame gồm
+        taxcode, sector_unique_id_raw, yearreport (nếu có) và các cột <group>_Score.
+        """
+        valid_info_cols = [col for col in self.info_cols if col in data_df.columns]
+        result_df = data_df[valid_info_cols].copy()
+
+        # Lọc các field thực sự có trong data_df
+        present = [f for f in self.fields if f in data_df.columns]
+        positions = [self.field_index[f] for f in present]
+
+        values = numeric_matrix(data_df, present)
+        group_scores = self.score_matrix(values, weights, positions)
+
+        for j, group in enumerate(self.groups):
+            result_df[f"{group}_Score"] = group_scores[:, j]
+
+        return result_df
+
+
+def numeric_matrix(data_df, fields):
+    """Chuyển các cột chỉ số thành một ma trận float liên tục (giá trị không hợp lệ -> NaN)."""
+    block = data_df[fields]
+    non_numeric = [col for col in fields if not pd.api.types.is_numeric_dtype(block[col])]
+    if non_numeric:
+        block = block.copy()
+        for col in non_numeric:
+            block[col] = pd.to_numeric(block[col], errors='coerce')
+    return block.to_numpy(dtype=float, na_value=np.nan)
+
+
+def numeric_values(values):
+    """Mảng float từ một danh sách giá trị bất kỳ, cùng quy tắc với numeric_matrix (không hợp lệ -> NaN)."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+
+def weighted_group_scores(values, weight_matrix):
+    """
+    Điểm trung bình có trọng số cho mọi nhóm bằng phép nhân ma trận có mặt nạ.
+
+    Parameters:
+        values: ndarray (rows × fields), NaN = thiếu dữ liệu
+        weight_matrix: ndarray (fields × groups) trọng số có dấu
+
+    Return:
+        ndarray (rows × groups); NaN nếu tổng trọng số bằng 0 hoặc kết quả không hữu hạn
+    """
+    present = ~np.isnan(values)
+    infinite = np.isinf(values)
+    finite_values = np.where(present & ~infinite, values, 0.0)
+
+    # Tổng có trọng số và tổng trọng số tuyệt đối của các giá trị không phải NaN
+    weighted_sum = finite_values @ weight_matrix
+    total_abs_weight = present.astype(float) @ np.abs(weight_matrix)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        group_scores = weighted_sum / total_abs_weight
+
+    # Giá trị vô cực làm điểm nhóm không hữu hạn -> NaN (giống cách thay inf bằng NaN trước đây)
+    poisoned = (infinite.astype(float) @ (weight_matrix != 0).astype(float)) > 0
+    group_scores[(total_abs_weight == 0) | poisoned | ~np.isfinite(group_scores)] = np.nan
+    return group_scores
+
+
+def group_edges_from_scores(values):
+    """9 biên chia đều khoảng min–max của điểm nhóm (None nếu không có dữ liệu)."""
+    values = np.asarray(pd.to_numeric(values, errors='coerce'), dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return None
+    return np.linspace(values.min(), values.max(), 9)
+
+
+def tscores_from_edges(values, edges):
+    """
+    Gán mã T (uint8, 1 = T1 ... 8 = T8) cho điểm nhóm thô bằng tra cứu biên đã sắp xếp
+    (O(log bins) mỗi giá trị). Giá trị ngoài khoảng biên được kẹp về T8/T1, thiếu -> 0.
+    """
+    values = np.asarray(pd.to_numeric(values, errors='coerce'), dtype=float)
+    result = np.zeros(values.shape, dtype=np.uint8)
+    valid = ~np.isnan(values)
+    if edges is None or not valid.any():
+        return result
+
+    if edges[0] == edges[-1]:
+        # Nếu tất cả giá trị bằng nhau -> gán T4
+        result[valid] = 4
+        return result
+
+    # Bin đóng bên phải (a, b] như pd.cut: searchsorted 'left' trên các biên trong
+    # bin 0 (thấp nhất) -> T8, bin 7 (cao nhất) -> T1
+    bins = np.searchsorted(edges[1:-1], values[valid], side='left')
+    result[valid] = N_BINS - bins
+    return result
+
+
+def assign_scores_matrix(group_scores, groups, calibration=None):
+    """
+    Gán T-score cho ma trận điểm nhóm (rows × groups).
+    Trả về dict {<group>_TScore: mảng mã T uint8}, nhãn chỉ được dựng khi xuất kết quả.
+    """
+    t_scores = {}
+    for j, group in enumerate(groups):
+        values = group_scores[:, j]
+        if calibration is not None and calibration.has_group(group):
+            edges = calibration.group_edges[group]
+        else:
+            edges = group_edges_from_scores(values)
+        t_scores[f"{group}_TScore"] = tscores_from_edges(values, edges)
+    return t_scores
+
+
+def partitioned_tscores(group_scores, levels, min_partition_size=30):
+    """
+    Gán mã T cho ma trận điểm nhóm (rows × groups) với biên min–max riêng của từng partition
+    (ví dụ ngành × năm), tính cho mọi partition cùng lúc bằng reduceat trên dữ liệu đã xếp theo partition.
+    Partition có ít hơn min_partition_size điểm hợp lệ lùi về cấp cha trong levels (cấp cuối luôn được dùng).
+
+    Parameters:
+        group_scores: ndarray (rows × groups)
+        levels: kết quả binning.partition_levels
+
+    Return:
+        ndarray uint8 (rows × groups), 0 = thiếu
+    """
+    values = np.asarray(group_scores, dtype=float)
+    codes = np.zeros(values.shape, dtype=np.uint8)
+    pending = ~np.isnan(values)
+
+    for level, (_, part_ids, n_parts) in enumerate(levels):
+        if not pending.any():
+            break
+        threshold = 1 if level == len(levels) - 1 else max(1, min_partition_size)
+
+        order = np.argsort(part_ids, kind='stable')
+        sizes = np.bincount(part_ids, minlength=n_parts)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[sizes > 0]
+        sorted_values = values[order]
+
+        counts = np.zeros((n_parts, values.shape[1]), dtype=np.intp)
+        lo = np.full((n_parts, values.shape[1]), np.nan)
+        hi = np.full((n_parts, values.shape[1]), np.nan)
+        counts[sizes > 0] = np.add.reduceat(~np.isnan(sorted_values), starts, axis=0)
+        lo[sizes > 0] = np.fmin.reduceat(sorted_values, starts, axis=0)
+        hi[sizes > 0] = np.fmax.reduceat(sorted_values, starts, axis=0)
+        # 9 biên chia đều min–max của từng partition, giống group_edges_from_scores
+        edges = np.linspace(lo, hi, N_BINS + 1, axis=-1)
+
+        for j in range(values.shape[1]):
+            use = pending[:, j] & (counts[part_ids, j] >= threshold)
+            if not use.any():
+                continue
+            v = values[use, j]
+            row_edges = edges[part_ids[use], j]
+            bins = (row_edges[:, 1:-1] < v[:, None]).sum(axis=1)
+            group_codes = (N_BINS - bins).astype(np.uint8)
+            # Nếu tất cả giá trị trong partition bằng nhau -> T4
+            group_codes[row_edges[:, 0] == row_edges[:, -1]] = 4
+            codes[use, j] = group_codes
+            pending[use, j] = False
+
+    return codes
+
+
+def assign_scores_field(field_scores_df, group_field_mapping, calibration=None,
+                        partition_by=None, min_partition_size=30):
+    """
+    Chia thang điểm T1–T8 cho từng nhóm theo khoảng min–max của toàn bộ dữ liệu.
+    - Chia đều thành 8 phần
+    - Cao nhất → T1, thấp nhất → T8
+    - Nếu có calibration: dùng biên cố định của quần thể tham chiếu thay cho min–max của lô hiện tại
+    - Nếu có partition_by (ví dụ ['sector_unique_id_raw', 'yearreport']) và không có calibration:
+      min–max tính riêng theo partition, partition nhỏ hơn min_partition_size lùi về cấp cha
+    - Cột <group>_TScore có kiểu Categorical cố định (TSCORE_DTYPE)
+    """
+    # Lấy các cột thông tin tồn tại
+    info_cols = ['taxcode', 'sector_unique_id_raw', 'yearreport']
+    valid_info_cols = [col for col in info_cols if col in field_scores_df.columns]
+    result_df = field_scores_df[valid_info_cols].copy()
+
+    if partition_by and calibration is None:
+        missing = [col for col in partition_by if col not in field_scores_df.columns]
+        if missing:
+            raise ValueError(f"Partition columns not found: {missing}")
+        groups = [g for g in group_field_mapping.keys() if f"{g}_Score" in field_scores_df.columns]
+        values = field_scores_df[[f"{g}_Score" for g in groups]].apply(pd.to_numeric, errors='coerce')
+        codes = partitioned_tscores(
+            values.to_numpy(dtype=float, na_value=np.nan),
+            partition_levels(field_scores_df, partition_by),
+            min_partition_size
+        )
+        for group in group_field_mapping.keys():
+            if group not in groups:
+                result_df[f"{group}_TScore"] = ""
+                continue
+            result_df[f"{group}_TScore"] = tscore_categorical(codes[:, groups.index(group)], index=field_scores_df.index)
+        return result_df
+
+    for group in group_field_mapping.keys():
+        score_col_name = f"{group}_Score"
+        t_score_col_name = f"{group}_TScore"
+
+        if score_col_name not in field_scores_df.columns:
+            result_df[t_score_col_name] = ""
+            continue
+
+        values = field_scores_df[score_col_name]
+        if calibration is not None and calibration.has_group(group):
+            edges = calibration.group_edges[group]
+        else:
+            edges = group_edges_from_scores(values)
+
+        codes = tscores_from_edges(values, edges)
+        result_df[t_score_col_name] = tscore_categorical(codes, index=field_scores_df.index)
+
+    return result_df
@@ -0,0 +1,278 @@
+"""
+Chấm lại gia tăng (delta) khi một số công ty sửa báo cáo
+Giữ dữ liệu, calibration (biên bin chỉ số, trọng số tương quan, biên bin nhóm) và kết quả của
+toàn bộ quần thể. Với biên cố định, kết quả của một công ty chỉ phụ thuộc dữ liệu của chính nó,
+nên mỗi lần cập nhật chỉ chấm lại các dòng thay đổi.
+
+Độ trôi phân phối được theo dõi bằng số giá trị <= mỗi biên (q_low, 9 biên, q_high) của từng chỉ số
+và từng điểm nhóm thô, cập nhật bằng cách trừ dòng cũ / cộng dòng mới. Khi tỉ lệ tích lũy tại một biên
+lệch khỏi lúc calibration quá drift_tolerance, toàn bộ calibration được tính lại như process_file.
+Trọng số tương quan chỉ được tính lại cùng lần calibration đầy đủ.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.core.binning import column_bin_stats
+from src.core.chunked import ChunkedScoringPipeline
+from src.utils.data_processor import ID_DTYPES, cast_id_columns
+
+KEY_COLUMNS = ['taxcode', 'yearreport']
+RESULT_TABLES = ['scored_individual', 'field_scores', 'final_scores']
+
+
+def _edge_points(stats):
+    """Các điểm theo dõi (cols × 11): q_low, 9 biên bin, q_high."""
+    return np.column_stack([stats['q_low'], stats['edges'], stats['q_high']])
+
+
+def _counts_le(values, points, block_rows=65_536):
+    """Số giá trị <= mỗi điểm theo dõi của từng cột (NaN không được đếm), tính theo khối dòng."""
+    counts = np.zeros(points.shape, dtype=np.int64)
+    for start in range(0, len(values), block_rows):
+        block = values[start:start + block_rows]
+        with np.errstate(invalid='ignore'):
+            counts += (block[:, :, None] <= points[None]).sum(axis=0)
+    return counts
+
+
+class IncrementalScorer:
+    """
+    Chấm điểm gia tăng với calibration cố định (chấm toàn cục, không theo partition).
+
+    Khóa của một dòng là (taxcode, yearreport) (hoặc chỉ taxcode nếu dữ liệu không có yearreport):
+    update() thay các dòng trùng khóa và thêm dòng mới.
+
+    Parameters:
+        drift_tolerance: độ lệch tối đa của tỉ lệ tích lũy tại các biên trước khi calibration lại
+    """
+
+    VERSION = 1
+
+    def __init__(self, group_field_mapping, good_bad_mapping, lower_cut=0.05, upper_cut=0.95,
+                 drift_tolerance=0.01, scorer=None, correlation_analyzer=None):
+        if not drift_tolerance > 0:
+            raise ValueError("drift_tolerance must be positive")
+        self.pipeline = ChunkedScoringPipeline(
+            group_field_mapping, good_bad_mapping, lower_cut=lower_cut, upper_cut=upper_cut,
+            scorer=scorer, correlation_analyzer=correlation_analyzer
+        )
+        self.drift_tolerance = drift_tolerance
+        self.data = None
+        self.results = {}
+        self.tracking = {}
+        self.n_recalibrations = 0
+
+    @property
+    def groups(self):
+        return list(self.pipeline.group_field_mapping.keys())
+
+    # ------------------------------------------------------------------
+    # Khóa và giá trị
+    # ------------------------------------------------------------------
+    @staticmethod
+    def keys(df):
+        """MultiIndex khóa (dạng chuỗi) của các dòng."""
+        columns = [c for c in KEY_COLUMNS if c in df.columns]
+        if 'taxcode' not in columns:
+            raise ValueError("Incremental scoring requires a 'taxcode' column")
+        return pd.MultiIndex.from_arrays([df[c].astype(str).to_numpy() for c in columns], names=columns)
+
+    def _keyed(self, df):
+        # Ép cột định danh theo ID_DTYPES trước khi tạo khóa và nối với dữ liệu cũ: DataFrame đọc bằng
+        # pd.read_csv có taxcode / yearreport kiểu số, nối với giá trị chuỗi sẽ không lưu được ra Parquet
+        df = cast_id_columns(df)
+        df.index = self.keys(df)
+        return df
+
+    def _tracked_values(self, data, field_scores):
+        """{tên: ma trận giá trị} của các phân phối được theo dõi (chỉ số đã lọc trường hợp đặc biệt, điểm nhóm thô)."""
+        indicators, _ = self.pipeline._masked_values(data)
+        groups = field_scores[[f"{g}_Score" for g in self.groups]].to_numpy(dtype=float, na_value=np.nan)
+        return {'indicators': indicators, 'groups': groups}
+
+    # ------------------------------------------------------------------
+    # Calibration đầy đủ
+    # ------------------------------------------------------------------
+    def fit(self, df):
+        """Calibration và chấm toàn bộ df. ValueError nếu có khóa trùng."""
+        df = self._keyed(df)
+        if df.index.has_duplicates:
+            raise ValueError("Duplicate (taxcode, yearreport) keys in data")
+        self.data = df
+        self.recalibrate()
+        return self
+
+    def recalibrate(self):
+        """Tính lại biên bin, trọng số và kết quả trên toàn bộ dữ liệu hiện có (như process_file)."""
+        if self.data is None:
+            raise RuntimeError("Scorer is not fitted; call fit() first")
+        p = self.pipeline
+
+        p.fields = [f for f in p.good_bad_mapping if f in self.data.columns]
+        indicator_values, _ = p._masked_values(self.data)
+        p.indicator_stats = column_bin_stats(indicator_values, p.lower_cut, p.upper_cut)
+        p.correlation_matrices = p.correlation_analyzer.cache.group_correlations(self.data, p.group_field_mapping)
+        p.weights = p.correlation_analyzer.weights_from_correlation(p.correlation_matrices)
+
+        scored = p.score_indicators(self.data)
+        field_scores = p.group_scores(scored)
+        values = self._tracked_values(self.data, field_scores)
+        p.group_stats = column_bin_stats(values['groups'], p.lower_cut, p.upper_cut)
+        p.n_rows = len(self.data)
+
+        self.results = {'scored_individual': scored, 'field_scores': field_scores,
+                        'final_scores': p.final_scores(field_scores)}
+
+        self.tracking = {}
+        for name, stats in (('indicators', p.indicator_stats), ('groups', p.group_stats)):
+            points = _edge_points(stats)
+            counts_le = _counts_le(values[name], points)
+            count = (~np.isnan(values[name])).sum(axis=0)
+            self.tracking[name] = {
+                'points': points,
+                'counts_le': counts_le,
+                'count': count,
+                'baseline': counts_le / np.maximum(count, 1)[:, None],
+            }
+        self.n_recalibrations += 1
+        return self
+
+    # ------------------------------------------------------------------
+    # Độ trôi
+    # ------------------------------------------------------------------
+    def _shift(self, values, sign):
+        for name, matrix in values.items():
+            track = self.tracking[name]
+            track['counts_le'] += sign * _counts_le(matrix, track['points'])
+            track['count'] += sign * (~np.isnan(matrix)).sum(axis=0)
+
+    def drift(self):
+        """Series độ lệch lớn nhất của tỉ lệ tích lũy tại các biên, theo chỉ số và theo <group>_Score."""
+        labels = {'indicators': self.pipeline.fields, 'groups': [f"{g}_Score" for g in self.groups]}
+        parts = []
+        for name, track in self.tracking.items():
+            current = track['counts_le'] / np.maximum(track['count'], 1)[:, None]
+            deviation = np.abs(current - track['baseline']).max(axis=1, initial=0.0)
+            parts.append(pd.Series(np.where(track['count'] > 0, deviation, 0.0), index=labels[name]))
+        return pd.concat(parts)
+
+    # ------------------------------------------------------------------
+    # Cập nhật gia tăng
+    # ------------------------------------------------------------------
+    def update(self, changed):
+        """
+        Thay/thêm các dòng của changed và chấm lại chỉ các dòng đó; calibration lại toàn bộ nếu drift
+        vượt drift_tolerance.
+
+        Return:
+            dict {'scored_individual', 'field_scores', 'final_scores'} của các dòng thay đổi,
+            'recalibrated': bool, 'drift': Series độ trôi trước khi (nếu có) calibration lại
+        """
+        if self.data is None:
+            raise RuntimeError("Scorer is not fitted; call fit() first")
+        changed = self._keyed(changed)
+        changed = changed[~changed.index.duplicated(keep='last')]
+        replaced = self.data.index.isin(changed.index)
+
+        p = self.pipeline
+        new_results = p.transform(changed)
+        self._shift(self._tracked_values(self.data[replaced], self.results['field_scores'][replaced]), -1)
+        self._shift(self._tracked_values(changed, new_results['field_scores']), 1)
+
+        self.data = pd.concat([self.data[~replaced], changed])
+        for table in RESULT_TABLES:
+            self.results[table] = pd.concat([self.results[table][~replaced], new_results[table]])
+
+        drift = self.drift()
+        recalibrated = bool(drift.to_numpy().max(initial=0.0) > self.drift_tolerance)
+        if recalibrated:
+            self.recalibrate()
+            new_results = {table: self.results[table].loc[changed.index] for table in RESULT_TABLES}
+
+        return {**new_results, 'recalibrated': recalibrated, 'drift': drift}
+
+    # ------------------------------------------------------------------
+    # Lưu / tải
+    # ------------------------------------------------------------------
+    def save(self, directory):
+        """Lưu dữ liệu, kết quả (Parquet) và calibration + trạng thái theo dõi (JSON) vào thư mục."""
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Saving incremental state requires pyarrow: pip install pyarrow") from None
+        if self.data is None:
+            raise RuntimeError("Scorer is not fitted; call fit() first")
+
+        os.makedirs(directory, exist_ok=True)
+        self.data.to_parquet(os.path.join(directory, "data.parquet"), index=False)
+        for table in RESULT_TABLES:
+            self.results[table].to_parquet(os.path.join(directory, f"{table}.parquet"), index=False)
+
+        p = self.pipeline
+        state = {
+            'version': self.VERSION,
+            'lower_cut': p.lower_cut,
+            'upper_cut': p.upper_cut,
+            'drift_tolerance': self.drift_tolerance,
+            'n_recalibrations': self.n_recalibrations,
+            'fields': p.fields,
+            'weights': p.weights,
+            'correlation_matrices': {
+                group: {'fields': list(corr.columns), 'matrix': corr.to_numpy().tolist()}
+                for group, corr in p.correlation_matrices.items()
+            },
+            'indicator_stats': {k: np.asarray(v).tolist() for k, v in p.indicator_stats.items()},
+            'group_stats': {k: np.asarray(v).tolist() for k, v in p.group_stats.items()},
+            'tracking': {
+                name: {k: np.asarray(v).tolist() for k, v in track.items()}
+                for name, track in self.tracking.items()
+            },
+        }
+        with open(os.path.join(directory, "state.json"), 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, directory, group_field_mapping, good_bad_mapping, scorer=None, correlation_analyzer=None):
+        """Đọc trạng thái đã lưu bằng save()."""
+        with open(os.path.join(directory, "state.json"), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported incremental state version: {state.get('version')}")
+
+        self = cls(group_field_mapping, good_bad_mapping, state['lower_cut'], state['upper_cut'],
+                   state['drift_tolerance'], scorer, correlation_analyzer)
+        self.n_recalibrations = state['n_recalibrations']
+
+        p = self.pipeline
+        p.fields = state['fields']
+        p.weights = state['weights']
+        p.correlation_matrices = {
+            group: pd.DataFrame(item['matrix'], index=item['fields'], columns=item['fields'], dtype=float)
+            for group, item in state['correlation_matrices'].items()
+        }
+        int_keys = ('count', 'n_unique', 'counts_le')
+        p.indicator_stats, p.group_stats = (
+            {k: np.asarray(v, dtype=np.int64 if k in int_keys else float) for k, v in state[name].items()}
+            for name in ('indicator_stats', 'group_stats')
+        )
+        self.tracking = {
+            name: {k: np.asarray(v, dtype=np.int64 if k in int_keys else float) for k, v in track.items()}
+            for name, track in state['tracking'].items()
+        }
+
+        def read(name):
+            # Parquet không giữ kiểu category của cột định danh -> ép lại như khi tải dữ liệu
+            frame = pd.read_parquet(os.path.join(directory, f"{name}.parquet"))
+            return frame.astype({c: t for c, t in ID_DTYPES.items() if c in frame.columns})
+
+        self.data = self._keyed(read("data"))
+        p.n_rows = len(self.data)
+        for table in RESULT_TABLES:
+            frame = read(table)
+            frame.index = self.data.index
+            self.results[table] = frame
+        return self
@@ -0,0 +1,78 @@
+"""
+Chạy kernel chia bin song song theo khối cột trên process pool
+Ma trận giá trị (và mã partition) được đặt vào SharedDataset một lần, worker gắn view NumPy
+qua handle thay vì nhận bản sao pickle của DataFrame. Kết quả được ghép theo đúng thứ tự cột.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.core.binning import assign_bin_codes, column_bin_stats, partitioned_bin_codes
+from src.utils.shared_dataset import SharedDataset
+
+
+def resolve_n_jobs(n_jobs):
+    """Số tiến trình thực tế: None/0/1 -> 1, -1 -> số CPU, -2 -> số CPU - 1, ..."""
+    if not n_jobs:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return int(n_jobs)
+
+
+def _score_block(handle, cols, high_good, lower_cut, upper_cut, min_count, n_parts, min_partition_size):
+    """Worker: chấm một khối cột của ma trận dùng chung."""
+    with SharedDataset.attach(handle) as dataset:
+        # Chỉ sao chép các cột của khối; view vào vùng nhớ dùng chung không được giữ lại sau khi đóng
+        block = dataset.values[:, cols]
+        levels = None
+        if n_parts is not None:
+            levels = [(None, np.array(dataset['part_ids'][:, k]), n) for k, n in enumerate(n_parts)]
+
+    if levels is None:
+        codes = assign_bin_codes(block, column_bin_stats(block, lower_cut, upper_cut), high_good, min_count)
+    else:
+        codes = partitioned_bin_codes(block, levels, high_good, lower_cut, upper_cut, min_count, min_partition_size)
+    return cols, codes
+
+
+def bin_codes(values, high_good, lower_cut=0.05, upper_cut=0.95, min_count=3,
+              levels=None, min_partition_size=30, n_jobs=1):
+    """
+    Mã T (uint8) cho ma trận giá trị (rows × cols), toàn cục hoặc theo partition (levels).
+
+    n_jobs > 1 (hoặc -1 = mọi CPU): chia các cột thành khối, mỗi khối chạy trên một tiến trình.
+    Các cột độc lập nên kết quả giống hệt chạy tuần tự.
+    """
+    values = np.asarray(values, dtype=float)
+    high_good = np.asarray(high_good, dtype=bool)
+    n_jobs = min(resolve_n_jobs(n_jobs), values.shape[1])
+
+    if n_jobs <= 1:
+        if levels is None:
+            return assign_bin_codes(values, column_bin_stats(values, lower_cut, upper_cut), high_good, min_count)
+        return partitioned_bin_codes(values, levels, high_good, lower_cut, upper_cut, min_count, min_partition_size)
+
+    blocks = np.array_split(np.arange(values.shape[1]), n_jobs)
+    codes = np.zeros(values.shape, dtype=np.uint8)
+
+    arrays = {'values': values}
+    n_parts = None
+    if levels is not None:
+        arrays['part_ids'] = np.column_stack([part_ids for _, part_ids, _ in levels])
+        n_parts = [n for _, _, n in levels]
+
+    with SharedDataset.create(arrays) as dataset, ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [
+            pool.submit(_score_block, dataset.handle, block, high_good[block], lower_cut, upper_cut,
+                        min_count, n_parts, min_partition_size)
+            for block in blocks
+        ]
+        # Ghép theo thứ tự khối (tức thứ tự cột), không theo thứ tự hoàn thành
+        for future in futures:
+            cols, block_codes = future.result()
+            codes[:, cols] = block_codes
+
+    return codes
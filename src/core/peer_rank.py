@@ -0,0 +1,185 @@
+"""
+Chỉ mục xếp hạng công ty cùng ngành / năm
+Mỗi partition (sector_unique_id, yearreport) giữ, cho từng nhóm, mảng điểm nhóm thô đã sắp xếp tăng dần
+cùng taxcode tương ứng: hạng / phân vị là tìm nhị phân (searchsorted), top-k là một lát cắt cuối mảng.
+
+Toàn bộ chỉ mục được dựng bằng một lần sắp xếp (partition, điểm) cho mỗi nhóm; khi một số công ty thay đổi,
+update() chỉ dựng lại các partition bị ảnh hưởng.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.utils.result_writer import partition_value
+
+PARTITION_COLUMNS = ['sector_unique_id', 'yearreport']
+
+
+def _partition_strings(series):
+    """Giá trị partition dạng chuỗi (2023.0 -> '2023') của cả cột, chỉ gọi partition_value cho giá trị khác nhau."""
+    codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=False)
+    labels = np.array([partition_value(v) for v in uniques], dtype=object)
+    return labels[codes] if len(codes) else np.empty(0, dtype=object)
+
+
+class PeerRankIndex:
+    """
+    Mảng điểm đã sắp xếp theo (sector, year, group) từ field_scores (kết quả group_scoring).
+
+    Điểm nhóm cao hơn là tốt hơn. Với n công ty có điểm trong partition:
+        - rank: 1 + số công ty có điểm cao hơn hẳn
+        - percentile: 100 * (số điểm thấp hơn + 0.5 * số điểm bằng) / n
+    """
+
+    def __init__(self, groups):
+        self.groups = list(groups)
+        self.rows = None
+        self.partitions = {}
+        # Mảng NumPy của rows cho tra cứu từng công ty (không dựng Series mỗi lần)
+        self._arrays = None
+
+    @classmethod
+    def from_field_scores(cls, field_scores, groups=None):
+        """Dựng chỉ mục từ DataFrame có taxcode, sector_unique_id, yearreport và các cột <group>_Score."""
+        if groups is None:
+            groups = [c[:-len('_Score')] for c in field_scores.columns if c.endswith('_Score')]
+        index = cls(groups)
+        index._set_rows(index._prepare(field_scores))
+        index._build(index.rows)
+        return index
+
+    # ------------------------------------------------------------------
+    # Dựng chỉ mục
+    # ------------------------------------------------------------------
+    def _prepare(self, field_scores):
+        """Bảng dòng theo khóa (taxcode, yearreport) với partition dạng chuỗi và điểm của các nhóm."""
+        missing = [c for c in ['taxcode'] + PARTITION_COLUMNS if c not in field_scores.columns]
+        if missing:
+            raise ValueError(f"field_scores is missing columns: {missing}")
+
+        sector = _partition_strings(field_scores['sector_unique_id'])
+        year = _partition_strings(field_scores['yearreport'])
+        taxcode = field_scores['taxcode'].astype(str).to_numpy(dtype=object)
+        rows = pd.DataFrame({'sector': sector, 'year': year}, index=pd.MultiIndex.from_arrays(
+            [taxcode, year], names=['taxcode', 'yearreport']))
+        for group in self.groups:
+            column = f"{group}_Score"
+            rows[column] = (field_scores[column].to_numpy(dtype=float, na_value=np.nan)
+                            if column in field_scores.columns else np.nan)
+        return rows[~rows.index.duplicated(keep='last')]
+
+    def _set_rows(self, rows):
+        self.rows = rows
+        self._arrays = (
+            rows['sector'].to_numpy(dtype=object),
+            rows['year'].to_numpy(dtype=object),
+            rows[[f"{g}_Score" for g in self.groups]].to_numpy(dtype=float),
+        )
+
+    def _build(self, rows):
+        """Dựng (hoặc dựng lại) các partition có trong rows: một lần lexsort (partition, điểm) mỗi nhóm."""
+        part_ids, part_keys = pd.MultiIndex.from_arrays([rows['sector'], rows['year']]).factorize()
+        taxcodes = rows.index.get_level_values('taxcode').to_numpy(dtype=object)
+        entries = {key: {} for key in part_keys}
+
+        for group in self.groups:
+            scores = rows[f"{group}_Score"].to_numpy(dtype=float)
+            valid = np.flatnonzero(~np.isnan(scores))
+            order = valid[np.lexsort((scores[valid], part_ids[valid]))]
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(part_ids[order], minlength=len(part_keys)))])
+            sorted_scores, sorted_taxcodes = scores[order], taxcodes[order]
+            for p, key in enumerate(part_keys):
+                entries[key][group] = (sorted_scores[bounds[p]:bounds[p + 1]], sorted_taxcodes[bounds[p]:bounds[p + 1]])
+
+        self.partitions.update(entries)
+        return list(entries)
+
+    def update(self, field_scores):
+        """
+        Thay/thêm các dòng của field_scores và chỉ dựng lại các partition bị ảnh hưởng
+        (partition cũ và mới của các công ty thay đổi). Trả về danh sách partition đã dựng lại.
+        """
+        if self.rows is None:
+            self._set_rows(self._prepare(field_scores))
+            return self._build(self.rows)
+
+        changed = self._prepare(field_scores)
+        replaced = self.rows.index.isin(changed.index)
+        old = self.rows[replaced]
+        affected = set(zip(old['sector'], old['year'])) | set(zip(changed['sector'], changed['year']))
+
+        self._set_rows(pd.concat([self.rows[~replaced], changed]))
+        in_affected = pd.MultiIndex.from_arrays([self.rows['sector'], self.rows['year']]).isin(list(affected))
+        for key in affected:
+            self.partitions.pop(key, None)
+        return self._build(self.rows[in_affected])
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def _entry(self, sector, yearreport, group):
+        if group not in self.groups:
+            raise ValueError(f"Unknown group '{group}'")
+        entry = self.partitions.get((partition_value(sector), partition_value(yearreport)))
+        return entry[group] if entry is not None else (np.empty(0), np.empty(0, dtype=object))
+
+    @staticmethod
+    def _position(scores, score):
+        below = int(np.searchsorted(scores, score, side='left'))
+        equal = int(np.searchsorted(scores, score, side='right')) - below
+        n = len(scores)
+        return {
+            'score': float(score),
+            'rank': n - below - equal + 1,
+            'percentile': 100.0 * (below + 0.5 * equal) / n,
+            'peers': n,
+        }
+
+    def percentile(self, sector, yearreport, group, score):
+        """Hạng / phân vị của một điểm bất kỳ trong partition (None nếu partition không có điểm)."""
+        scores, _ = self._entry(sector, yearreport, group)
+        score = float(score)
+        if not len(scores) or np.isnan(score):
+            return None
+        return self._position(scores, score)
+
+    def rank(self, taxcode, yearreport, group=None):
+        """
+        Hạng của một công ty trong ngành / năm của nó.
+
+        Return:
+            {'taxcode', 'yearreport', 'sector_unique_id', 'groups': {group: {score, rank, percentile, peers} | None}}
+            hoặc None nếu không có công ty
+        """
+        groups = self.groups if group is None else [group]
+        if group is not None and group not in self.groups:
+            raise ValueError(f"Unknown group '{group}'")
+        key = (str(taxcode), partition_value(yearreport))
+        try:
+            pos = self.rows.index.get_loc(key)
+        except (KeyError, AttributeError):
+            return None
+
+        sectors, years, score_matrix = self._arrays
+        entry = self.partitions[(sectors[pos], years[pos])]
+        result = {}
+        for g in groups:
+            score = score_matrix[pos, self.groups.index(g)]
+            result[g] = None if np.isnan(score) else self._position(entry[g][0], score)
+        return {'taxcode': key[0], 'yearreport': key[1], 'sector_unique_id': sectors[pos], 'groups': result}
+
+    def top(self, sector, yearreport, group, k=10):
+        """k công ty điểm cao nhất của nhóm trong partition: [{'taxcode', 'score', 'rank'}], tốt nhất trước."""
+        if k < 1:
+            raise ValueError("k must be positive")
+        scores, taxcodes = self._entry(sector, yearreport, group)
+        top_scores, top_taxcodes = scores[::-1][:k], taxcodes[::-1][:k]
+        # Hạng kiểu thi đấu: điểm bằng nhau cùng hạng
+        ranks = len(scores) - np.searchsorted(scores, top_scores, side='right') + 1
+        return [
+            {'taxcode': t, 'score': float(s), 'rank': int(r)}
+            for t, s, r in zip(top_taxcodes, top_scores, ranks)
+        ]
+
+    def __len__(self):
+        return 0 if self.rows is None else len(self.rows)
@@ -5,9 +5,9 @@ Chuyển đổi từ notebook sang module Python
 
 import numpy as np
 import pandas as pd
-from scipy.stats import shapiro
-from sklearn.mixture import GaussianMixture
-from sklearn.preprocessing import RobustScaler
+
+from src.core.binning import partition_levels, tscore_categorical
+from src.core.parallel import bin_codes
 
 
 class FinancialScorer:
@@ -15,8 +15,10 @@ class FinancialScorer:
     Hệ thống chấm điểm tài chính T1-T8
     """
     
-    def __init__(self, special_zero_fields=None):
+    def __init__(self, special_zero_fields=None, n_jobs=1):
         self.special_zero_fields = special_zero_fields or ['STD_RTD97', 'STD_RTD77', 'STD_RTD26']
+        # Số tiến trình chấm song song theo khối cột (1 = tuần tự, -1 = mọi CPU)
+        self.n_jobs = n_jobs
     
     def handle_special_zero_fields(self, series, score_col):
         """Xử lý các giá trị <= 0 (Để là T1 - cao nhất)."""
@@ -84,48 +86,93 @@ class FinancialScorer:
 
         return score_col
 
-    def assign_scores_df(self, df, good_bad_mapping, lower_cut=0.05, upper_cut=0.95):
-        """Hàm chính để gán thang điểm T1–T8."""
-        score_data = df.copy()
-
-        for field, direction in good_bad_mapping.items():
-            if field not in df.columns:
-                continue
-
-            series = df[field]
-            score_col = pd.Series(index=series.index, dtype="object")
-
-            # Xử lý đặc biệt
-            if field in self.special_zero_fields:
-                series_non_na = self.handle_special_zero_fields(series, score_col)
-            elif field == "STD_RTD96":
-                series_non_na = self.handle_special_cases_rtd96(df, field, score_col)
-            elif field == "STD_RTD148":
-                series_non_na = self.handle_special_cases_rtd148(df, field, score_col)
-            else:
-                series_non_na = series.dropna()
-
-            if series_non_na.empty or len(series_non_na) < 3:
-                score_data[field + "_Tscore"] = score_col
-                continue
-
-            # Kiểm tra tính chuẩn (chỉ lấy mẫu để test)
-            sample_size = min(5000, len(series_non_na))
-            stat, p_value = shapiro(series_non_na.sample(sample_size))
-            is_normal = p_value > 0.01
-
-            score_col = self.assign_scores_normal_distribution(
-                series_non_na, direction, lower_cut, upper_cut, score_col
-            )
-
-            score_data[field + "_Tscore"] = score_col
-
-        # Xóa cột gốc
-        for col in good_bad_mapping.keys():
-            if col in score_data.columns:
-                score_data.drop(columns=[col], inplace=True)
-
-        return score_data
+    def special_case_masks(self, df, fields):
+        """
+        Mặt nạ các trường hợp đặc biệt cho nhiều chỉ số cùng lúc.
+
+        Return:
+            (excluded, override): excluded (rows × fields) bool - giá trị không tham gia chia bin,
+            override (rows × fields) uint8 - mã T gán cố định (0 = không gán)
+        """
+        n_rows = len(df)
+        excluded = np.zeros((n_rows, len(fields)), dtype=bool)
+        override = np.zeros((n_rows, len(fields)), dtype=np.uint8)
+
+        def column(name):
+            return df[name].to_numpy(dtype=float, na_value=np.nan)
+
+        with np.errstate(invalid='ignore'):
+            for j, field in enumerate(fields):
+                if field in self.special_zero_fields:
+                    # Giá trị <= 0 -> T1 (cao nhất)
+                    mask_zero = column(field) <= 0
+                    override[mask_zero, j] = 1
+                    excluded[:, j] = mask_zero
+                elif field == "STD_RTD96" and "STD_RTD61" in df.columns and "STD_RTD60" in df.columns:
+                    rtd61, rtd60 = column("STD_RTD61"), column("STD_RTD60")
+                    mask_rtd61_le0 = rtd61 <= 0
+                    mask_rtd61_gt0_rtd60_le0 = (rtd61 > 0) & (rtd60 <= 0)
+                    override[mask_rtd61_le0, j] = 8  # T8 = thấp nhất
+                    override[mask_rtd61_gt0_rtd60_le0, j] = 1  # T1 = cao nhất
+                    excluded[:, j] = mask_rtd61_le0 | mask_rtd61_gt0_rtd60_le0
+                elif field == "STD_RTD148" and "STD_RTD60" in df.columns:
+                    mask_rtd60_le0 = column("STD_RTD60") <= 0
+                    override[mask_rtd60_le0, j] = 1  # T1 = cao nhất
+                    excluded[:, j] = mask_rtd60_le0
+
+        return excluded, override
+
+    @staticmethod
+    def partition_levels(df, partition_by):
+        """Các cấp partition (ví dụ ['sector_unique_id', 'yearreport'] -> ngành -> toàn cục)."""
+        missing = [col for col in partition_by if col not in df.columns]
+        if missing:
+            raise ValueError(f"Partition columns not found: {missing}")
+        return partition_levels(df, partition_by)
+
+    def score_codes(self, df, good_bad_mapping, lower_cut=0.05, upper_cut=0.95,
+                    partition_by=None, min_partition_size=30):
+        """
+        Tính mã T (uint8, 0 = không có điểm) cho mọi chỉ số trong một lần:
+        sắp xếp mỗi cột một lần, tính biên cho tất cả chỉ số trên mảng 2D, gán mã bằng searchsorted,
+        sau đó áp các trường hợp đặc biệt như ghi đè vector hóa.
+
+        Nếu có partition_by, biên được tính riêng cho từng partition trong một lần sắp xếp;
+        ô thuộc partition có ít hơn min_partition_size giá trị lùi về cấp cha.
+
+        Return:
+            (fields, codes): danh sách chỉ số và ma trận mã (rows × fields)
+        """
+        fields = [f for f in good_bad_mapping if f in df.columns]
+        if not fields:
+            return fields, np.zeros((len(df), 0), dtype=np.uint8)
+
+        values = df[fields].to_numpy(dtype=float, na_value=np.nan, copy=True)
+        excluded, override = self.special_case_masks(df, fields)
+        values[excluded] = np.nan
+
+        high_good = np.array([good_bad_mapping[f] == "high_good" for f in fields])
+        levels = self.partition_levels(df, partition_by) if partition_by else None
+        codes = bin_codes(values, high_good, lower_cut, upper_cut, 3, levels, min_partition_size, self.n_jobs)
+
+        codes = np.where(override > 0, override, codes)
+        return fields, codes
+
+    def assign_scores_df(self, df, good_bad_mapping, lower_cut=0.05, upper_cut=0.95,
+                         partition_by=None, min_partition_size=30):
+        """
+        Hàm chính để gán thang điểm T1–T8 (cột _Tscore kiểu Categorical cố định TSCORE_DTYPE).
+        partition_by: chấm theo partition, ví dụ ['sector_unique_id', 'yearreport'] (mặc định toàn cục).
+        """
+        fields, codes = self.score_codes(df, good_bad_mapping, lower_cut, upper_cut, partition_by, min_partition_size)
+
+        # Xóa cột gốc, thêm các cột _Tscore
+        drop_cols = [col for col in good_bad_mapping.keys() if col in df.columns]
+        tscores = pd.DataFrame(
+            {field + "_Tscore": tscore_categorical(codes[:, j], index=df.index) for j, field in enumerate(fields)},
+            index=df.index
+        )
+        return pd.concat([df.drop(columns=drop_cols), tscores], axis=1)
 
     def assign_field_normal_distribution(self, series_non_na, lower_cut, upper_cut, score_col):
         """Chia thang điểm theo phân vị cho điểm nhóm. T1=cao nhất, T8=thấp nhất."""
@@ -154,24 +201,26 @@ class FinancialScorer:
 
         return score_col
 
-    def assign_scores_field(self, field_scores, group_field_mapping, lower_cut=0.05, upper_cut=0.95):
-        """Chia lại thang điểm T1-T8 cho từng nhóm trong field_scores theo phân vị."""
+    def assign_scores_field(self, field_scores, group_field_mapping, lower_cut=0.05, upper_cut=0.95,
+                            partition_by=None, min_partition_size=30):
+        """
+        Chia lại thang điểm T1-T8 cho từng nhóm trong field_scores theo phân vị
+        (cùng kernel với assign_scores_df, giá trị cao -> T1), toàn cục hoặc theo partition_by.
+        """
         result = field_scores[['taxcode', 'sector_unique_id', 'yearreport']].copy()
-        
+
+        groups = [g for g in group_field_mapping.keys() if f"{g}_Score" in field_scores.columns]
+        codes = np.zeros((len(field_scores), len(groups)), dtype=np.uint8)
+        if groups:
+            values = field_scores[[f"{g}_Score" for g in groups]].to_numpy(dtype=float, na_value=np.nan)
+            high_good = np.ones(len(groups), dtype=bool)
+            levels = self.partition_levels(field_scores, partition_by) if partition_by else None
+            codes = bin_codes(values, high_good, lower_cut, upper_cut, 1, levels, min_partition_size, self.n_jobs)
+
         for group in group_field_mapping.keys():
-            if f"{group}_Score" not in field_scores.columns:
+            if group not in groups:
                 result[f"{group}_TScore"] = ""
                 continue
-                
-            series = field_scores[f"{group}_Score"]
-            score_col = pd.Series(index=series.index, dtype="object")
-            
-            score_col = self.assign_field_normal_distribution(
-                series.dropna(), 
-                lower_cut=lower_cut, 
-                upper_cut=upper_cut, 
-                score_col=score_col
-            )
-            result[f"{group}_TScore"] = score_col
-            
+            result[f"{group}_TScore"] = tscore_categorical(codes[:, groups.index(group)], index=field_scores.index)
+
         return result
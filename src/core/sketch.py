@@ -0,0 +1,219 @@
+"""
+Thống kê dạng luồng cho pipeline ngoài bộ nhớ (out-of-core)
+- QuantileSketch: sketch phân vị kiểu KLL, cập nhật theo lô và gộp (merge) được
+- RunningCorrelation: thống kê hiệp phương sai pairwise-complete (Welford / Chan), cập nhật và gộp được
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    Sketch phân vị kiểu KLL: các "compactor" theo tầng, phần tử ở tầng h có trọng số 2^h.
+    Khi một tầng vượt sức chứa, nó được sắp xếp và giữ lại một nửa (xen kẽ, offset ngẫu nhiên)
+    đẩy lên tầng trên. Bộ nhớ O(k log(n/k)), sai số hạng (rank) chuẩn hóa cỡ 1/k.
+
+    Parameters:
+        k: sức chứa tầng trên cùng - tham số điều khiển sai số (k lớn hơn -> biên chính xác hơn)
+        seed: seed cho offset nén, để kết quả lặp lại được
+    """
+
+    C = 2.0 / 3.0
+
+    def __init__(self, k=200, seed=0):
+        if k < 8:
+            raise ValueError("k must be >= 8")
+        self.k = int(k)
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * self.C ** depth)))
+
+    def update(self, values):
+        """Thêm một lô giá trị (NaN bị bỏ qua)."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.count += values.size
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Gộp một sketch khác vào sketch này (kết quả như đã update cả hai luồng dữ liệu)."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # Số phần tử lẻ -> giữ lại một phần tử ở tầng hiện tại
+                keep = items[:1] if items.size % 2 else items[:0]
+                pairs = items[keep.size:]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # Tầng trên có thể tràn, và sức chứa các tầng dưới giảm khi thêm tầng mới
+                level = 0
+                continue
+            level += 1
+
+    def quantiles(self, qs):
+        """
+        Phân vị cho mảng qs trong [0, 1] theo quy ước 'linear' (hạng q * (n - 1), như Series.quantile),
+        NaN nếu sketch rỗng. Khi chưa nén lần nào (count <= sức chứa) kết quả là chính xác;
+        q=0/1 luôn trả về min/max chính xác.
+        """
+        qs = np.atleast_1d(np.asarray(qs, dtype=float))
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        if self.size == self.count:
+            return np.quantile(np.concatenate(self.levels), qs)
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(lv.size, 2.0 ** h) for h, lv in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+
+        # Phần tử trọng số w đại diện các hạng (từ 0) cumulative - w .. cumulative - 1: đặt nó ở hạng giữa,
+        # chuẩn hóa theo n - 1 như quy ước 'linear' (trọng số 1 -> đúng vị trí i / (n - 1)) rồi nội suy
+        cumulative = np.cumsum(weights)
+        positions = (cumulative - (weights + 1) / 2) / max(self.count - 1, 1)
+        positions = np.concatenate([[0.0], np.clip(positions, 0.0, 1.0), [1.0]])
+        values = np.concatenate([[self.min], items, [self.max]])
+        return np.interp(qs, positions, values)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    @property
+    def size(self):
+        """Số phần tử đang lưu trong sketch."""
+        return sum(lv.size for lv in self.levels)
+
+
+class RunningCorrelation:
+    """
+    Thống kê hiệp phương sai / tương quan Pearson pairwise-complete (mỗi cặp cột chỉ dùng các dòng
+    có cả hai giá trị, như DataFrame.corr()) cập nhật theo lô và gộp được giữa các phân mảnh.
+
+    Với mỗi cặp (i, j) lưu: số dòng n, trung bình của x_i trên các dòng đó, tổng bình phương độ lệch
+    M2 và tổng tích độ lệch C. Lô mới được gộp theo công thức Welford / Chan, ổn định số học
+    kể cả khi giá trị lớn (tổng tài sản, doanh thu).
+
+    Ví dụ (cập nhật theo quý, không cần đọc lại lịch sử):
+        stats = RunningCorrelation.load("data/corr_stats.npz")
+        stats.update(df_new_quarter)
+        stats.save("data/corr_stats.npz")
+        weights = analyzer.weights_from_statistics(stats, FIELD_MAPPING)
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        m = len(self.columns)
+        self.n = np.zeros((m, m))
+        self.mean = np.zeros((m, m))   # mean[i, j] = trung bình x_i trên các dòng có cả i và j
+        self.m2 = np.zeros((m, m))     # m2[i, j] = tổng (x_i - mean[i, j])^2 trên các dòng đó
+        self.cov = np.zeros((m, m))    # cov[i, j] = tổng (x_i - mean[i, j]) (x_j - mean[j, i])
+
+    def _combine(self, n_b, mean_b, m2_b, cov_b):
+        n_a = self.n
+        n = n_a + n_b
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(n > 0, n_b / n, 0.0)
+            cross = np.where(n > 0, n_a * n_b / n, 0.0)
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * frac
+        self.m2 = self.m2 + m2_b + delta ** 2 * cross
+        self.cov = self.cov + cov_b + delta * delta.T * cross
+        self.n = n
+
+    def update(self, values):
+        """
+        Thêm một lô dòng: ndarray (rows × columns) theo thứ tự self.columns, hoặc DataFrame
+        (lấy các cột theo tên, cột thiếu = NaN). NaN = thiếu.
+        """
+        if isinstance(values, pd.DataFrame):
+            values = values.reindex(columns=self.columns).to_numpy(dtype=float, na_value=np.nan)
+        values = np.asarray(values, dtype=float)
+        if values.shape[0] == 0:
+            return self
+
+        present = ~np.isnan(values)
+        # Trừ trung bình cột của lô trước khi nhân ma trận để tránh triệt tiêu số
+        counts = present.sum(axis=0)
+        shift = np.divide(np.nansum(values, axis=0), counts, out=np.zeros(values.shape[1]), where=counts > 0)
+        filled = np.where(present, values - shift, 0.0)
+        weight = present.astype(float)
+
+        n_b = weight.T @ weight
+        sum_x = filled.T @ weight                       # tổng x_i (đã dịch) trên các dòng có cả i và j
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_shifted = np.where(n_b > 0, sum_x / n_b, 0.0)
+        m2_b = (filled ** 2).T @ weight - mean_shifted * sum_x
+        cov_b = filled.T @ filled - mean_shifted * sum_x.T
+
+        self._combine(n_b, mean_shifted + shift[:, None], m2_b, cov_b)
+        return self
+
+    def merge(self, other):
+        """Gộp thống kê của phân mảnh khác (cùng danh sách cột)."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge statistics over different columns")
+        self._combine(other.n, other.mean, other.m2, other.cov)
+        return self
+
+    def covariance(self, ddof=1):
+        """Ma trận hiệp phương sai pairwise-complete, NaN nếu cặp có <= ddof dòng."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = self.cov / (self.n - ddof)
+        result[self.n <= ddof] = np.nan
+        return result
+
+    def correlation(self):
+        """Ma trận tương quan (columns × columns), NaN nếu cặp có ít hơn 2 dòng hoặc phương sai bằng 0."""
+        var_x = self.m2
+        var_y = self.m2.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.cov / np.sqrt(var_x * var_y)
+        corr[(self.n < 2) | (var_x <= 0) | (var_y <= 0)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def correlation_frame(self):
+        """Ma trận tương quan dạng DataFrame (index/columns là tên cột)."""
+        return pd.DataFrame(self.correlation(), index=self.columns, columns=self.columns)
+
+    # ------------------------------------------------------------------
+    # Lưu / tải
+    # ------------------------------------------------------------------
+    def save(self, path):
+        np.savez(path, columns=np.array(self.columns, dtype=str),
+                 n=self.n, mean=self.mean, m2=self.m2, cov=self.cov)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            stats = cls(data['columns'].tolist())
+            stats.n, stats.mean, stats.m2, stats.cov = data['n'], data['mean'], data['m2'], data['cov']
+        return stats
@@ -3,14 +3,26 @@ Financial Scoring System - Complete system for testing and development
 Hệ thống chấm điểm tài chính hoàn chỉnh
 """
 
+import os
+
 import pandas as pd
 import numpy as np
 from src.config.good_bad_mapping import GOOD_BAD_MAPPING
-from src.config.field_mapping import group_field_mapping
+from src.config.field_mapping import FIELD_MAPPING as group_field_mapping
 from src.core.scoring import FinancialScorer
 from src.core.correlation import CorrelationAnalyzer
+from src.core.correlation_cache import CorrelationCache
+from src.core.correlation_weights import GroupCorrelationScorer
+from src.core.sketch import RunningCorrelation
+from src.core.calibration import Calibration
+from src.core.binning import N_BINS, T_LABELS, tscore_categorical, tscore_codes
+from src.core.chunked import ChunkedScoringPipeline
+from src.core.incremental import IncrementalScorer
+from src.core.peer_rank import PeerRankIndex
 from src.utils.data_processor import DataProcessor
-from src.api.scoring_api import GroupCorrelationScorer, process_company_scoring
+from src.utils.shared_dataset import SharedDataset
+from src.utils.result_writer import ParquetResultWriter, write_results_parquet, PARTITION_BY
+from src.utils.result_store import ResultStore
 
 
 class FinancialScoringSystem:
@@ -19,26 +31,57 @@ class FinancialScoringSystem:
     Tích hợp tất cả các module - dùng cho testing và development
     """
     
-    def __init__(self, correlation_threshold=0.9, lower_cut=0.05, upper_cut=0.95):
+    def __init__(self, correlation_threshold=0.9, lower_cut=0.05, upper_cut=0.95,
+                 partition_by=None, min_partition_size=30, n_jobs=1, correlation_cache_dir=None):
         self.correlation_threshold = correlation_threshold
         self.lower_cut = lower_cut
         self.upper_cut = upper_cut
+        # Chấm theo partition, ví dụ ['sector_unique_id', 'yearreport'] (None = toàn cục)
+        self.partition_by = list(partition_by) if partition_by else None
+        self.min_partition_size = min_partition_size
         
         # Khởi tạo các component
-        self.scorer = FinancialScorer()
-        self.correlation_analyzer = CorrelationAnalyzer(correlation_threshold)
+        # n_jobs > 1: chấm song song theo khối chỉ số trên process pool (-1 = mọi CPU)
+        self.n_jobs = n_jobs
+        self.scorer = FinancialScorer(n_jobs=n_jobs)
+        # Ma trận tương quan cache theo fingerprint dữ liệu; correlation_cache_dir để lưu giữa các lần chạy
+        self.correlation_analyzer = CorrelationAnalyzer(correlation_threshold, CorrelationCache(correlation_cache_dir))
         self.data_processor = DataProcessor()
+        # Chế độ chấm gia tăng (start_incremental)
+        self.incremental = None
+        self.incremental_store_dir = None
+        self.result_store = None
+        # Chỉ mục xếp hạng cùng ngành / năm, dựng sau bước tính điểm nhóm
+        self.peer_index = None
         
         print("🔧 FinancialScoringSystem đã được khởi tạo")
         print(f"   📊 Ngưỡng tương quan: {correlation_threshold}")
         print(f"   📈 Cắt outlier: {lower_cut:.1%} - {upper_cut:.1%}")
+        if n_jobs != 1:
+            print(f"   🧵 Chấm song song: n_jobs={n_jobs}")
+        if self.partition_by:
+            print(f"   🗂️  Chấm theo partition: {self.partition_by} (tối thiểu {min_partition_size} giá trị)")
     
-    def load_and_preprocess(self, file_path, delimiter=','):
-        """Bước 1: Tải và tiền xử lý dữ liệu"""
+    def load_and_preprocess(self, file_path, delimiter=',', fast=False, float_dtype='float64'):
+        """
+        Bước 1: Tải và tiền xử lý dữ liệu
+        fast=True: chỉ đọc các cột cần cho chấm điểm với kiểu cố định (CSV qua pyarrow, Parquet, Feather);
+        kiểu của cột định danh khác đường load_data mặc định (taxcode là chuỗi, ngành / năm là Categorical)
+        """
         print("\n" + "="*50)
         print("🔄 BƯỚC 1: TẢI VÀ TIỀN XỬ LÝ DỮ LIỆU")
         print("="*50)
-        
+
+        if fast:
+            try:
+                df = self.data_processor.load_scoring_data(file_path, delimiter, float_dtype=float_dtype)
+            except Exception as e:
+                print(f"Lỗi khi tải dữ liệu: {e}")
+                return None
+            if not self.data_processor.validate_data(df):
+                return None
+            return df
+
         # Tải dữ liệu
         df = self.data_processor.load_data(file_path, delimiter)
         if df is None:
@@ -69,7 +112,8 @@ class FinancialScoringSystem:
         
         # Chấm điểm
         scored_df = self.scorer.assign_scores_df(
-            df, available_mapping, self.lower_cut, self.upper_cut
+            df, available_mapping, self.lower_cut, self.upper_cut,
+            self.partition_by, self.min_partition_size
         )
         
         print(f"✅ Hoàn thành chấm điểm cá nhân")
@@ -98,6 +142,35 @@ class FinancialScoringSystem:
         
         return weights, correlation_results
     
+    def correlation_threshold_sweep(self, df, thresholds=(0.7, 0.75, 0.8, 0.85, 0.9, 0.95)):
+        """
+        Trọng số theo cụm tương quan cho nhiều ngưỡng trong một lần gọi (tinh chỉnh correlation_threshold
+        không cần chạy lại pipeline). Return: DataFrame khóa trọng số × ngưỡng.
+        """
+        sweep = self.correlation_analyzer.weights_for_thresholds(df, group_field_mapping, thresholds)
+        n_clustered = (sweep < 1.0).sum()
+        print("🔀 Số chỉ số nằm trong cụm tương quan theo ngưỡng:")
+        for t in sweep.columns:
+            print(f"   |corr| > {t}: {n_clustered[t]} / {len(sweep)}")
+        return sweep
+
+    def update_correlation_statistics(self, df, statistics_path=None):
+        """
+        Cập nhật trọng số tương quan theo dữ liệu mới (ví dụ một quý) mà không tính lại toàn bộ lịch sử:
+        tải thống kê RunningCorrelation từ statistics_path (nếu có), thêm df, lưu lại và trả về
+        (statistics, weights).
+        """
+        statistics = None
+        if statistics_path and os.path.exists(statistics_path):
+            statistics = RunningCorrelation.load(statistics_path)
+        statistics = self.correlation_analyzer.correlation_statistics(df, group_field_mapping, statistics)
+        if statistics_path:
+            statistics.save(statistics_path)
+
+        weights = self.correlation_analyzer.weights_from_statistics(statistics, group_field_mapping)
+        print(f"⚖️  Thống kê tương quan: {int(statistics.n.diagonal().max())} dòng, {len(weights)} trọng số")
+        return statistics, weights
+
     def group_scoring(self, scored_df, weights):
         """Bước 4: Tính điểm nhóm"""
         print("\n" + "="*50)
@@ -119,19 +192,23 @@ class FinancialScoringSystem:
         print("="*50)
         
         final_scores = self.scorer.assign_scores_field(
-            field_scores, group_field_mapping, self.lower_cut, self.upper_cut
+            field_scores, group_field_mapping, self.lower_cut, self.upper_cut,
+            self.partition_by, self.min_partition_size
         )
         
         print("✅ Hoàn thành chuyển đổi thang điểm T1-T8")
         
         return final_scores
     
-    def process_file(self, file_path, delimiter=','):
-        """Xử lý hoàn chỉnh một file từ đầu đến cuối"""
+    def process_file(self, file_path, delimiter=',', fast=False, float_dtype='float64'):
+        """
+        Xử lý hoàn chỉnh một file từ đầu đến cuối
+        fast=True: đọc nhanh chỉ các cột chấm điểm (xem load_and_preprocess), cần cho file Parquet / Feather
+        """
         print("🚀 BẮT ĐẦU XỬ LÝ FILE:", file_path)
         
         # Bước 1: Tải và tiền xử lý
-        df = self.load_and_preprocess(file_path, delimiter)
+        df = self.load_and_preprocess(file_path, delimiter, fast, float_dtype)
         if df is None:
             return None
         
@@ -143,6 +220,7 @@ class FinancialScoringSystem:
         
         # Bước 4: Tính điểm nhóm
         field_scores = self.group_scoring(scored_df, weights)
+        self.peer_index = PeerRankIndex.from_field_scores(field_scores, list(group_field_mapping.keys()))
         
         # Bước 5: Điểm cuối cùng
         final_scores = self.final_scoring(field_scores)
@@ -158,9 +236,203 @@ class FinancialScoringSystem:
             'scored_individual': scored_df,
             'weights': weights,
             'correlation_results': correlation_results,
+            'peer_index': self.peer_index,
             'original_data': df
         }
     
+    def process_file_chunked(self, file_path, output_path, chunk_size=100_000, delimiter=',', sketch_k=1000,
+                             output_format='csv'):
+        """
+        Xử lý file lớn hơn bộ nhớ: đọc theo khối (3 lượt đọc file), biên bin chính xác cho cột ít
+        giá trị khác nhau và xấp xỉ bằng sketch phân vị cho cột còn lại (xem src/core/chunked.py),
+        ghi kết quả từng khối nối tiếp vào output_path:
+        - output_format='csv': điểm cuối cùng vào một file CSV
+        - output_format='parquet': final_scores, field_scores, indicator_tscores vào thư mục
+          Parquet phân vùng theo năm / ngành (xem ParquetResultWriter)
+        - output_format='sqlite': kho kết quả tra cứu theo (taxcode, yearreport) (xem ResultStore)
+        Chỉ chấm toàn cục (partition_by không áp dụng).
+        """
+        if output_format not in ('csv', 'parquet', 'sqlite'):
+            raise ValueError("output_format must be 'csv', 'parquet' or 'sqlite'")
+
+        print("🚀 BẮT ĐẦU XỬ LÝ FILE THEO KHỐI:", file_path)
+        print(f"   📦 Kích thước khối: {chunk_size} dòng, sketch_k={sketch_k}")
+        if self.partition_by:
+            print("   ⚠️  partition_by bị bỏ qua khi xử lý theo khối")
+
+        pipeline = ChunkedScoringPipeline(
+            group_field_mapping, GOOD_BAD_MAPPING, self.lower_cut, self.upper_cut,
+            sketch_k=sketch_k, scorer=self.scorer, correlation_analyzer=self.correlation_analyzer
+        )
+
+        def chunk_source():
+            return self.data_processor.iter_chunks(file_path, chunk_size, delimiter)
+
+        print("1️⃣ Lượt 1-2: sketch phân vị, tương quan và biên bin nhóm...")
+        pipeline.fit(chunk_source)
+
+        print("2️⃣ Lượt 3: chấm điểm và ghi kết quả...")
+        n_chunks = 0
+        if output_format == 'parquet':
+            with ParquetResultWriter(output_path) as writer:
+                for result in pipeline.iter_scored(chunk_source):
+                    writer.write_results(result)
+                    n_chunks += 1
+        elif output_format == 'sqlite':
+            with ResultStore(output_path) as store:
+                for result in pipeline.iter_scored(chunk_source):
+                    store.write_results(result)
+                    n_chunks += 1
+        else:
+            for result in pipeline.iter_scored(chunk_source):
+                final_scores = result['final_scores'].astype(object)
+                final_scores.to_csv(output_path, mode='w' if n_chunks == 0 else 'a', header=n_chunks == 0, index=False)
+                n_chunks += 1
+
+        print("\n📋 THỐNG KÊ KẾT QUẢ:")
+        print(f"   📄 File: {file_path} -> {output_path}")
+        print(f"   📊 Số dòng: {pipeline.n_rows} ({n_chunks} khối)")
+
+        return {
+            'output_path': output_path,
+            'n_rows': pipeline.n_rows,
+            'n_chunks': n_chunks,
+            'weights': pipeline.weights,
+            'correlation_matrices': pipeline.correlation_matrices,
+            'pipeline': pipeline
+        }
+
+    def save_results_parquet(self, results, output_dir, partition_by=PARTITION_BY):
+        """
+        Ghi kết quả của process_file (final_scores, field_scores, mã T từng chỉ số) ra Parquet
+        phân vùng theo năm / ngành, đọc lại bằng read_results_parquet(output_dir, table, filters)
+        """
+        rows = write_results_parquet(results, output_dir, partition_by)
+        print(f"💾 Đã ghi Parquet: {output_dir} ({', '.join(f'{t}: {n} dòng' for t, n in rows.items())})")
+        return rows
+
+    def save_results_store(self, results, path):
+        """
+        Ghi kết quả của process_file vào kho SQLite tra cứu theo (taxcode, yearreport),
+        phục vụ qua FinancialScoringAPI(result_store_path=...)
+        """
+        with ResultStore(path) as store:
+            n_rows = store.write_results(results)
+        print(f"💾 Đã ghi kho kết quả: {path} ({n_rows} dòng)")
+        return n_rows
+
+    def peer_rank(self, taxcode, yearreport, group=None):
+        """Hạng và phân vị của một công ty trong ngành / năm của nó theo điểm nhóm (sau process_file)."""
+        if self.peer_index is None:
+            raise RuntimeError("Peer index is not built; run process_file() or start_incremental() first")
+        return self.peer_index.rank(taxcode, yearreport, group)
+
+    def top_companies(self, sector_unique_id, yearreport, group, k=10):
+        """k công ty có điểm nhóm cao nhất trong một ngành / năm."""
+        if self.peer_index is None:
+            raise RuntimeError("Peer index is not built; run process_file() or start_incremental() first")
+        return self.peer_index.top(sector_unique_id, yearreport, group, k)
+
+    def build_calibration(self, df, output_path=None, weights=None):
+        """
+        Xây dựng calibration (biên bin của điểm nhóm) từ toàn bộ dữ liệu,
+        dùng cho FinancialScoringAPI(calibration_path=...)
+        """
+        print("\n" + "="*50)
+        print("📐 XÂY DỰNG CALIBRATION")
+        print("="*50)
+
+        calibration = Calibration.from_population(
+            df, group_field_mapping, GOOD_BAD_MAPPING, weights,
+            self.lower_cut, self.upper_cut
+        )
+
+        print(f"✅ Calibration: {len(calibration.group_edges)} nhóm")
+
+        if output_path:
+            calibration.save(output_path)
+            print(f"💾 Đã lưu calibration: {output_path}")
+
+        return calibration
+    
+    def start_incremental(self, file_path=None, delimiter=',', drift_tolerance=0.01, store_dir=None,
+                          result_store_path=None):
+        """
+        Bật chế độ chấm gia tăng: calibration + kết quả toàn bộ dữ liệu được giữ lại, update_filings()
+        chỉ chấm lại các công ty thay đổi. Nếu store_dir đã có trạng thái lưu thì đọc lại thay vì chấm file.
+        result_store_path: kho SQLite (ResultStore) được ghi toàn bộ lúc bắt đầu và cập nhật sau mỗi lần chấm lại.
+        """
+        if self.partition_by:
+            raise ValueError("Incremental scoring supports global calibration only (partition_by=None)")
+
+        if store_dir and os.path.exists(os.path.join(store_dir, "state.json")):
+            self.incremental = IncrementalScorer.load(
+                store_dir, group_field_mapping, GOOD_BAD_MAPPING, self.scorer, self.correlation_analyzer
+            )
+            print(f"📂 Đã đọc trạng thái gia tăng: {store_dir} ({len(self.incremental.data)} dòng)")
+        else:
+            if file_path is None:
+                raise ValueError("file_path is required when store_dir has no saved state")
+            df = self.load_and_preprocess(file_path, delimiter, fast=True)
+            if df is None:
+                return None
+            self.incremental = IncrementalScorer(
+                group_field_mapping, GOOD_BAD_MAPPING, self.lower_cut, self.upper_cut,
+                drift_tolerance, self.scorer, self.correlation_analyzer
+            ).fit(df)
+            print(f"✅ Calibration gia tăng: {len(df)} dòng, ngưỡng drift {drift_tolerance}")
+            if store_dir:
+                self.incremental.save(store_dir)
+
+        self.incremental_store_dir = store_dir
+        self.result_store = ResultStore(result_store_path) if result_store_path else None
+        if self.result_store is not None:
+            self.result_store.write_results(self.incremental.results)
+        self.peer_index = PeerRankIndex.from_field_scores(
+            self.incremental.results['field_scores'], list(group_field_mapping.keys())
+        )
+        return self.incremental
+
+    def update_filings(self, changed, delimiter=','):
+        """
+        Chấm lại các báo cáo thay đổi (DataFrame hoặc đường dẫn file) với calibration hiện tại;
+        tự calibration lại toàn bộ khi drift vượt ngưỡng. Trả về kết quả của các dòng thay đổi.
+        """
+        if self.incremental is None:
+            raise RuntimeError("Incremental mode is not started; call start_incremental() first")
+        if isinstance(changed, (str, os.PathLike)):
+            changed = self.load_and_preprocess(changed, delimiter, fast=True)
+            if changed is None:
+                return None
+
+        result = self.incremental.update(changed)
+        status = "calibration lại toàn bộ" if result['recalibrated'] else "giữ calibration"
+        print(f"🔁 Chấm lại {len(result['final_scores'])} dòng, drift lớn nhất {result['drift'].max():.4f} ({status})")
+        if self.incremental_store_dir:
+            self.incremental.save(self.incremental_store_dir)
+        if self.result_store is not None:
+            # Calibration lại làm thay đổi kết quả của mọi công ty
+            self.result_store.write_results(self.incremental.results if result['recalibrated'] else result)
+        if result['recalibrated']:
+            self.peer_index = PeerRankIndex.from_field_scores(
+                self.incremental.results['field_scores'], list(group_field_mapping.keys())
+            )
+        else:
+            # Chỉ dựng lại các partition ngành / năm có công ty thay đổi
+            self.peer_index.update(result['field_scores'])
+        return result
+
+    def share_dataset(self, df, backend='shm', directory=None):
+        """
+        Đặt ma trận chỉ số và các cột định danh vào bộ nhớ dùng chung để các tiến trình worker
+        gắn vào bằng SharedDataset.attach(dataset.handle) thay vì nhận bản sao DataFrame.
+        Dùng với 'with' (hoặc gọi close()) để giải phóng vùng nhớ.
+        """
+        value_columns = [col for col in GOOD_BAD_MAPPING if col in df.columns]
+        dataset = SharedDataset.from_dataframe(df, value_columns, backend=backend, directory=directory)
+        print(f"🧠 SharedDataset ({backend}): {len(df)} dòng × {len(value_columns)} chỉ số")
+        return dataset
+
     def create_sample_and_process(self, n_rows=1000, save_sample=True):
         """Tạo dữ liệu mẫu và xử lý"""
         print(f"🔧 TẠO DỮ LIỆU MẪU ({n_rows} dòng)")
@@ -216,40 +488,39 @@ class FinancialScoringSystem:
         group_correlation_matrices = {}
         for group, result in correlation_results.items():
             group_correlation_matrices[group] = result['correlation_matrix']
-        
-        # Tạo group scores từ scored_df - CHUYỂN THÀNH LIST
+
+        # Điểm T phổ biến nhất của từng chỉ số: {group: {field: T-score mode}} (mặc định T4)
         group_scores = {}
         for group, fields in group_field_mapping.items():
-            scores_list = []
+            field_scores = {}
             for field in fields:
                 tscore_col = f"{field}_Tscore"
                 if tscore_col in scored_df.columns:
-                    # Lấy điểm mode của field này
-                    mode_score = scored_df[tscore_col].mode()
-                    if not mode_score.empty:
-                        scores_list.append(mode_score.iloc[0])
-                    else:
-                        scores_list.append("T4")  # Default
-            group_scores[group] = scores_list  # List format
-        
-        # Bước 4: Áp dụng thuật toán mới
+                    counts = np.bincount(tscore_codes(scored_df[tscore_col]), minlength=N_BINS + 1)[1:]
+                    field_scores[field] = T_LABELS[counts.argmax() + 1] if counts.any() else "T4"
+            group_scores[group] = field_scores
+        
+        # Bước 4: Áp dụng thuật toán mới cho từng công ty (vector hóa trên toàn bộ frame)
         print("4️⃣ Áp dụng thuật toán correlation với epsilon...")
         print(f"   📊 Epsilon: {epsilon}")
         print(f"   🎯 Correlation threshold: {1 - epsilon}")
-        
-        final_group_scores = process_company_scoring(
-            group_correlation_matrices,
-            group_scores,
-            epsilon=epsilon
-        )
-        
+
+        scorer = GroupCorrelationScorer(group_field_mapping, threshold=1 - epsilon)
+        group_codes = scorer.score_frame(group_correlation_matrices, scored_df)
+
         print("✅ Hoàn thành xử lý với thuật toán mới!")
-        
-        # Tạo DataFrame kết quả
+
+        # Tạo DataFrame kết quả: một điểm T (Categorical) mỗi công ty mỗi nhóm
         result_df = df[['taxcode', 'sector_unique_id', 'yearreport']].copy()
-        for group, score in final_group_scores.items():
-            result_df[f"{group}_FinalScore"] = score
-        
+        for group, codes in group_codes.items():
+            result_df[f"{group}_FinalScore"] = tscore_categorical(codes, index=result_df.index)
+
+        # Điểm phổ biến nhất của từng nhóm (tóm tắt toàn bộ dữ liệu)
+        final_group_scores = {}
+        for group, codes in group_codes.items():
+            counts = np.bincount(codes, minlength=N_BINS + 1)[1:]
+            final_group_scores[group] = T_LABELS[counts.argmax() + 1] if counts.any() else None
+
         return {
             'final_scores_new': result_df,
             'group_scores_input': group_scores,
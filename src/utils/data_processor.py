@@ -3,9 +3,57 @@ Data processing utilities
 Tiện ích xử lý dữ liệu
 """
 
+import os
+
 import pandas as pd
 import numpy as np
 
+from src.config.field_mapping import FIELD_MAPPING, INTERMEDIATE_FIELDS
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+
+# Cột định danh giữ lại khi tải dữ liệu chấm điểm và kiểu dữ liệu của chúng
+ID_DTYPES = {
+    'taxcode': 'str',               # chuỗi để giữ số 0 ở đầu mã số thuế
+    'sector_unique_id': 'category',
+    'sector_unique_id_raw': 'category',
+    'yearreport': 'category',
+    'length_report': 'float64',
+}
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+FEATHER_EXTENSIONS = ('.feather', '.arrow', '.ipc')
+
+
+def _id_string(value):
+    """Giá trị định danh dạng chuỗi như khi đọc từ CSV (2023 / 2023.0 -> '2023')."""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def cast_id_columns(df):
+    """
+    Ép các cột định danh có trong df theo ID_DTYPES, với giá trị dạng chuỗi như load_scoring_data đọc từ CSV:
+    DataFrame từ nguồn khác (ví dụ pd.read_csv với taxcode / yearreport kiểu số) nối được với dữ liệu đã tải
+    và lưu được ra Parquet. Số 0 ở đầu taxcode đã mất khi đọc dạng số thì không khôi phục được.
+    """
+    columns = {}
+    for col, dtype in ID_DTYPES.items():
+        if col not in df.columns or dtype not in ('str', 'category'):
+            continue
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        if dtype == 'str' and pd.api.types.is_string_dtype(series):
+            continue
+        # Chỉ đổi các giá trị khác nhau sang chuỗi, thiếu -> NaN
+        codes, uniques = pd.factorize(series)
+        labels = np.array([_id_string(v) for v in uniques] + [np.nan], dtype=object)[codes]
+        columns[col] = pd.Series(labels, index=df.index, dtype=dtype)
+    if not columns:
+        return df
+    return df.assign(**columns).astype({c: t for c, t in ID_DTYPES.items() if c in df.columns})
+
 
 class DataProcessor:
     """
@@ -38,7 +86,140 @@ class DataProcessor:
         except Exception as e:
             print(f"Lỗi khi tải dữ liệu: {e}")
             return None
-    
+
+    @staticmethod
+    def scoring_dtypes(float_dtype='float64'):
+        """
+        Các cột cần cho chấm điểm và kiểu dữ liệu: cột định danh + mọi chỉ số trong
+        FIELD_MAPPING, GOOD_BAD_MAPPING và INTERMEDIATE_FIELDS (float_dtype: 'float64' hoặc 'float32')
+        """
+        if float_dtype not in ('float64', 'float32'):
+            raise ValueError("float_dtype must be 'float64' or 'float32'")
+
+        dtypes = dict(ID_DTYPES)
+        for fields in FIELD_MAPPING.values():
+            dtypes.update({field: float_dtype for field in fields})
+        dtypes.update({field: float_dtype for field in GOOD_BAD_MAPPING})
+        dtypes.update({field: float_dtype for field in INTERMEDIATE_FIELDS})
+        return dtypes
+
+    @staticmethod
+    def _file_format(file_path):
+        extension = os.path.splitext(str(file_path))[1].lower()
+        if extension in PARQUET_EXTENSIONS:
+            return 'parquet'
+        if extension in FEATHER_EXTENSIONS:
+            return 'feather'
+        return 'csv'
+
+    @staticmethod
+    def _file_columns(file_path, file_format, delimiter=','):
+        """Tên các cột của file (chỉ đọc header / schema)"""
+        if file_format == 'csv':
+            return list(pd.read_csv(file_path, sep=delimiter, nrows=0).columns)
+
+        try:
+            import pyarrow.dataset as ds
+        except ImportError as e:
+            raise RuntimeError("Reading Parquet/Feather requires pyarrow: pip install pyarrow") from e
+        return ds.dataset(file_path, format='parquet' if file_format == 'parquet' else 'ipc').schema.names
+
+    @staticmethod
+    def _resolve_engine(engine):
+        if engine != 'auto':
+            return engine
+        try:
+            import pyarrow  # noqa: F401
+            return 'pyarrow'
+        except ImportError:
+            return 'c'
+
+    @staticmethod
+    def _read_csv_pyarrow(file_path, delimiter, columns, dtypes):
+        """
+        Đọc CSV bằng pyarrow.csv với kiểu cố định cho từng cột. Cột định danh (str / category) được đọc
+        dạng chuỗi như engine C: dtype của pd.read_csv(engine='pyarrow') chỉ ép kiểu *sau* khi pyarrow
+        đã suy luận cột là số, nên taxcode '0106512583' thành '106512583'.
+        """
+        import pyarrow as pa
+        from pyarrow import csv
+
+        column_types = {
+            col: pa.string() if dtype in ('str', 'category') else pa.from_numpy_dtype(np.dtype(dtype))
+            for col, dtype in dtypes.items()
+        }
+        table = csv.read_csv(
+            file_path,
+            parse_options=csv.ParseOptions(delimiter=delimiter),
+            convert_options=csv.ConvertOptions(column_types=column_types, include_columns=columns,
+                                               strings_can_be_null=True),
+        )
+        return DataProcessor._cast_columns(table.to_pandas(), dtypes)
+
+    @staticmethod
+    def _cast_columns(df, dtypes):
+        """Ép kiểu các cột đã đọc (Parquet/Feather, hoặc khối CSV) theo dtypes"""
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col in df.columns and df[col].dtype != dtype}
+        return df.astype(dtypes) if dtypes else df
+
+    @staticmethod
+    def load_scoring_data(file_path, delimiter=',', engine='auto', float_dtype='float64'):
+        """
+        Tải dữ liệu chấm điểm nhanh: chỉ đọc các cột cần thiết (scoring_dtypes) với kiểu cố định,
+        không suy luận kiểu và không cấp phát các cột sẽ bị bỏ.
+
+        - CSV: engine 'pyarrow' (đa luồng, mặc định nếu có pyarrow), 'c' hoặc 'python'
+        - .parquet/.pq, .feather/.arrow: đọc trực tiếp các cột cần thiết (cần pyarrow)
+
+        Kết quả tương đương load_data + preprocess_columns, nhưng chỉ giữ các chỉ số được dùng,
+        các cột định danh ngành/năm ở dạng category và taxcode ở dạng chuỗi.
+        """
+        file_format = DataProcessor._file_format(file_path)
+        dtypes = DataProcessor.scoring_dtypes(float_dtype)
+        columns = [col for col in DataProcessor._file_columns(file_path, file_format, delimiter) if col in dtypes]
+        dtypes = {col: dtypes[col] for col in columns}
+
+        if file_format == 'parquet':
+            df = DataProcessor._cast_columns(pd.read_parquet(file_path, columns=columns), dtypes)
+        elif file_format == 'feather':
+            df = DataProcessor._cast_columns(pd.read_feather(file_path, columns=columns), dtypes)
+        else:
+            engine = DataProcessor._resolve_engine(engine)
+            if engine == 'pyarrow':
+                df = DataProcessor._read_csv_pyarrow(file_path, delimiter, columns, dtypes)
+            else:
+                df = pd.read_csv(file_path, sep=delimiter, usecols=columns, dtype=dtypes, engine=engine)
+
+        print(f"Đã tải {len(df)} dòng × {len(columns)} cột từ {file_path} ({file_format})")
+        return df
+
+    @staticmethod
+    def iter_chunks(file_path, chunk_size=100_000, delimiter=',', float_dtype='float64'):
+        """
+        Đọc file theo từng khối chunk_size dòng (không tải toàn bộ file vào bộ nhớ),
+        chỉ các cột và kiểu dữ liệu như load_scoring_data. Hỗ trợ CSV, Parquet và Feather.
+        """
+        file_format = DataProcessor._file_format(file_path)
+        dtypes = DataProcessor.scoring_dtypes(float_dtype)
+        columns = [col for col in DataProcessor._file_columns(file_path, file_format, delimiter) if col in dtypes]
+        dtypes = {col: dtypes[col] for col in columns}
+
+        if file_format == 'csv':
+            # Engine pyarrow không hỗ trợ chunksize
+            with pd.read_csv(file_path, sep=delimiter, usecols=columns, dtype=dtypes, chunksize=chunk_size) as reader:
+                yield from reader
+            return
+
+        if file_format == 'parquet':
+            import pyarrow.parquet as pq
+            batches = pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size, columns=columns)
+        else:
+            import pyarrow.dataset as ds
+            batches = ds.dataset(file_path, format='ipc').to_batches(columns=columns, batch_size=chunk_size)
+
+        for batch in batches:
+            yield DataProcessor._cast_columns(batch.to_pandas(), dtypes)
+
     @staticmethod
     def basic_info(df):
         """
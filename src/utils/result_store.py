@@ -0,0 +1,248 @@
+"""
+Kho kết quả chấm điểm trên SQLite, tra cứu theo (taxcode, yearreport)
+Một bảng `scores` WITHOUT ROWID với khóa chính (taxcode, yearreport): mỗi dòng là kết quả của một
+công ty một năm (T-score nhóm, điểm nhóm thô, T-score từng chỉ số), nên tra cứu một khóa chỉ là
+một lần dò B-tree, không cần dựng DataFrame.
+
+Pipeline batch ghi (INSERT OR REPLACE theo khối), API đọc ở chế độ chỉ đọc; WAL cho phép đọc
+trong khi đang ghi. Mỗi thread (và mỗi tiến trình sau fork) dùng một kết nối riêng.
+"""
+
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+TABLE = 'scores'
+KEY_COLUMNS = ('taxcode', 'yearreport')
+INFO_COLUMNS = ('sector_unique_id',)
+
+# Số khóa mỗi câu truy vấn của get_many (2 tham số mỗi khóa)
+LOOKUP_BATCH = 400
+
+
+def result_columns(results):
+    """
+    Ghép kết quả của process_file / ChunkedScoringPipeline.transform thành một DataFrame
+    các cột được lưu: khóa, sector_unique_id, <group>_TScore, <group>_Score, <field>_Tscore.
+    """
+    final_scores = results['final_scores']
+    parts = [final_scores[[c for c in KEY_COLUMNS + INFO_COLUMNS if c in final_scores.columns]]]
+    parts.append(final_scores[[c for c in final_scores.columns if c.endswith('_TScore')]])
+    if 'field_scores' in results:
+        parts.append(results['field_scores'].filter(regex=r'_Score$'))
+    if 'scored_individual' in results:
+        parts.append(results['scored_individual'].filter(regex=r'_Tscore$'))
+    return pd.concat(parts, axis=1)
+
+
+def _column_type(col):
+    return 'REAL' if col.endswith('_Score') else 'INTEGER' if col in INFO_COLUMNS else 'TEXT'
+
+
+def _column_values(series):
+    """Giá trị Python của một cột để ghi SQLite: T-score -> 'T1'..'T8', còn lại -> số; thiếu -> None."""
+    if series.name.endswith(('_TScore', '_Tscore')):
+        values = series.to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = None
+        return values.tolist()
+    numbers = pd.to_numeric(series.astype(object), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    values = numbers.astype(object)
+    values[np.isnan(numbers)] = None
+    return values.tolist()
+
+
+class ResultStore:
+    """
+    Kho kết quả theo (taxcode, yearreport).
+
+    Parameters:
+        path: file SQLite
+        readonly: mở chỉ đọc (API); file phải tồn tại
+    """
+
+    def __init__(self, path, readonly=False):
+        if readonly and not os.path.exists(path):
+            raise ValueError(f"Result store not found: {path}")
+        self.path = path
+        self.readonly = readonly
+        self._local = threading.local()
+        # (schema_version, danh sách cột) lần đọc gần nhất
+        self._columns = None
+
+    # ------------------------------------------------------------------
+    # Kết nối
+    # ------------------------------------------------------------------
+    def connection(self):
+        """Kết nối SQLite của thread hiện tại (mở lại sau fork)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if self.readonly:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_reachable(self):
+        """Mở và đọc được file SQLite từ thread hiện tại (dùng cho readiness probe)."""
+        try:
+            self.connection().execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    @property
+    def columns(self):
+        """
+        Danh sách cột của bảng scores (rỗng nếu chưa ghi gì).
+        Cache theo PRAGMA schema_version nên thấy cả cột do tiến trình ghi khác thêm vào (ví dụ API chỉ đọc).
+        """
+        conn = self.connection()
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        cached = self._columns
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE})").fetchall()]
+        self._columns = (version, columns)
+        return columns
+
+    # ------------------------------------------------------------------
+    # Ghi
+    # ------------------------------------------------------------------
+    def _ensure_schema(self, frame):
+        conn = self.connection()
+        existing = self.columns
+        if not existing:
+            definitions = ["taxcode TEXT NOT NULL", "yearreport INTEGER NOT NULL"]
+            for col in frame.columns:
+                if col in KEY_COLUMNS:
+                    continue
+                definitions.append(f'"{col}" {_column_type(col)}')
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} ({', '.join(definitions)}, "
+                         f"PRIMARY KEY (taxcode, yearreport)) WITHOUT ROWID")
+        else:
+            lowered = {c.lower() for c in existing}
+            for col in frame.columns:
+                if col.lower() not in lowered:
+                    conn.execute(f'ALTER TABLE {TABLE} ADD COLUMN "{col}" {_column_type(col)}')
+
+    def write_frame(self, frame):
+        """
+        Ghi (INSERT OR REPLACE) một DataFrame kết quả có cột taxcode, yearreport.
+        Dòng thiếu khóa bị bỏ qua. Trả về số dòng đã ghi.
+        """
+        if self.readonly:
+            raise RuntimeError("Result store is opened read-only")
+        missing = [c for c in KEY_COLUMNS if c not in frame.columns]
+        if missing:
+            raise ValueError(f"Result frame is missing key columns: {missing}")
+
+        year = pd.to_numeric(frame['yearreport'].astype(object), errors='coerce')
+        keep = frame['taxcode'].notna().to_numpy() & year.notna().to_numpy()
+        frame = frame[keep]
+        if frame.empty:
+            return 0
+
+        self._ensure_schema(frame)
+        columns = list(frame.columns)
+        values = [
+            frame['taxcode'].astype(str).tolist() if col == 'taxcode'
+            else year[keep].astype('int64').tolist() if col == 'yearreport'
+            else _column_values(frame[col])
+            for col in columns
+        ]
+        names = ', '.join(f'"{c}"' for c in columns)
+        placeholders = ', '.join('?' * len(columns))
+
+        conn = self.connection()
+        with conn:
+            conn.executemany(f"INSERT OR REPLACE INTO {TABLE} ({names}) VALUES ({placeholders})", zip(*values))
+            # Tăng thế hệ dữ liệu trong cùng transaction để bên đọc biết cần dựng lại chỉ mục
+            generation = conn.execute("PRAGMA user_version").fetchone()[0]
+            conn.execute(f"PRAGMA user_version = {generation + 1}")
+        return len(frame)
+
+    def write_results(self, results):
+        """Ghi dict kết quả của process_file / transform / IncrementalScorer.update."""
+        return self.write_frame(result_columns(results))
+
+    # ------------------------------------------------------------------
+    # Tra cứu
+    # ------------------------------------------------------------------
+    def _records(self, cursor):
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def get(self, taxcode, yearreport):
+        """Kết quả của một công ty một năm (dict theo cột) hoặc None."""
+        if not self.columns:
+            return None
+        cursor = self.connection().execute(
+            f"SELECT * FROM {TABLE} WHERE taxcode = ? AND yearreport = ?", (str(taxcode), int(yearreport))
+        )
+        row = cursor.fetchone()
+        return None if row is None else dict(zip([d[0] for d in cursor.description], row))
+
+    def get_company(self, taxcode):
+        """Kết quả mọi năm của một công ty, tăng dần theo năm."""
+        if not self.columns:
+            return []
+        cursor = self.connection().execute(
+            f"SELECT * FROM {TABLE} WHERE taxcode = ? ORDER BY yearreport", (str(taxcode),)
+        )
+        return self._records(cursor)
+
+    def get_many(self, keys):
+        """Kết quả của nhiều khóa [(taxcode, yearreport), ...]; khóa không có kết quả bị bỏ qua."""
+        keys = list(dict.fromkeys((str(taxcode), int(yearreport)) for taxcode, yearreport in keys))
+        if not keys or not self.columns:
+            return []
+
+        conn = self.connection()
+        records = []
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[start:start + LOOKUP_BATCH]
+            placeholders = ', '.join(['(?, ?)'] * len(batch))
+            # JOIN từ danh sách khóa để mỗi khóa là một lần dò khóa chính (IN (VALUES ...) quét cả bảng)
+            cursor = conn.execute(
+                f"WITH k(taxcode, yearreport) AS (VALUES {placeholders}) "
+                f"SELECT {TABLE}.* FROM k JOIN {TABLE} "
+                f"ON {TABLE}.taxcode = k.taxcode AND {TABLE}.yearreport = k.yearreport",
+                [v for key in batch for v in key]
+            )
+            records.extend(self._records(cursor))
+        return records
+
+    def read_frame(self, columns=None):
+        """Đọc toàn bộ bảng (hoặc các cột chỉ định) thành DataFrame, ví dụ để dựng PeerRankIndex."""
+        if not self.columns:
+            return pd.DataFrame(columns=columns or [])
+        names = ', '.join(f'"{c}"' for c in columns) if columns else '*'
+        cursor = self.connection().execute(f"SELECT {names} FROM {TABLE}")
+        return pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+
+    def generation(self):
+        """Thế hệ dữ liệu (PRAGMA user_version), tăng sau mỗi lần ghi từ bất kỳ tiến trình nào."""
+        return self.connection().execute("PRAGMA user_version").fetchone()[0]
+
+    def count(self):
+        if not self.columns:
+            return 0
+        return self.connection().execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
@@ -0,0 +1,211 @@
+"""
+Ghi kết quả chấm điểm ra Parquet, phân vùng theo năm / ngành
+Cấu trúc thư mục kiểu Hive để công cụ BI (pyarrow, DuckDB, Spark, ...) lọc theo partition
+mà không phải quét toàn bộ dữ liệu:
+
+    output_dir/final_scores/yearreport=2023/sector_unique_id=12/part-0.parquet
+    output_dir/field_scores/...
+    output_dir/indicator_tscores/...
+
+Ghi theo luồng: mỗi partition có một ParquetWriter mở, dữ liệu được gom thành row group
+row_group_size dòng rồi ghi, nên có thể ghi lần lượt từng khối của pipeline theo khối.
+"""
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.core.binning import TSCORE_DTYPE
+from src.utils.shared_dataset import ID_COLUMNS
+
+PARTITION_BY = ('yearreport', 'sector_unique_id')
+
+# Tên bảng đầu ra -> khóa trong dict kết quả của process_file / ChunkedScoringPipeline.transform
+RESULT_TABLES = {
+    'final_scores': 'final_scores',
+    'field_scores': 'field_scores',
+    'indicator_tscores': 'scored_individual',
+}
+
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow") from e
+    return pa, pq
+
+
+def compact_frame(df):
+    """
+    Kiểu dữ liệu gọn cho đầu ra: cột T-score -> category T1..T8 (dictionary int8 trong Parquet),
+    điểm nhóm thô (<group>_Score) -> float32.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col.endswith('_Tscore') or col.endswith('_TScore'):
+            if df[col].dtype != TSCORE_DTYPE:
+                df[col] = df[col].astype(TSCORE_DTYPE)
+        elif col.endswith('_Score'):
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def partition_value(value):
+    """Giá trị partition dạng chuỗi cho tên thư mục (2023.0 -> '2023', thiếu -> NULL_PARTITION)."""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return NULL_PARTITION
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class ParquetResultWriter:
+    """
+    Ghi các bảng kết quả theo luồng ra Parquet phân vùng kiểu Hive.
+
+    Parameters:
+        output_dir: thư mục gốc, mỗi bảng một thư mục con
+        partition_by: các cột phân vùng (bị bỏ khỏi file, giá trị nằm trong đường dẫn)
+        row_group_size: số dòng mỗi row group
+        max_open_files: số file đang mở tối đa; khi vượt, file ít dùng nhất được đóng
+            và lần ghi sau của partition đó mở file mới (part-1, part-2, ...)
+        compression: codec Parquet
+
+    Ví dụ:
+        with ParquetResultWriter("output/scores") as writer:
+            for result in pipeline.iter_scored(chunk_source):
+                writer.write_results(result)
+    """
+
+    def __init__(self, output_dir, partition_by=PARTITION_BY, row_group_size=65_536,
+                 max_open_files=256, compression='zstd'):
+        self.pa, self.pq = _require_pyarrow()
+        self.output_dir = output_dir
+        self.partition_by = list(partition_by or [])
+        self.row_group_size = row_group_size
+        self.max_open_files = max_open_files
+        self.compression = compression
+
+        self.schemas = {}                 # bảng -> schema pyarrow (cố định từ khối đầu tiên)
+        self._writers = OrderedDict()     # (bảng, partition) -> [ParquetWriter, các khối đang chờ, số dòng chờ]
+        self._file_counts = {}            # (bảng, partition) -> số file đã mở
+        self.rows_written = {}
+
+    # ------------------------------------------------------------------
+    # Ghi
+    # ------------------------------------------------------------------
+    def write(self, table, df):
+        """Ghi (nối thêm) một DataFrame vào bảng, tách theo partition."""
+        if len(df) == 0:
+            return
+        missing = [col for col in self.partition_by if col not in df.columns]
+        if missing:
+            raise ValueError(f"Partition columns {missing} are missing from table '{table}'")
+
+        df = compact_frame(df)
+        if not self.partition_by:
+            self._append(table, (), df)
+        else:
+            for key, part in df.groupby(self.partition_by, sort=False, dropna=False, observed=True):
+                key = key if isinstance(key, tuple) else (key,)
+                self._append(table, tuple(partition_value(v) for v in key), part.drop(columns=self.partition_by))
+
+        self.rows_written[table] = self.rows_written.get(table, 0) + len(df)
+
+    def write_results(self, results, tables=None):
+        """Ghi dict kết quả (process_file hoặc một khối của ChunkedScoringPipeline)."""
+        for table in tables or RESULT_TABLES:
+            frame = results.get(RESULT_TABLES[table])
+            if frame is None:
+                continue
+            if table == 'indicator_tscores':
+                # scored_individual còn chứa giá trị gốc của chỉ số: chỉ ghi định danh + mã T
+                frame = frame[[c for c in frame.columns if c in ID_COLUMNS or c.endswith('_Tscore')]]
+            self.write(table, frame)
+
+    def _append(self, table, key, df):
+        arrow_table = self._to_arrow(table, df)
+        entry = self._writers.get((table, key))
+        if entry is None:
+            entry = self._open(table, key)
+        else:
+            self._writers.move_to_end((table, key))
+
+        entry[1].append(arrow_table)
+        entry[2] += arrow_table.num_rows
+        if entry[2] >= self.row_group_size:
+            self._flush(entry)
+
+    def _to_arrow(self, table, df):
+        schema = self.schemas.get(table)
+        if schema is None:
+            arrow_table = self.pa.Table.from_pandas(df, preserve_index=False)
+            self.schemas[table] = arrow_table.schema.remove_metadata()
+            return arrow_table.replace_schema_metadata(None)
+        return self.pa.Table.from_pandas(df, schema=schema, preserve_index=False).replace_schema_metadata(None)
+
+    def _open(self, table, key):
+        if len(self._writers) >= self.max_open_files:
+            _, oldest = self._writers.popitem(last=False)
+            self._close_entry(oldest)
+
+        directory = os.path.join(
+            self.output_dir, table,
+            *[f"{col}={value}" for col, value in zip(self.partition_by, key)]
+        )
+        os.makedirs(directory, exist_ok=True)
+        index = self._file_counts.get((table, key), 0)
+        self._file_counts[(table, key)] = index + 1
+
+        path = os.path.join(directory, f"part-{index}.parquet")
+        writer = self.pq.ParquetWriter(path, self.schemas[table], compression=self.compression)
+        entry = [writer, [], 0]
+        self._writers[(table, key)] = entry
+        return entry
+
+    def _flush(self, entry):
+        if entry[1]:
+            writer = entry[0]
+            writer.write_table(self.pa.concat_tables(entry[1]), row_group_size=self.row_group_size)
+            entry[1], entry[2] = [], 0
+
+    def _close_entry(self, entry):
+        self._flush(entry)
+        entry[0].close()
+
+    # ------------------------------------------------------------------
+    # Vòng đời
+    # ------------------------------------------------------------------
+    def close(self):
+        """Ghi các row group còn chờ và đóng mọi file."""
+        while self._writers:
+            _, entry = self._writers.popitem(last=False)
+            self._close_entry(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_results_parquet(results, output_dir, partition_by=PARTITION_BY, **kwargs):
+    """Ghi một dict kết quả (đã có trong bộ nhớ) ra Parquet phân vùng."""
+    with ParquetResultWriter(output_dir, partition_by, **kwargs) as writer:
+        writer.write_results(results)
+        return dict(writer.rows_written)
+
+
+def read_results_parquet(output_dir, table='final_scores', filters=None, columns=None):
+    """
+    Đọc một bảng kết quả; filters lọc theo partition không cần đọc các thư mục khác,
+    ví dụ filters=[('yearreport', '=', 2023)].
+    """
+    _require_pyarrow()
+    return pd.read_parquet(os.path.join(output_dir, table), filters=filters, columns=columns)
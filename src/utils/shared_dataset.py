@@ -0,0 +1,212 @@
+"""
+Shared-memory dataset cho xử lý nhiều tiến trình
+Đặt ma trận chỉ số STD_RTD* và các cột định danh vào multiprocessing.shared_memory
+(hoặc file memory-mapped) một lần; worker gắn view NumPy theo tên qua một handle nhỏ,
+không cần pickle cả DataFrame cho từng tiến trình.
+"""
+
+import os
+import shutil
+import tempfile
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMNS = ['taxcode', 'sector_unique_id', 'sector_unique_id_raw', 'yearreport']
+
+BACKENDS = ('shm', 'memmap')
+
+
+class SharedDatasetHandle:
+    """
+    Mô tả có thể pickle của một SharedDataset: tên vùng nhớ / đường dẫn file, shape và dtype
+    của từng mảng. Gửi handle này cho worker rồi gọi SharedDataset.attach(handle).
+    """
+
+    def __init__(self, backend, specs, value_columns=None, directory=None):
+        self.backend = backend
+        self.specs = specs  # {name: (location, shape, dtype)}
+        self.value_columns = list(value_columns or [])
+        self.directory = directory
+
+    def __repr__(self):
+        return f"SharedDatasetHandle(backend={self.backend!r}, arrays={list(self.specs)})"
+
+
+class SharedDataset:
+    """
+    Tập các mảng NumPy có tên nằm trong bộ nhớ dùng chung.
+
+    - Tiến trình tạo (owner) sở hữu vùng nhớ: close() đóng và giải phóng (unlink / xóa file).
+      Nếu quên close(), vùng nhớ được giải phóng khi đối tượng bị thu gom hoặc khi thoát.
+    - Tiến trình gắn vào (attach) chỉ nhận view chỉ đọc; close() chỉ đóng phía nó.
+
+    Ví dụ:
+        with SharedDataset.from_dataframe(df) as dataset:
+            pool.submit(worker, dataset.handle)
+
+        def worker(handle):
+            with SharedDataset.attach(handle) as dataset:
+                values = dataset.values   # view (rows × chỉ số), không sao chép
+    """
+
+    def __init__(self, handle, arrays, resources, owner):
+        self.handle = handle
+        self._arrays = arrays
+        self.owner = owner
+        # Dọn dẹp chạy đúng một lần: close() gọi trực tiếp, hoặc khi đối tượng bị thu gom
+        self._finalizer = weakref.finalize(self, SharedDataset._release, resources, owner)
+
+    # ------------------------------------------------------------------
+    # Tạo / gắn
+    # ------------------------------------------------------------------
+    @classmethod
+    def create(cls, arrays, backend='shm', directory=None, value_columns=None):
+        """
+        Sao chép các mảng vào bộ nhớ dùng chung.
+
+        Parameters:
+            arrays: dict {name: ndarray} (dtype số, bool hoặc chuỗi cố định 'U'/'S')
+            backend: 'shm' (multiprocessing.shared_memory) hoặc 'memmap' (file .npy trong directory)
+            directory: thư mục cho backend 'memmap' (mặc định thư mục tạm)
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+        specs, views, resources = {}, {}, []
+        if backend == 'memmap':
+            directory = tempfile.mkdtemp(prefix='shared_dataset_', dir=directory)
+            resources.append(directory)
+
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                if array.dtype == object:
+                    raise TypeError(f"Array '{name}' has object dtype; convert it to a fixed-width type first")
+
+                if backend == 'shm':
+                    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                    resources.append(shm)
+                    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+                    location = shm.name
+                else:
+                    location = os.path.join(directory, f"{name}.npy")
+                    view = np.lib.format.open_memmap(location, mode='w+', dtype=array.dtype, shape=array.shape)
+
+                view[...] = array
+                specs[name] = (location, array.shape, array.dtype.str)
+                views[name] = view
+        except BaseException:
+            cls._release(resources, True)
+            raise
+
+        handle = SharedDatasetHandle(backend, specs, value_columns, directory)
+        return cls(handle, views, resources, owner=True)
+
+    @classmethod
+    def from_dataframe(cls, df, value_columns=None, id_columns=None, backend='shm', directory=None):
+        """
+        Đặt DataFrame vào bộ nhớ dùng chung: mảng 'values' (rows × chỉ số, float64) cho các
+        cột chỉ số (mặc định mọi cột STD_RTD*) và mỗi cột định danh có trong df một mảng riêng.
+        Cột chuỗi (ví dụ taxcode) được lưu dạng chuỗi cố định, thiếu -> ''.
+        """
+        if value_columns is None:
+            value_columns = [col for col in df.columns if col.startswith('STD_RTD')]
+        if id_columns is None:
+            id_columns = [col for col in ID_COLUMNS if col in df.columns]
+
+        arrays = {'values': df[value_columns].to_numpy(dtype=float, na_value=np.nan)}
+        for col in id_columns:
+            series = df[col]
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                arrays[col] = series.to_numpy(dtype=float, na_value=np.nan) if series.hasnans else series.to_numpy()
+            else:
+                arrays[col] = series.fillna('').astype(str).to_numpy(dtype=str)
+
+        return cls.create(arrays, backend, directory, value_columns)
+
+    @classmethod
+    def attach(cls, handle):
+        """Gắn view chỉ đọc (không sao chép) vào dataset đã tạo ở tiến trình khác."""
+        views, resources = {}, []
+        for name, (location, shape, dtype) in handle.specs.items():
+            if handle.backend == 'shm':
+                shm = shared_memory.SharedMemory(name=location)
+                resources.append(shm)
+                view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            else:
+                view = np.load(location, mmap_mode='r')
+            view.flags.writeable = False
+            views[name] = view
+        return cls(handle, views, resources, owner=False)
+
+    # ------------------------------------------------------------------
+    # Truy cập
+    # ------------------------------------------------------------------
+    def __getitem__(self, name):
+        return self._arrays[name]
+
+    def __contains__(self, name):
+        return name in self._arrays
+
+    @property
+    def names(self):
+        return list(self._arrays)
+
+    @property
+    def values(self):
+        """Ma trận chỉ số (rows × value_columns)."""
+        return self._arrays['values']
+
+    @property
+    def value_columns(self):
+        return self.handle.value_columns
+
+    def to_dataframe(self, copy=True):
+        """Dựng lại DataFrame (các cột định danh + các cột chỉ số)."""
+        data = {name: (np.array(array) if copy else array) for name, array in self._arrays.items() if name != 'values'}
+        if 'values' in self._arrays:
+            values = np.array(self.values) if copy else self.values
+            data.update({col: values[:, j] for j, col in enumerate(self.value_columns)})
+        return pd.DataFrame(data)
+
+    # ------------------------------------------------------------------
+    # Vòng đời
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _release(resources, owner):
+        for resource in resources:
+            if isinstance(resource, shared_memory.SharedMemory):
+                try:
+                    resource.close()
+                except BufferError:
+                    # Còn view đang dùng vùng nhớ: vẫn unlink được, bộ nhớ trả về khi view cuối biến mất
+                    pass
+                if owner:
+                    try:
+                        resource.unlink()
+                    except FileNotFoundError:
+                        pass
+            elif owner:
+                shutil.rmtree(resource, ignore_errors=True)
+
+    @property
+    def closed(self):
+        return not self._finalizer.alive
+
+    def close(self):
+        """Đóng dataset; owner đồng thời giải phóng vùng nhớ / file."""
+        self._arrays = {}
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __repr__(self):
+        state = 'closed' if self.closed else ('owner' if self.owner else 'attached')
+        return f"SharedDataset({self.handle.backend}, arrays={list(self.handle.specs)}, {state})"
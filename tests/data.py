@@ -0,0 +1,130 @@
+"""
+Dữ liệu mẫu có seed dùng chung cho các bài kiểm tra: đủ các chỉ số của cấu hình,
+mã số thuế có số 0 ở đầu, ngành / năm lệch cỡ và khoảng 10% giá trị thiếu.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+
+FIELDS = list(dict.fromkeys([f for fields in FIELD_MAPPING.values() for f in fields] + list(GOOD_BAD_MAPPING)))
+
+
+def make_population(n=500, seed=0, missing=0.1):
+    """DataFrame n công ty với mọi chỉ số của FIELD_MAPPING / GOOD_BAD_MAPPING."""
+    rng = np.random.default_rng(seed)
+    sectors = rng.choice([101, 102, 103, 104], size=n, p=[0.5, 0.3, 0.15, 0.05])
+    df = pd.DataFrame({
+        'taxcode': [f"{i:010d}" for i in range(n)],
+        'sector_unique_id': sectors,
+        'sector_unique_id_raw': sectors * 100,
+        'yearreport': rng.choice([2022, 2023], size=n),
+    })
+    for j, field in enumerate(FIELDS):
+        # Xen kẽ phân phối liên tục và giá trị làm tròn (nhiều giá trị trùng)
+        values = rng.normal(size=n) if j % 2 else np.round(rng.lognormal(size=n), 1)
+        values[rng.random(n) < missing] = np.nan
+        df[field] = values
+    return df
+
+
+def companies_payload(df, fields=None):
+    """Danh sách 'companies' của /process-groups (định dạng theo dòng) từ DataFrame; bỏ giá trị thiếu."""
+    fields = set(FIELDS if fields is None else fields)
+    companies = []
+    for row in df.to_dict(orient='records'):
+        scores = {}
+        for group, group_fields in FIELD_MAPPING.items():
+            indicators = [
+                {'indicator': f, 'value': float(row[f])}
+                for f in group_fields if f in fields and f in row and not pd.isna(row[f])
+            ]
+            if indicators:
+                scores[group] = indicators
+        companies.append({
+            'taxcode': row['taxcode'],
+            'sector_unique_id_raw': int(row['sector_unique_id_raw']),
+            'yearreport': int(row['yearreport']),
+            'scores': scores,
+        })
+    return companies
+
+
+def labels(values):
+    """Nhãn T-score dạng list (None nếu thiếu) để so sánh không phụ thuộc kiểu lưu."""
+    return [None if pd.isna(v) or v == "" else str(v) for v in pd.Series(values).astype(object)]
+
+
+def columnar_payload(df, fields=None):
+    """Body dạng cột của /process-groups: 'taxcodes' và một mảng (null = thiếu) cho mỗi chỉ số."""
+    fields = [f for f in (FIELDS if fields is None else fields) if f in df.columns]
+    return {
+        'taxcodes': df['taxcode'].tolist(),
+        'indicators': {f: [None if pd.isna(v) else float(v) for v in df[f]] for f in fields},
+    }
+
+
+def make_indicator_frame(n=3000, seed=20240601):
+    """
+    Bốn chỉ số A–D: liên tục, làm tròn (nhiều trùng), số nguyên ít giá trị, gần hằng; 10% NaN.
+    Ngành 1..5 lệch cỡ, năm 2021..2023.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'taxcode': [f"{i:010d}" for i in range(n)],
+        'sector_unique_id': rng.choice([1, 2, 3, 4, 5], size=n, p=[0.5, 0.3, 0.15, 0.04, 0.01]),
+        'yearreport': rng.choice([2021, 2022, 2023], size=n),
+        'A': rng.normal(size=n),
+        'B': np.round(rng.lognormal(size=n), 1),
+        'C': rng.integers(0, 12, size=n).astype(float),
+        'D': np.where(rng.random(n) < 0.9, 1.0, rng.normal(size=n)),
+    })
+    for col in INDICATOR_MAPPING:
+        df.loc[rng.random(n) < 0.1, col] = np.nan
+    return df
+
+
+INDICATOR_MAPPING = {'A': 'high_good', 'B': 'low_good', 'C': 'high_good', 'D': 'low_good'}
+
+
+def pandas_tscores(df, field, direction, lower_cut=0.05, upper_cut=0.95):
+    """Nhãn T của một chỉ số theo đường pandas từng cột ban đầu (kể cả các trường hợp đặc biệt)."""
+    from src.core.scoring import FinancialScorer
+
+    scorer = FinancialScorer()
+    score_col = pd.Series(index=df.index, dtype=object)
+    if field in scorer.special_zero_fields:
+        values = scorer.handle_special_zero_fields(df[field], score_col)
+    elif field == "STD_RTD96":
+        values = scorer.handle_special_cases_rtd96(df, field, score_col)
+    elif field == "STD_RTD148":
+        values = scorer.handle_special_cases_rtd148(df, field, score_col)
+    else:
+        values = df[field].dropna()
+    if len(values) >= 3:
+        scorer.assign_scores_normal_distribution(values, direction, lower_cut, upper_cut, score_col)
+    return labels(score_col)
+
+
+def pandas_partitioned_tscores(df, field, direction, partition_by, min_partition_size=30, min_count=3):
+    """
+    Nhãn T chia bin theo partition bằng groupby: partition có ít hơn min_partition_size giá trị
+    lùi về cấp cha (bỏ dần cột cuối của partition_by), cuối cùng là toàn cục.
+    """
+    result = [None] * len(df)
+    pending = df[field].notna().to_numpy(copy=True)
+    for depth in range(len(partition_by), -1, -1):
+        keys = list(partition_by[:depth])
+        threshold = max(min_count, min_partition_size) if keys else min_count
+        groups = df.groupby(keys).indices.values() if keys else [np.arange(len(df))]
+        for rows in groups:
+            part = df.iloc[rows]
+            if part[field].notna().sum() < threshold:
+                continue
+            for row, label in zip(rows, pandas_tscores(part, field, direction)):
+                if pending[row]:
+                    result[row] = label
+                    pending[row] = False
+    return result
@@ -0,0 +1,90 @@
+"""
+Kernel chia bin vector hóa so với đường pandas từng cột.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.binning import T_LABELS, TSCORE_DTYPE, tscore_categorical, tscore_codes, tscore_labels
+from src.core.field_score import field_score
+from src.core.scoring import FinancialScorer
+from tests.data import (
+    INDICATOR_MAPPING, labels, make_indicator_frame, make_population, pandas_partitioned_tscores, pandas_tscores
+)
+
+
+PARTITION_BY = ['sector_unique_id', 'yearreport']
+
+
+@pytest.fixture(scope='module')
+def data():
+    return make_indicator_frame()
+
+
+def test_global_binning_matches_pandas(data):
+    fields, codes = FinancialScorer().score_codes(data, INDICATOR_MAPPING)
+    assert fields == list(INDICATOR_MAPPING)
+    for j, field in enumerate(fields):
+        assert labels(T_LABELS[codes[:, j]]) == pandas_tscores(data, field, INDICATOR_MAPPING[field]), field
+
+
+def test_partitioned_binning_matches_pandas_groupby(data):
+    _, codes = FinancialScorer().score_codes(data, INDICATOR_MAPPING, partition_by=PARTITION_BY, min_partition_size=30)
+    for j, field in enumerate(INDICATOR_MAPPING):
+        expected = pandas_partitioned_tscores(data, field, INDICATOR_MAPPING[field], PARTITION_BY)
+        assert labels(T_LABELS[codes[:, j]]) == expected, field
+
+
+def test_partition_columns_must_exist(data):
+    with pytest.raises(ValueError):
+        FinancialScorer().score_codes(data, INDICATOR_MAPPING, partition_by=['sector_label'])
+
+
+def test_assign_scores_df_matches_pandas():
+    df = make_population(600, seed=5)
+    # Các trường hợp đặc biệt: giá trị <= 0 của STD_RTD60 / STD_RTD61 và các chỉ số "zero fields"
+    df.loc[::7, 'STD_RTD60'] = -1.0
+    df.loc[::5, 'STD_RTD61'] = 0.0
+    scored = FinancialScorer().assign_scores_df(df, GOOD_BAD_MAPPING, 0.05, 0.95)
+
+    assert not any(field in scored.columns for field in GOOD_BAD_MAPPING)
+    for field, direction in GOOD_BAD_MAPPING.items():
+        assert labels(scored[field + "_Tscore"]) == pandas_tscores(df, field, direction), field
+
+
+def test_too_few_values_are_unscored():
+    df = make_indicator_frame(40, seed=1)
+    df.loc[2:, 'A'] = np.nan
+    _, codes = FinancialScorer().score_codes(df, {'A': 'high_good'})
+    assert not codes.any()
+
+
+def pandas_group_tscores(series, lower_cut=0.05, upper_cut=0.95):
+    score_col = pd.Series(index=series.index, dtype=object)
+    FinancialScorer().assign_field_normal_distribution(series.dropna(), lower_cut, upper_cut, score_col)
+    return labels(score_col)
+
+
+def test_assign_scores_field_matches_pandas():
+    df = make_population(400, seed=6)
+    field_scores = field_score(df, FIELD_MAPPING, GOOD_BAD_MAPPING).assign(sector_unique_id=df['sector_unique_id'])
+    field_scores.loc[::9, 'Growth_Score'] = np.nan
+    result = FinancialScorer().assign_scores_field(field_scores, FIELD_MAPPING)
+    for group in FIELD_MAPPING:
+        assert labels(result[f"{group}_TScore"]) == pandas_group_tscores(field_scores[f"{group}_Score"]), group
+
+
+def test_tscore_columns_are_categorical():
+    df = make_population(200, seed=7)
+    scored = FinancialScorer().assign_scores_df(df, GOOD_BAD_MAPPING)
+    column = scored['STD_RTD8_Tscore']
+    assert column.dtype == TSCORE_DTYPE
+    codes = tscore_codes(column)
+    assert codes.dtype == np.uint8
+    assert labels(tscore_labels(codes)) == labels(column)
+    assert labels(tscore_categorical(codes, index=column.index)) == labels(column)
+    # Cột chuỗi cũ đọc lại ra cùng mã
+    np.testing.assert_array_equal(tscore_codes(column.astype(object)), codes)
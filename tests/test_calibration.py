@@ -0,0 +1,83 @@
+"""
+Calibration cố định: lưu / tải không đổi biên, chấm cả quần thể theo calibration giống chia min–max
+của chính quần thể, và một lô nhỏ gửi lên API nhận cùng điểm như khi nằm trong quần thể.
+"""
+
+import numpy as np
+import pytest
+
+from src.api.scoring_api import FinancialScoringAPI
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.calibration import Calibration
+from src.core.field_score import assign_scores_field, field_score
+from tests.data import companies_payload, labels, make_population
+
+
+@pytest.fixture(scope='module')
+def population():
+    return make_population(400, seed=1)
+
+
+@pytest.fixture(scope='module')
+def calibration(population):
+    return Calibration.from_population(population, FIELD_MAPPING, GOOD_BAD_MAPPING)
+
+
+@pytest.fixture(scope='module')
+def calibration_path(calibration, tmp_path_factory):
+    path = tmp_path_factory.mktemp('calibration') / "calibration.json"
+    calibration.save(str(path))
+    return str(path)
+
+
+def test_round_trip(calibration, calibration_path):
+    loaded = Calibration.load(calibration_path)
+    assert loaded.to_dict() == calibration.to_dict()
+    assert set(loaded.group_edges) == set(FIELD_MAPPING)
+    for group, edges in calibration.group_edges.items():
+        np.testing.assert_array_equal(loaded.group_edges[group], edges)
+
+
+def test_population_matches_min_max_binning(population, calibration):
+    scores = field_score(population, FIELD_MAPPING, GOOD_BAD_MAPPING)
+    batch = assign_scores_field(scores, FIELD_MAPPING)
+    calibrated = assign_scores_field(scores, FIELD_MAPPING, calibration)
+    for group in FIELD_MAPPING:
+        assert labels(calibrated[f"{group}_TScore"]) == labels(batch[f"{group}_TScore"]), group
+
+
+def test_single_company_uses_calibration(population, calibration, calibration_path):
+    expected = assign_scores_field(field_score(population, FIELD_MAPPING, GOOD_BAD_MAPPING), FIELD_MAPPING)
+    client = FinancialScoringAPI(calibration_path=calibration_path).get_app().test_client()
+    assert client.get('/health').get_json()['calibration'] is True
+
+    for i in (0, 7, 123):
+        response = client.post('/process-groups', json={'companies': companies_payload(population.iloc[[i]])})
+        assert response.status_code == 200
+        result = response.get_json()['results'][0]
+        for group in FIELD_MAPPING:
+            assert labels([result[f"{group}_TScore"]]) == labels(expected[f"{group}_TScore"].iloc[[i]]), group
+
+
+def test_single_company_without_calibration_is_t4(population):
+    client = FinancialScoringAPI().get_app().test_client()
+    response = client.post('/process-groups', json={'companies': companies_payload(population.iloc[[0]])})
+    result = response.get_json()['results'][0]
+    assert {result[f"{group}_TScore"] for group in FIELD_MAPPING} == {"T4"}
+
+
+def test_build_calibration(population, calibration, tmp_path):
+    from src.financial_system import FinancialScoringSystem
+
+    path = tmp_path / "built.json"
+    built = FinancialScoringSystem().build_calibration(population, output_path=str(path))
+    assert built.to_dict() == calibration.to_dict()
+    assert Calibration.load(str(path)).to_dict() == calibration.to_dict()
+
+
+def test_old_files_with_indicator_edges_still_load(calibration):
+    data = calibration.to_dict()
+    assert 'indicator_edges' not in data
+    old = {**data, 'indicator_edges': {'STD_RTD8': {'direction': 'high_good', 'q_low': 0.0, 'q_high': 1.0, 'edges': None}}}
+    assert Calibration.from_dict(old).to_dict() == data
@@ -0,0 +1,131 @@
+"""
+Chấm điểm theo khối: sketch phân vị KLL và ChunkedScoringPipeline so với chấm trong bộ nhớ.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.binning import column_bin_stats
+from src.core.chunked import ChunkedScoringPipeline, DistinctValues, sketch_bin_stats
+from src.core.correlation import CorrelationAnalyzer
+from src.core.scoring import FinancialScorer
+from src.core.sketch import QuantileSketch
+from tests.data import INDICATOR_MAPPING, labels, make_indicator_frame, make_population
+
+
+@pytest.fixture(scope='module')
+def values():
+    return make_indicator_frame()['A'].to_numpy()
+
+
+def test_kll_merge_uncompacted_is_exact(values):
+    qs = np.linspace(0, 1, 21)
+    merged = QuantileSketch(k=len(values))
+    for part in np.array_split(values, 7):
+        merged.merge(QuantileSketch(k=len(values)).update(part))
+    np.testing.assert_array_equal(merged.quantiles(qs), pd.Series(values).quantile(qs).to_numpy())
+
+
+def test_kll_merge_rank_error(values):
+    values = np.concatenate([values] * 20)
+    values = values[~np.isnan(values)]
+    k = 200
+    merged = QuantileSketch(k)
+    for seed, part in enumerate(np.array_split(values, 8)):
+        merged.merge(QuantileSketch(k, seed=seed).update(part))
+
+    assert merged.count == values.size
+    assert merged.size < values.size
+    qs = np.linspace(0, 1, 41)
+    estimates = merged.quantiles(qs)
+    assert estimates[0] == values.min() and estimates[-1] == values.max()
+    ranks = np.searchsorted(np.sort(values), estimates, side='left') / values.size
+    assert np.abs(ranks - qs).max() < 3.0 / k
+
+
+def test_sketch_bin_stats_exact_when_tracked():
+    values = make_indicator_frame()[list(INDICATOR_MAPPING)].to_numpy()
+    sketches = [QuantileSketch(200) for _ in INDICATOR_MAPPING]
+    distinct = [DistinctValues() for _ in INDICATOR_MAPPING]
+    for chunk in np.array_split(values, 5):
+        for j, (sketch, tracker) in enumerate(zip(sketches, distinct)):
+            sketch.update(chunk[:, j])
+            tracker.update(chunk[:, j])
+
+    expected = column_bin_stats(values)
+    stats = sketch_bin_stats(sketches, distinct)
+    for key in expected:
+        np.testing.assert_array_equal(stats[key], expected[key], err_msg=key)
+
+
+def match_rate(a, b):
+    return np.mean([x == y for x, y in zip(labels(a), labels(b))])
+
+
+def test_pipeline_close_to_in_memory():
+    df = make_population(2000, seed=13)
+    pipeline = ChunkedScoringPipeline(FIELD_MAPPING, GOOD_BAD_MAPPING, sketch_k=400)
+    chunks = lambda: (df.iloc[i:i + 300] for i in range(0, len(df), 300))
+    pipeline.fit(chunks)
+    assert pipeline.n_rows == len(df)
+
+    analyzer = CorrelationAnalyzer()
+    weights = analyzer.adjust_weights_for_correlation(df, FIELD_MAPPING)
+    assert pipeline.weights == weights
+
+    scored = FinancialScorer().assign_scores_df(df, GOOD_BAD_MAPPING)
+    results = list(pipeline.iter_scored(chunks))
+    assert len(results) == 7
+    chunked_scored = pd.concat([r['scored_individual'] for r in results])
+    assert chunked_scored.index.equals(df.index)
+    for field in GOOD_BAD_MAPPING:
+        assert match_rate(chunked_scored[f"{field}_Tscore"], scored[f"{field}_Tscore"]) > 0.95, field
+
+    final = pd.concat([r['final_scores'] for r in results])
+    assert list(final.columns) == ['taxcode', 'sector_unique_id', 'yearreport'] + [f"{g}_TScore" for g in FIELD_MAPPING]
+
+
+def test_pipeline_matches_in_memory_when_exact():
+    # sketch_k >= số dòng: sketch không nén, mọi biên chính xác như process_file
+    df = make_population(1200, seed=15)
+    pipeline = ChunkedScoringPipeline(FIELD_MAPPING, GOOD_BAD_MAPPING, sketch_k=len(df))
+    chunks = lambda: (df.iloc[i:i + 250] for i in range(0, len(df), 250))
+    pipeline.fit(chunks)
+    results = list(pipeline.iter_scored(chunks))
+
+    scorer, analyzer = FinancialScorer(), CorrelationAnalyzer()
+    scored = scorer.assign_scores_df(df, GOOD_BAD_MAPPING)
+    final = scorer.assign_scores_field(analyzer.field_score(scored, FIELD_MAPPING, pipeline.weights), FIELD_MAPPING)
+
+    chunked_scored = pd.concat([r['scored_individual'] for r in results])
+    for field in GOOD_BAD_MAPPING:
+        assert labels(chunked_scored[f"{field}_Tscore"]) == labels(scored[f"{field}_Tscore"]), field
+    chunked_final = pd.concat([r['final_scores'] for r in results])
+    for group in FIELD_MAPPING:
+        assert labels(chunked_final[f"{group}_TScore"]) == labels(final[f"{group}_TScore"]), group
+
+
+def test_iter_scored_requires_fit():
+    pipeline = ChunkedScoringPipeline(FIELD_MAPPING, GOOD_BAD_MAPPING)
+    with pytest.raises(RuntimeError):
+        next(pipeline.iter_scored(lambda: iter([])))
+
+
+def test_refit_equals_fresh_fit():
+    first, second = make_population(600, seed=17), make_population(900, seed=18)
+    chunks = lambda df: (lambda: (df.iloc[i:i + 200] for i in range(0, len(df), 200)))
+
+    refitted = ChunkedScoringPipeline(FIELD_MAPPING, GOOD_BAD_MAPPING, sketch_k=200)
+    refitted.fit(chunks(first))
+    refitted.fit(chunks(second))
+    fresh = ChunkedScoringPipeline(FIELD_MAPPING, GOOD_BAD_MAPPING, sketch_k=200).fit(chunks(second))
+
+    assert refitted.n_rows == fresh.n_rows == len(second)
+    assert refitted.weights == fresh.weights
+    for key in fresh.group_stats:
+        np.testing.assert_array_equal(refitted.group_stats[key], fresh.group_stats[key], err_msg=key)
+    for key in fresh.indicator_stats:
+        np.testing.assert_array_equal(refitted.indicator_stats[key], fresh.indicator_stats[key], err_msg=key)
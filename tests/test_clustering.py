@@ -0,0 +1,80 @@
+"""
+Gom cụm chỉ số theo tương quan: thành phần liên thông của |corr| > ngưỡng.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config.field_mapping import FIELD_MAPPING
+from src.core.clustering import correlation_clusters, threshold_sweep
+from src.core.correlation import CorrelationAnalyzer
+from tests.data import make_population
+
+
+def brute_force_clusters(corr, threshold):
+    """Thành phần liên thông bằng duyệt đồ thị trên mọi cặp (NaN = không có cạnh)."""
+    columns = list(corr.columns)
+    adjacent = np.abs(corr.to_numpy()) > threshold
+    seen, clusters = set(), []
+    for start in range(len(columns)):
+        if start in seen:
+            continue
+        stack, component = [start], []
+        seen.add(start)
+        while stack:
+            node = stack.pop()
+            component.append(node)
+            for other in np.flatnonzero(adjacent[node]):
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        clusters.append([columns[i] for i in sorted(component)])
+    return clusters
+
+
+def random_correlation(rng, k):
+    corr = rng.uniform(-1, 1, size=(k, k))
+    corr = (corr + corr.T) / 2
+    corr[rng.random((k, k)) < 0.1] = np.nan
+    corr = np.where(np.isnan(corr.T), np.nan, corr)
+    np.fill_diagonal(corr, 1.0)
+    names = [f"F{i}" for i in range(k)]
+    return pd.DataFrame(corr, index=names, columns=names)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_clusters_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    corr = random_correlation(rng, int(rng.integers(1, 12)))
+    for threshold in (0.3, 0.6, 0.9):
+        assert correlation_clusters(corr, threshold) == brute_force_clusters(corr, threshold)
+
+        # Không phụ thuộc thứ tự cột
+        order = rng.permutation(len(corr))
+        permuted = corr.iloc[order, order]
+        assert sorted(map(sorted, correlation_clusters(permuted, threshold))) == \
+            sorted(map(sorted, brute_force_clusters(corr, threshold)))
+
+
+def test_chained_cluster_is_transitive():
+    # a~b, b~c nhưng a !~ c: cả ba cùng một cụm
+    corr = pd.DataFrame([[1.0, 0.95, 0.5], [0.95, 1.0, -0.95], [0.5, -0.95, 1.0]],
+                        index=list('abc'), columns=list('abc'))
+    weights = CorrelationAnalyzer(0.9).weights_from_correlation({'G': corr})
+    assert weights == pytest.approx({'a_Tscore': 1 / 3, 'b_Tscore': 1 / 3, 'c_Tscore': 1 / 3})
+
+
+def test_threshold_sweep_matches_single_thresholds():
+    df = make_population(300, seed=15)
+    # Hai chỉ số cùng nhóm gần trùng nhau để có cụm ở ngưỡng cao
+    df['STD_RTD82'] = df['STD_RTD8'] * 2 + np.random.default_rng(0).normal(scale=0.1, size=len(df))
+    analyzer = CorrelationAnalyzer()
+    thresholds = [0.1, 0.5, 0.9]
+    sweep = analyzer.weights_for_thresholds(df, FIELD_MAPPING, thresholds)
+
+    matrices = analyzer.cache.group_correlations(df, FIELD_MAPPING)
+    for t in thresholds:
+        assert sweep[t].to_dict() == analyzer.weights_from_correlation(matrices, threshold=t)
+    assert (sweep[0.9] < 1).any()
+    pd.testing.assert_frame_equal(threshold_sweep(matrices, thresholds), sweep)
@@ -0,0 +1,129 @@
+"""
+CorrelationAnalyzer: điểm nhóm từ các cột T-score và trọng số theo tương quan.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.correlation import CorrelationAnalyzer
+from src.core.correlation_cache import CorrelationCache
+from src.core.scoring import FinancialScorer
+from src.core.sketch import RunningCorrelation
+from tests.data import make_population
+
+
+@pytest.fixture(scope='module')
+def population():
+    return make_population(300, seed=8)
+
+
+def test_field_score_uses_tscore_points(population):
+    analyzer = CorrelationAnalyzer(0.9)
+    scored = FinancialScorer().assign_scores_df(population, GOOD_BAD_MAPPING)
+    weights = analyzer.adjust_weights_for_correlation(population, FIELD_MAPPING)
+    result = analyzer.field_score(scored, FIELD_MAPPING, weights)
+
+    for group, fields in FIELD_MAPPING.items():
+        columns = [f"{f}_Tscore" for f in fields if f"{f}_Tscore" in scored.columns]
+        # T1 -> 8 ... T8 -> 1
+        points = scored[columns].apply(lambda s: 9 - s.astype(object).str[1:].astype(float))
+        w = pd.Series({c: weights.get(c, 1.0) for c in columns})
+        expected = (points.fillna(0) * w).sum(axis=1) / (points.notna() * w).sum(axis=1)
+        assert result[f"{group}_Score"].notna().any(), group
+        np.testing.assert_allclose(result[f"{group}_Score"], expected, err_msg=group)
+
+
+def test_field_score_falls_back_to_raw_values(population):
+    result = CorrelationAnalyzer(0.9).field_score(population, FIELD_MAPPING)
+    fields = FIELD_MAPPING['Growth']
+    np.testing.assert_allclose(result['Growth_Score'], population[fields].mean(axis=1))
+
+
+def test_cached_matrix_matches_pandas(population):
+    groups = CorrelationCache().group_correlations(population, FIELD_MAPPING)
+    assert set(groups) == set(FIELD_MAPPING)
+    for group, corr in groups.items():
+        fields = FIELD_MAPPING[group]
+        pd.testing.assert_frame_equal(corr, population[fields].corr(), atol=1e-12, rtol=0)
+
+
+def test_cache_hits_and_invalidation(population):
+    cache = CorrelationCache()
+    fields = FIELD_MAPPING['Liquidity']
+    first = cache.correlation(population, fields)
+    assert cache.correlation(population, fields) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Sửa một giá trị hoặc đổi thứ tự dòng -> fingerprint khác -> tính lại
+    changed = population.copy()
+    changed.loc[changed.index[-1], fields[0]] = 123.0
+    cache.correlation(changed, fields)
+    shuffled = population.copy()
+    shuffled[fields[0]] = shuffled[fields[0]].to_numpy()[::-1]
+    cache.correlation(shuffled, fields)
+    assert cache.misses == 3
+
+
+def test_cache_dir_and_lru(population, tmp_path):
+    fields = FIELD_MAPPING['Growth']
+    CorrelationCache(cache_dir=str(tmp_path)).correlation(population, fields)
+    assert len(list(tmp_path.glob('corr_*.npz'))) == 1
+
+    cache = CorrelationCache(cache_dir=str(tmp_path), max_entries=1)
+    pd.testing.assert_frame_equal(cache.correlation(population, fields), population[fields].corr(), atol=1e-12, rtol=0)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    # max_entries=1: dữ liệu khác đẩy ma trận cũ khỏi bộ nhớ (bỏ cache_dir để thấy phải tính lại)
+    cache.cache_dir = None
+    cache.correlation(population.head(100), fields)
+    cache.correlation(population, fields)
+    assert cache.misses == 2
+
+
+def test_analyzer_computes_once_per_dataset(population):
+    analyzer = CorrelationAnalyzer(0.9)
+    analyzer.analyze_correlation_by_group(population, FIELD_MAPPING, show_plots=False)
+    analyzer.adjust_weights_for_correlation(population, FIELD_MAPPING)
+    assert (analyzer.cache.misses, analyzer.cache.hits) == (1, 1)
+
+
+def merged_statistics(df, n_shards=4, n_chunks=3):
+    shards = []
+    for part in np.array_split(df, n_shards):
+        stats = RunningCorrelation(list(df.columns))
+        for chunk in np.array_split(part, n_chunks):
+            stats.update(chunk)
+        shards.append(stats)
+    for stats in shards[1:]:
+        shards[0].merge(stats)
+    return shards[0]
+
+
+def test_running_correlation_merge_matches_pandas(population):
+    fields = list(dict.fromkeys(f for fields in FIELD_MAPPING.values() for f in fields))
+    df = population[fields]
+    merged = merged_statistics(df)
+    pd.testing.assert_frame_equal(merged.correlation_frame(), df.corr(), atol=1e-12, rtol=0)
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(merged.covariance(), index=fields, columns=fields), df.cov(), atol=1e-12, rtol=1e-9)
+
+    # Dịch một cột đi 1e9 (như tổng tài sản) không làm mất độ chính xác
+    shifted = df.assign(**{fields[0]: df[fields[0]] + 1e9})
+    np.testing.assert_allclose(merged_statistics(shifted).correlation(), merged.correlation(), atol=1e-7)
+
+
+def test_running_correlation_save_and_extend(population, tmp_path):
+    analyzer = CorrelationAnalyzer(0.9)
+    old, new = population.iloc[:200], population.iloc[200:]
+    path = str(tmp_path / "corr_stats.npz")
+    analyzer.correlation_statistics(old, FIELD_MAPPING).save(path)
+
+    statistics = analyzer.correlation_statistics(new, FIELD_MAPPING, RunningCorrelation.load(path))
+    assert analyzer.weights_from_statistics(statistics, FIELD_MAPPING) == \
+        analyzer.adjust_weights_for_correlation(population, FIELD_MAPPING)
+
+    with pytest.raises(ValueError):
+        statistics.merge(RunningCorrelation(['STD_RTD8']))
@@ -0,0 +1,179 @@
+"""
+Trọng số theo ma trận tương quan do client gửi: đọc ma trận, cache hệ số cụm và /process-groups.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.api.scoring_api import FinancialScoringAPI
+from src.config.field_mapping import FIELD_MAPPING
+from src.core.correlation_weights import GroupCorrelationScorer, process_company_scoring
+from tests.data import companies_payload, make_population
+
+LIQUIDITY = FIELD_MAPPING['Liquidity']
+
+
+def liquidity_matrix(pairs=((1, 2, 0.95),)):
+    """Ma trận đơn vị k × k của nhóm Liquidity với các cặp tương quan cho trước."""
+    matrix = np.eye(len(LIQUIDITY))
+    for i, j, value in pairs:
+        matrix[i, j] = matrix[j, i] = value
+    return matrix.tolist()
+
+
+@pytest.fixture
+def scorer():
+    return GroupCorrelationScorer(FIELD_MAPPING, threshold=0.9, default_weights={'STD_RTD92': 2.0})
+
+
+def test_parse_matrix_formats(scorer):
+    fields, values = scorer.parse_matrix('Liquidity', liquidity_matrix())
+    assert fields == LIQUIDITY and values.shape == (6, 6)
+
+    fields, values = scorer.parse_matrix('Liquidity', {'fields': ['STD_RTD93', 'STD_RTD92'], 'matrix': [[1, .5], [.5, 1]]})
+    assert fields == ['STD_RTD93', 'STD_RTD92']
+    np.testing.assert_array_equal(values, [[1, .5], [.5, 1]])
+
+    frame = pd.DataFrame([[1, .5], [.5, 1]], index=LIQUIDITY[:2], columns=LIQUIDITY[:2])
+    assert scorer.parse_matrix('Liquidity', frame)[0] == LIQUIDITY[:2]
+
+
+@pytest.mark.parametrize('group, matrix', [
+    ('Unknown', [[1.0]]),
+    ('Liquidity', {'fields': ['STD_RTD8'], 'matrix': [[1.0]]}),
+    ('Liquidity', {'fields': LIQUIDITY[:2], 'matrix': [[1, 'x'], [0, 1]]}),
+    ('Liquidity', {'fields': LIQUIDITY[:2], 'matrix': [[1, 0, 0], [0, 1, 0]]}),
+])
+def test_parse_matrix_rejects_invalid(scorer, group, matrix):
+    with pytest.raises(ValueError):
+        scorer.parse_matrix(group, matrix)
+
+
+def test_group_factors_are_cached(scorer):
+    matrix = liquidity_matrix([(0, 1, 0.95), (1, 2, -0.93)])
+    factors = scorer.group_factors('Liquidity', matrix)
+    assert factors == pytest.approx({f: 1 / 3 if i < 3 else 1.0 for i, f in enumerate(LIQUIDITY)})
+    assert scorer.group_factors('Liquidity', [row[:] for row in matrix]) is factors
+    assert scorer.cache_info()['hits'] == 1
+
+    # Ngưỡng khác là khóa cache khác
+    assert scorer.group_factors('Liquidity', matrix, threshold=0.94)['STD_RTD118'] == 0.5
+    assert scorer.cache_info() == {'hits': 1, 'misses': 2, 'size': 2, 'max_size': 256}
+
+
+def test_cache_is_bounded():
+    scorer = GroupCorrelationScorer(FIELD_MAPPING, cache_size=1)
+    first = liquidity_matrix()
+    scorer.group_factors('Liquidity', first)
+    scorer.group_factors('Liquidity', liquidity_matrix([(2, 3, 0.99)]))
+    scorer.group_factors('Liquidity', first)
+    assert scorer.cache_info() == {'hits': 0, 'misses': 3, 'size': 1, 'max_size': 1}
+
+
+def test_adjusted_weights(scorer):
+    weights = scorer.adjusted_weights({'Liquidity': liquidity_matrix()}, {'STD_RTD93': 3.0, 'STD_RTD8': 0.5})
+    assert weights['STD_RTD92'] == 1.0      # mặc định 2.0 × 1/2
+    assert weights['STD_RTD93'] == 1.5      # gửi lên 3.0 × 1/2
+    assert weights['STD_RTD94'] == 1.0
+    assert weights['STD_RTD8'] == 0.5       # không nằm trong ma trận nào
+
+
+def test_process_company_scoring():
+    matrices = {'Liquidity': pd.DataFrame(liquidity_matrix(), index=LIQUIDITY, columns=LIQUIDITY)}
+    # STD_RTD92 / STD_RTD93 cùng cụm: mỗi chỉ số trọng số 1/2 -> (8·½ + 8·½ + 1 + 1 + 1 + 1) / 5 = 2.4 điểm -> T7
+    scores = {'Liquidity': {'STD_RTD118': 'T8', 'STD_RTD92': 'T1', 'STD_RTD93': 'T1',
+                            'STD_RTD94': 'T8', 'STD_RTD95': 'T8', 'STD_RTD147': 'T8'}}
+    assert process_company_scoring(matrices, scores, epsilon=0.1) == {'Liquidity': 'T7'}
+    assert process_company_scoring(matrices, {'Liquidity': list(scores['Liquidity'].values())}) == {'Liquidity': 'T7'}
+    assert process_company_scoring({}, {'Growth': {'STD_RTD11': None}}) == {'Growth': None}
+
+
+def test_process_groups_applies_correlation_matrices():
+    api = FinancialScoringAPI()
+    client = api.get_app().test_client()
+    companies = companies_payload(make_population(150, seed=16))
+    matrices = {'Liquidity': liquidity_matrix()}
+    weights = {'STD_RTD93': 3.0}
+
+    response = client.post('/process-groups', json={
+        'weights': weights, 'correlation_matrices': matrices, 'companies': companies})
+    assert response.status_code == 200
+    expected = client.post('/process-groups', json={
+        'weights': api.correlation_scorer.adjusted_weights(matrices, weights), 'companies': companies})
+    assert response.get_json() == expected.get_json()
+
+    client.post('/process-groups', json={'correlation_matrices': matrices, 'companies': companies})
+    assert api.correlation_scorer.cache_info()['misses'] == 1
+
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'scoring_stage_seconds_count{stage="correlation_weights"} 2' in metrics
+
+
+@pytest.mark.parametrize('body', [
+    {'correlation_matrices': {'Unknown': [[1.0]]}},
+    {'correlation_matrices': {'Liquidity': [[1.0, 'x']]}},
+    {'correlation_matrices': [[1.0]]},
+    {'correlation_matrices': {'Liquidity': liquidity_matrix()}, 'correlation_threshold': 'high'},
+])
+def test_process_groups_invalid_matrices_are_400(body):
+    companies = companies_payload(make_population(5, seed=16))
+    response = FinancialScoringAPI().get_app().test_client().post('/process-groups', json={**body, 'companies': companies})
+    assert response.status_code == 400
+
+
+def test_partial_list_is_ignored_with_warning(scorer, caplog):
+    # Ví dụ cũ trong docstring: ma trận con 2 × 2 dạng list cho nhóm 6 chỉ số
+    with caplog.at_level('WARNING', logger='src.core.correlation_weights'):
+        assert scorer.parse_matrix('Liquidity', [[1.0, 0.8], [0.8, 1.0]]) is None
+        assert scorer.group_factors('Liquidity', [[1.0, 0.8], [0.8, 1.0]]) == {}
+    assert "Ignoring correlation matrix 'Liquidity'" in caplog.text
+    assert scorer.adjusted_weights({'Liquidity': [[1.0, 0.99], [0.99, 1.0]]}, {'STD_RTD93': 3.0}) == {'STD_RTD93': 3.0}
+    assert scorer.cache_info()['size'] == 0
+
+
+def test_process_groups_ignores_partial_list():
+    client = FinancialScoringAPI().get_app().test_client()
+    companies = companies_payload(make_population(100, seed=17))
+    legacy = client.post('/process-groups', json={
+        'correlation_matrices': {'Liquidity': [[1.0, 0.8], [0.8, 1.0]]}, 'companies': companies})
+    assert legacy.status_code == 200
+    assert legacy.get_json() == client.post('/process-groups', json={'companies': companies}).get_json()
+
+
+def test_score_frame_matches_score_per_company(scorer):
+    rng = np.random.default_rng(22)
+    labels = np.array(['T1', 'T2', 'T3', 'T4', 'T5', 'T6', 'T7', 'T8', None], dtype=object)
+    fields = [f for f in LIQUIDITY if f != 'STD_RTD147'] + FIELD_MAPPING['Growth']
+    scored_df = pd.DataFrame({f"{f}_Tscore": rng.choice(labels, 200) for f in fields})
+    matrices = {'Liquidity': liquidity_matrix([(0, 1, 0.95), (1, 2, -0.93)])}
+
+    codes = scorer.score_frame(matrices, scored_df)
+    assert set(codes) == set(FIELD_MAPPING)
+    for group, group_fields in FIELD_MAPPING.items():
+        group_fields = [f for f in group_fields if f in fields]
+        if not group_fields:
+            assert not codes[group].any()
+            continue
+        for i in range(len(scored_df)):
+            row = {f: scored_df.at[i, f"{f}_Tscore"] for f in group_fields}
+            expected = scorer.score(matrices, {group: row})[group]
+            assert codes[group][i] == (int(expected[1:]) if expected else 0)
+
+
+def test_process_with_new_algorithm_keeps_group_scores_input():
+    from src.financial_system import FinancialScoringSystem
+
+    result = FinancialScoringSystem().process_with_new_algorithm(make_population(300, seed=22), epsilon=0.1)
+    scored = FinancialScoringSystem().individual_scoring(make_population(300, seed=22))
+
+    # Như trước: mode của cột _Tscore từng chỉ số, mặc định T4
+    expected = {}
+    for group, fields in FIELD_MAPPING.items():
+        expected[group] = {}
+        for field in fields:
+            if f"{field}_Tscore" in scored.columns:
+                mode = scored[f"{field}_Tscore"].mode()
+                expected[group][field] = mode.iloc[0] if not mode.empty else "T4"
+    assert result['group_scores_input'] == expected
+    assert set(result['final_scores_new'].columns) >= {f"{g}_FinalScore" for g in FIELD_MAPPING}
@@ -0,0 +1,108 @@
+"""
+Kiểm tra tải dữ liệu chấm điểm: mã số thuế có số 0 ở đầu phải giữ nguyên qua mọi engine / định dạng
+và tra cứu được trong kho kết quả.
+"""
+
+import pandas as pd
+import pytest
+
+from src.utils.data_processor import DataProcessor, cast_id_columns
+from src.utils.result_store import ResultStore
+
+TAXCODES = ['0000000000', '0106512583', '1234567890', None]
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'taxcode': TAXCODES,
+        'sector_unique_id': ['024', '24', '7', '7'],
+        'yearreport': [2022, 2023, 2023, 2023],
+        'STD_RTD92': [1.5, 2.0, None, 0.5],
+        'unused': ['x', 'y', 'z', 'w'],
+    })
+
+
+@pytest.fixture
+def csv_path(frame, tmp_path):
+    path = tmp_path / "data.csv"
+    frame.to_csv(path, index=False)
+    return path
+
+
+def assert_ids(df):
+    assert df['taxcode'].tolist()[:3] == TAXCODES[:3]
+    assert df['taxcode'].isna().tolist() == [False, False, False, True]
+    assert df['sector_unique_id'].astype(str).tolist() == ['024', '24', '7', '7']
+    assert list(df['yearreport'].astype(str)) == ['2022', '2023', '2023', '2023']
+    assert 'unused' not in df.columns
+
+
+@pytest.mark.parametrize('engine', ['pyarrow', 'c', 'python'])
+def test_csv_engines_keep_leading_zeros(csv_path, engine):
+    if engine == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    assert_ids(DataProcessor.load_scoring_data(csv_path, engine=engine))
+
+
+def test_engines_agree(csv_path):
+    pytest.importorskip('pyarrow')
+    pd.testing.assert_frame_equal(
+        DataProcessor.load_scoring_data(csv_path, engine='pyarrow'),
+        DataProcessor.load_scoring_data(csv_path, engine='c'),
+    )
+
+
+def test_chunks_keep_leading_zeros(csv_path):
+    assert_ids(pd.concat(DataProcessor.iter_chunks(csv_path, chunk_size=2), ignore_index=True))
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.feather'])
+def test_columnar_files_keep_leading_zeros(frame, tmp_path, extension):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / f"data{extension}"
+    stored = frame.astype({'sector_unique_id': str, 'yearreport': str})
+    stored.to_parquet(path) if extension == '.parquet' else stored.to_feather(path)
+    assert_ids(DataProcessor.load_scoring_data(path))
+
+
+def test_result_store_lookup_by_padded_taxcode(csv_path, tmp_path):
+    df = DataProcessor.load_scoring_data(csv_path)
+    with ResultStore(str(tmp_path / "scores.db")) as store:
+        store.write_frame(df[['taxcode', 'yearreport', 'sector_unique_id']])
+        assert store.get('0000000000', 2022)['taxcode'] == '0000000000'
+        assert store.get('0106512583', 2023) is not None
+        assert store.get('106512583', 2023) is None
+
+
+def test_cast_id_columns_matches_loader(csv_path):
+    loaded = DataProcessor.load_scoring_data(csv_path, engine='c')
+    numeric = pd.DataFrame({'taxcode': [106512583, 42], 'yearreport': [2023.0, None], 'sector_unique_id': [24, 7]})
+    cast = cast_id_columns(numeric)
+    assert cast['taxcode'].tolist() == ['106512583', '42']
+    assert cast['yearreport'].iloc[0] == '2023' and pd.isna(cast['yearreport'].iloc[1])
+    # Nối với dữ liệu đã tải không trộn kiểu giá trị (lưu được ra Parquet)
+    combined = pd.concat([loaded[cast.columns], cast])
+    for col in cast.columns:
+        assert {type(v) for v in combined[col].dropna()} == {str}
+
+
+def test_process_file_defaults_to_original_loader(tmp_path, monkeypatch):
+    from src.financial_system import FinancialScoringSystem
+    from tests.data import make_population
+
+    path = tmp_path / "population.csv"
+    make_population(300, seed=16).assign(empl_qtty=50, length_report=12.0).to_csv(path, index=False)
+    default = FinancialScoringSystem().process_file(str(path))
+    fast = FinancialScoringSystem().process_file(str(path), fast=True)
+
+    # Mặc định: kiểu định danh như đọc CSV thông thường
+    expected = DataProcessor.preprocess_columns(pd.read_csv(path))
+    pd.testing.assert_frame_equal(default['original_data'], expected)
+    assert isinstance(fast['original_data']['yearreport'].dtype, pd.CategoricalDtype)
+
+    # Hai đường đọc cho cùng T-score
+    for column in default['final_scores'].columns:
+        if column.endswith('_TScore'):
+            assert default['final_scores'][column].astype(str).tolist() == \
+                fast['final_scores'][column].astype(str).tolist(), column
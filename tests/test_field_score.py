@@ -0,0 +1,101 @@
+"""
+Điểm nhóm thô (field_score) so với vòng lặp pandas gốc theo từng nhóm / từng chỉ số.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.field_score import ScoringPlan, field_score
+from tests.data import FIELDS, make_population
+
+
+def loop_field_score(data_df, group_field_mapping, good_bad_mapping, weights=None):
+    """Cách tính gốc: cộng dồn từng chỉ số bằng Series cho từng nhóm."""
+    info_cols = [c for c in ['taxcode', 'sector_unique_id_raw', 'yearreport'] if c in data_df.columns]
+    result_df = data_df[info_cols].copy()
+    for group, fields in group_field_mapping.items():
+        valid_fields = [f for f in fields if f in data_df.columns]
+        if not valid_fields:
+            result_df[f"{group}_Score"] = np.nan
+            continue
+        weighted_sum = pd.Series(0.0, index=data_df.index)
+        total_abs_weight = pd.Series(0.0, index=data_df.index)
+        for field in valid_fields:
+            w = 1.0 if weights is None else weights.get(field, 1.0)
+            if w == 0:
+                continue
+            values = pd.to_numeric(data_df[field], errors='coerce')
+            s = -1.0 if "low" in good_bad_mapping.get(field, "").lower() else 1.0
+            weighted_sum += (values * w * s).fillna(0)
+            total_abs_weight += (~values.isna()) * np.abs(w)
+        result_df[f"{group}_Score"] = weighted_sum.divide(total_abs_weight).replace([np.inf, -np.inf], np.nan)
+    return result_df
+
+
+@pytest.fixture(scope='module')
+def population():
+    df = make_population(300, seed=2)
+    # Giá trị vô cực và chuỗi không phải số như dữ liệu thô thực tế
+    df.loc[3, 'STD_RTD8'] = np.inf
+    df.loc[4, 'STD_RTD11'] = -np.inf
+    df['STD_RTD9'] = df['STD_RTD9'].astype(object)
+    df.loc[5, 'STD_RTD9'] = "n/a"
+    return df
+
+
+@pytest.fixture(scope='module')
+def weights():
+    rng = np.random.default_rng(3)
+    weights = {f: float(w) for f, w in zip(FIELDS, rng.uniform(-1, 2, size=len(FIELDS)))}
+    weights['STD_RTD13'] = 0.0
+    return weights
+
+
+@pytest.mark.parametrize('use_weights', [False, True])
+def test_matches_loop(population, weights, use_weights):
+    w = weights if use_weights else None
+    expected = loop_field_score(population, FIELD_MAPPING, GOOD_BAD_MAPPING, w)
+    result = field_score(population, FIELD_MAPPING, GOOD_BAD_MAPPING, w)
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12)
+
+
+def test_missing_fields_and_groups(population):
+    mapping = dict(FIELD_MAPPING, Empty=['NOT_A_FIELD'])
+    subset = population.drop(columns=FIELD_MAPPING['Growth'])
+    expected = loop_field_score(subset, mapping, GOOD_BAD_MAPPING)
+    result = field_score(subset, mapping, GOOD_BAD_MAPPING)
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12)
+    assert result['Growth_Score'].isna().all() and result['Empty_Score'].isna().all()
+
+
+def test_plan_matches_loop(population, weights):
+    plan = ScoringPlan.compile(FIELD_MAPPING, GOOD_BAD_MAPPING)
+    expected = loop_field_score(population, FIELD_MAPPING, GOOD_BAD_MAPPING, weights)
+    pd.testing.assert_frame_equal(plan.score(population, weights), expected, check_exact=False, rtol=1e-12)
+
+
+def test_plan_default_weights_overlay(population, weights):
+    defaults = {f: 2.0 for f in FIELDS[::3]}
+    plan = ScoringPlan.compile(FIELD_MAPPING, GOOD_BAD_MAPPING, defaults)
+    request = {f: weights[f] for f in FIELDS[::5]}
+    expected = loop_field_score(population, FIELD_MAPPING, GOOD_BAD_MAPPING, {**defaults, **request})
+    pd.testing.assert_frame_equal(plan.score(population, request), expected, check_exact=False, rtol=1e-12)
+    # Ghi đè trọng số không làm thay đổi ma trận mặc định của plan
+    pd.testing.assert_frame_equal(
+        plan.score(population),
+        loop_field_score(population, FIELD_MAPPING, GOOD_BAD_MAPPING, defaults),
+        check_exact=False, rtol=1e-12,
+    )
+
+
+def test_plan_score_matrix_with_positions(population):
+    plan = ScoringPlan.compile(FIELD_MAPPING, GOOD_BAD_MAPPING)
+    present = [f for f in reversed(plan.fields) if f in population.columns]
+    values = pd.DataFrame({f: pd.to_numeric(population[f], errors='coerce') for f in present}).to_numpy(dtype=float)
+    scores = plan.score_matrix(values, field_positions=[plan.field_index[f] for f in present])
+    expected = loop_field_score(population, FIELD_MAPPING, GOOD_BAD_MAPPING)
+    np.testing.assert_allclose(scores, expected[[f"{g}_Score" for g in plan.groups]].to_numpy(), rtol=1e-12)
@@ -0,0 +1,33 @@
+"""
+Đường phục vụ API không được import các thư viện phân tích nặng (scipy, scikit-learn, matplotlib, seaborn).
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('scipy', 'sklearn', 'matplotlib', 'seaborn')
+
+
+def loaded_modules(statement):
+    code = f"import sys; {statement}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(',') if m]
+
+
+@pytest.mark.parametrize('statement', [
+    "import app",
+    "from src.api.scoring_api import FinancialScoringAPI; FinancialScoringAPI()",
+    "import src.financial_system",
+])
+def test_no_heavy_imports(statement):
+    assert loaded_modules(statement) == []
+
+
+def test_import_time_benchmark_passes():
+    result = subprocess.run([sys.executable, os.path.join("benchmarks", "import_time.py")],
+                            cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
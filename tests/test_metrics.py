@@ -0,0 +1,56 @@
+"""
+Số liệu /metrics (Prometheus) và header Server-Timing.
+"""
+
+from src.api.metrics import ScoringMetrics, server_timing_header
+from src.api.scoring_api import FinancialScoringAPI
+from tests.data import companies_payload, make_population
+
+
+def metric_value(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[-1])
+    raise AssertionError(f"{name} not in /metrics")
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = ScoringMetrics()
+    for n in (1, 3, 3, 700):
+        metrics.observe_batch('x', n)
+    text = metrics.render()
+    assert metric_value(text, 'scoring_batch_size_bucket{endpoint="x",le="1"}') == 1
+    assert metric_value(text, 'scoring_batch_size_bucket{endpoint="x",le="5"}') == 3
+    assert metric_value(text, 'scoring_batch_size_bucket{endpoint="x",le="1000"}') == 4
+    assert metric_value(text, 'scoring_batch_size_bucket{endpoint="x",le="+Inf"}') == 4
+    assert metric_value(text, 'scoring_batch_size_sum{endpoint="x"}') == 707
+    assert metric_value(text, 'scoring_rows_total{endpoint="x"}') == 707
+
+
+def test_metrics_after_requests():
+    client = FinancialScoringAPI().get_app().test_client()
+    companies = companies_payload(make_population(50, seed=9))
+    assert client.post('/process-groups', json={'companies': companies}).status_code == 200
+    assert client.post('/process-groups', json={}).status_code == 400
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert metric_value(text, 'scoring_requests_total{endpoint="process_groups"}') == 1
+    assert metric_value(text, 'scoring_rows_total{endpoint="process_groups"}') == 50
+    assert metric_value(text, 'scoring_errors_total{endpoint="process_groups",kind="invalid_input"}') == 1
+    for stage in ('parse', 'build', 'field_score', 'assign_scores_field', 'serialize'):
+        assert metric_value(text, f'scoring_stage_seconds_count{{stage="{stage}"}}') >= 1
+
+
+def test_server_timing_header():
+    companies = companies_payload(make_population(20, seed=9))
+    response = FinancialScoringAPI().get_app().test_client().post('/process-groups', json={'companies': companies})
+    assert 'Server-Timing' not in response.headers
+
+    client = FinancialScoringAPI(server_timing=True).get_app().test_client()
+    header = client.post('/process-groups', json={'companies': companies}).headers['Server-Timing']
+    stages = [part.split(';')[0] for part in header.split(', ')]
+    assert {'parse', 'build', 'field_score', 'assign_scores_field', 'serialize'} <= set(stages)
+    assert server_timing_header({'parse': 1.23456}) == "parse;dur=1.235"
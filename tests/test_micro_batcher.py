@@ -0,0 +1,79 @@
+"""
+MicroBatcher: các request đồng thời được gom thành lô, mỗi request nhận lại đúng các hàng của nó,
+request có trọng số hoặc context khác nhau được chấm riêng.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.api.micro_batcher import MicroBatcher
+
+
+class SpyScorer:
+    """score_fn giả: trả về tổng mỗi hàng nhân trọng số 'w' (cộng 'offset' của context), ghi lại từng lô đã chấm."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, values, weights=None, context=None):
+        with self.lock:
+            self.calls.append((len(values), weights))
+        w = (weights or {}).get('w', 1.0)
+        return {'total': np.nansum(values, axis=1) * w + (context or {}).get('offset', 0.0)}
+
+
+def test_concurrent_requests_share_batches():
+    spy = SpyScorer()
+    batcher = MicroBatcher(spy, window_ms=50, max_companies=10_000)
+    rng = np.random.default_rng(6)
+    requests = [rng.normal(size=(int(rng.integers(1, 5)), 3)) for _ in range(24)]
+    weights = [None if i % 3 else {'w': 2.0} for i in range(len(requests))]
+
+    barrier = threading.Barrier(len(requests))
+
+    def submit(i):
+        barrier.wait()
+        return batcher.submit(requests[i], weights[i])
+
+    with ThreadPoolExecutor(len(requests)) as pool:
+        results = list(pool.map(submit, range(len(requests))))
+
+    for values, w, result in zip(requests, weights, results):
+        np.testing.assert_allclose(result['total'], values.sum(axis=1) * (w or {}).get('w', 1.0))
+    assert sum(n for n, _ in spy.calls) == sum(len(v) for v in requests)
+    assert len(spy.calls) < len(requests)
+    # Mỗi lô chỉ chứa một bộ trọng số
+    assert {w is None for _, w in spy.calls} == {True, False}
+
+
+def test_errors_reach_every_caller():
+    def failing(values, weights=None, context=None):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(failing, window_ms=1)
+    with pytest.raises(ValueError, match="boom"):
+        batcher.submit(np.zeros((2, 3)))
+
+
+def test_requests_with_different_context_never_share_a_batch():
+    spy = SpyScorer()
+    batcher = MicroBatcher(spy, window_ms=50, max_companies=10_000)
+    # Hai snapshot plan khác nhau (ví dụ trước và sau reload_plan)
+    contexts = [{'offset': 0.0}, {'offset': 100.0}]
+    requests = [np.full((2, 3), float(i)) for i in range(12)]
+    barrier = threading.Barrier(len(requests))
+
+    def submit(i):
+        barrier.wait()
+        return batcher.submit(requests[i], context=contexts[i % 2])
+
+    with ThreadPoolExecutor(len(requests)) as pool:
+        results = list(pool.map(submit, range(len(requests))))
+
+    for i, (values, result) in enumerate(zip(requests, results)):
+        np.testing.assert_allclose(result['total'], values.sum(axis=1) + contexts[i % 2]['offset'])
+    assert len(spy.calls) >= 2
@@ -0,0 +1,45 @@
+"""
+Chấm điểm song song theo khối cột (n_jobs) so với chạy tuần tự và đường pandas.
+"""
+
+import numpy as np
+import pytest
+
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.binning import T_LABELS
+from src.core.parallel import bin_codes
+from src.core.scoring import FinancialScorer
+from tests.data import (
+    INDICATOR_MAPPING, labels, make_indicator_frame, make_population, pandas_partitioned_tscores, pandas_tscores
+)
+
+PARTITION_BY = ['sector_unique_id', 'yearreport']
+
+
+@pytest.fixture(scope='module')
+def data():
+    return make_indicator_frame()
+
+
+@pytest.mark.parametrize('partitioned', [False, True])
+def test_blocks_match_sequential_and_pandas(data, partitioned):
+    values = data[list(INDICATOR_MAPPING)].to_numpy(copy=True)
+    high_good = np.array([d == 'high_good' for d in INDICATOR_MAPPING.values()])
+    levels = FinancialScorer.partition_levels(data, PARTITION_BY) if partitioned else None
+    sequential = bin_codes(values, high_good, levels=levels, n_jobs=1)
+    parallel = bin_codes(values, high_good, levels=levels, n_jobs=2)
+    np.testing.assert_array_equal(parallel, sequential)
+
+    for j, (field, direction) in enumerate(INDICATOR_MAPPING.items()):
+        expected = (pandas_partitioned_tscores(data, field, direction, PARTITION_BY) if partitioned
+                    else pandas_tscores(data, field, direction))
+        assert labels(T_LABELS[parallel[:, j]]) == expected, field
+
+
+def test_assign_scores_df_n_jobs():
+    df = make_population(300, seed=12)
+    sequential = FinancialScorer().assign_scores_df(df, GOOD_BAD_MAPPING)
+    parallel = FinancialScorer(n_jobs=2).assign_scores_df(df, GOOD_BAD_MAPPING)
+    assert list(parallel.columns) == list(sequential.columns)
+    for col in [c for c in sequential.columns if c.endswith('_Tscore')]:
+        assert labels(parallel[col]) == labels(sequential[col]), col
@@ -0,0 +1,92 @@
+"""
+PeerRankIndex: hạng / phân vị cùng ngành-năm so với groupby rank của pandas, cập nhật so với dựng lại.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.api.scoring_api import FinancialScoringAPI
+from src.core.peer_rank import PeerRankIndex
+from src.utils.result_store import ResultStore
+from tests.data import make_indicator_frame
+
+PARTITION_BY = ['sector_unique_id', 'yearreport']
+
+
+@pytest.fixture(scope='module')
+def field_scores():
+    data = make_indicator_frame()
+    return pd.DataFrame({
+        'taxcode': data['taxcode'],
+        'sector_unique_id': data['sector_unique_id'],
+        'yearreport': data['yearreport'],
+        'Liquidity_Score': np.round(data['A'], 1),
+        'Growth_Score': data['C'],
+    })
+
+
+def pandas_ranks(field_scores, column):
+    grouped = field_scores.groupby(PARTITION_BY)[column]
+    rank = grouped.rank(method='min', ascending=False)
+    percentile = 100.0 * (grouped.rank(method='average') - 0.5) / grouped.transform('count')
+    return rank, percentile
+
+
+def assert_ranks_match(index, field_scores):
+    for group in ('Liquidity', 'Growth'):
+        rank, percentile = pandas_ranks(field_scores, f"{group}_Score")
+        for i, row in enumerate(field_scores.itertuples(index=False)):
+            result = index.rank(row.taxcode, row.yearreport, group)['groups'][group]
+            if np.isnan(rank.iloc[i]):
+                assert result is None
+                continue
+            assert result['rank'] == rank.iloc[i]
+            assert result['percentile'] == pytest.approx(percentile.iloc[i])
+
+
+def test_rank_matches_pandas(field_scores):
+    index = PeerRankIndex.from_field_scores(field_scores)
+    assert_ranks_match(index, field_scores)
+    assert index.rank('9999999999', 2022) is None
+
+    partition = field_scores[(field_scores['sector_unique_id'] == 1) & (field_scores['yearreport'] == 2022)]
+    top = index.top(1, 2022, 'Liquidity', k=10)
+    np.testing.assert_array_equal([r['score'] for r in top], partition['Liquidity_Score'].nlargest(10).to_numpy())
+    expected_rank = partition['Liquidity_Score'].rank(method='min', ascending=False)
+    assert [r['rank'] for r in top] == [int(expected_rank[partition['taxcode'] == r['taxcode']].iloc[0]) for r in top]
+
+
+def test_update_matches_rebuild(field_scores):
+    index = PeerRankIndex.from_field_scores(field_scores)
+
+    changed = field_scores.sample(200, random_state=3).copy()
+    changed['Liquidity_Score'] = changed['Liquidity_Score'] + 1.0
+    changed.loc[changed.index[:20], 'sector_unique_id'] = 5
+    index.update(changed)
+
+    rebuilt = pd.concat([field_scores.drop(changed.index), changed])
+    assert len(index) == len(rebuilt)
+    assert_ranks_match(index, rebuilt)
+
+
+def test_api_rebuilds_index_after_store_write(field_scores, tmp_path):
+    path = str(tmp_path / "scores.db")
+    partition = field_scores[(field_scores['sector_unique_id'] == 1) & (field_scores['yearreport'] == 2022)]
+    with ResultStore(path) as writer:
+        writer.write_frame(field_scores)
+        api = FinancialScoringAPI(result_store_path=path)
+        client = api.get_app().test_client()
+        url = '/peers/top?sector_unique_id=1&yearreport=2022&group=Liquidity&k=1'
+        top = client.get(url).get_json()['results'][0]
+        assert top['score'] == partition['Liquidity_Score'].max()
+
+        # Pipeline batch ghi kết quả mới: request sau thấy ngay, không gọi reload
+        leader = partition.head(1).assign(Liquidity_Score=partition['Liquidity_Score'].max() + 10)
+        writer.write_frame(leader)
+        top = client.get(url).get_json()['results'][0]
+        assert (top['taxcode'], top['score']) == (leader['taxcode'].iloc[0], leader['Liquidity_Score'].iloc[0])
+
+        index = api.peer_index
+        client.get(url)
+        assert api.peer_index is index  # không dựng lại khi kho không đổi
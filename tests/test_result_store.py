@@ -0,0 +1,106 @@
+"""
+ResultStore: ghi đè theo khóa (taxcode, yearreport) so với pandas và các endpoint GET /scores.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.api.scoring_api import FinancialScoringAPI
+from src.core.binning import tscore_codes
+from src.utils.result_store import TABLE, ResultStore
+from tests.data import make_indicator_frame
+
+COLUMNS = ['taxcode', 'yearreport', 'sector_unique_id', 'Liquidity_TScore', 'Liquidity_Score']
+
+
+@pytest.fixture(scope='module')
+def data():
+    return make_indicator_frame()
+
+
+def result_frame(data, scores):
+    labels = pd.Series(pd.cut(scores, 8, labels=[f"T{i}" for i in range(8, 0, -1)]), index=data.index)
+    return pd.DataFrame({
+        'taxcode': data['taxcode'],
+        'yearreport': data['yearreport'],
+        'sector_unique_id': data['sector_unique_id'],
+        'Liquidity_TScore': labels,
+        'Liquidity_Score': scores,
+    })
+
+
+def comparable(frame):
+    """Sắp theo khóa, T-score -> mã uint8, điểm -> float để so sánh không phụ thuộc kiểu lưu."""
+    frame = frame.sort_values(['taxcode', 'yearreport']).reset_index(drop=True)
+    return frame.assign(
+        taxcode=frame['taxcode'].astype(str),
+        yearreport=frame['yearreport'].astype('int64'),
+        sector_unique_id=frame['sector_unique_id'].astype('int64'),
+        Liquidity_TScore=tscore_codes(frame['Liquidity_TScore']),
+        Liquidity_Score=frame['Liquidity_Score'].astype(float),
+    )
+
+
+def test_upsert_matches_pandas(data, tmp_path):
+    first = result_frame(data, data['A'])
+    rng = np.random.default_rng(7)
+    changed = data.sample(400, random_state=1)
+    second = result_frame(changed, changed['A'] + rng.normal(size=len(changed)))
+    added = data.head(50).assign(yearreport=2024)
+    second = pd.concat([second, result_frame(added, added['B'])])
+
+    with ResultStore(str(tmp_path / "scores.db")) as store:
+        assert store.write_frame(first) == len(first)
+        store.write_frame(second)
+
+        # Đường pandas: nối rồi giữ bản ghi cuối cùng của mỗi khóa
+        expected = comparable(pd.concat([first, second]).drop_duplicates(['taxcode', 'yearreport'], keep='last'))
+        stored = pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM {TABLE}", store.connection())
+        pd.testing.assert_frame_equal(comparable(stored), expected)
+        assert store.count() == len(expected)
+
+        keys = list(zip(changed['taxcode'], changed['yearreport'])) + [('9999999999', 2021)]
+        records = pd.DataFrame(store.get_many(keys))
+        assert len(records) == len(changed)
+        lookup = expected.merge(records[['taxcode', 'yearreport']], on=['taxcode', 'yearreport'])
+        np.testing.assert_allclose(
+            records.sort_values(['taxcode', 'yearreport'])['Liquidity_Score'].astype(float).to_numpy(),
+            lookup.sort_values(['taxcode', 'yearreport'])['Liquidity_Score'].to_numpy(),
+        )
+
+
+def test_lookup_endpoints(data, tmp_path):
+    path = str(tmp_path / "scores.db")
+    frame = result_frame(data.head(100), data['A'].head(100))
+    with ResultStore(path) as store:
+        store.write_frame(frame)
+
+    client = FinancialScoringAPI(result_store_path=path).get_app().test_client()
+    row = frame.iloc[0]
+    taxcode, year = row['taxcode'], int(row['yearreport'])
+
+    record = client.get(f'/scores/{taxcode}/{year}').get_json()
+    assert record['Liquidity_TScore'] == row['Liquidity_TScore']
+    assert record['Liquidity_Score'] == pytest.approx(row['Liquidity_Score'])
+    assert client.get(f'/scores/{taxcode}/1999').status_code == 404
+    assert len(client.get(f'/scores/{taxcode}').get_json()['results']) == 1
+
+    body = client.get(f'/scores?keys={taxcode}:{year},9999999999:2021').get_json()
+    assert len(body['results']) == 1 and body['missing'] == ['9999999999:2021']
+    assert client.get('/scores?keys=oops').status_code == 400
+    assert FinancialScoringAPI().get_app().test_client().get('/scores?keys=a:1').status_code == 400
+
+
+def test_reader_sees_columns_added_by_writer(data, tmp_path):
+    path = str(tmp_path / "scores.db")
+    frame = result_frame(data.head(20), data['A'].head(20))
+    with ResultStore(path) as writer:
+        writer.write_frame(frame)
+        reader = ResultStore(path, readonly=True)
+        assert 'Growth_Score' not in reader.columns
+
+        writer.write_frame(frame.assign(Growth_Score=1.5))
+        assert 'Growth_Score' in reader.columns
+        assert reader.get(frame['taxcode'].iloc[0], int(frame['yearreport'].iloc[0]))['Growth_Score'] == 1.5
+        reader.close()
@@ -0,0 +1,72 @@
+"""
+ParquetResultWriter: ghi theo khối ra Parquet phân vùng năm / ngành và đọc lại.
+"""
+
+import glob
+import os
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.binning import TSCORE_DTYPE
+from src.core.correlation import CorrelationAnalyzer
+from src.core.scoring import FinancialScorer
+from src.utils.result_writer import ParquetResultWriter, read_results_parquet, write_results_parquet
+from tests.data import labels, make_population
+
+
+@pytest.fixture(scope='module')
+def results():
+    df = make_population(400, seed=14)
+    scorer, analyzer = FinancialScorer(), CorrelationAnalyzer()
+    scored = scorer.assign_scores_df(df, GOOD_BAD_MAPPING)
+    field_scores = analyzer.field_score(scored, FIELD_MAPPING)
+    # Khối đầu không có điểm Growth nào: schema vẫn phải giữ kiểu của các khối sau
+    field_scores.loc[:99, 'Growth_Score'] = np.nan
+    final_scores = scorer.assign_scores_field(field_scores, FIELD_MAPPING)
+    return {'scored_individual': scored, 'field_scores': field_scores, 'final_scores': final_scores}
+
+
+def sorted_frame(df):
+    return df.sort_values('taxcode').reset_index(drop=True)
+
+
+def test_chunks_share_one_schema(results, tmp_path):
+    with ParquetResultWriter(str(tmp_path), row_group_size=50, max_open_files=3) as writer:
+        for start in range(0, 400, 100):
+            writer.write_results({key: frame.iloc[start:start + 100] for key, frame in results.items()})
+
+    assert writer.rows_written == {'final_scores': 400, 'field_scores': 400, 'indicator_tscores': 400}
+    for table in ('final_scores', 'field_scores', 'indicator_tscores'):
+        files = glob.glob(os.path.join(str(tmp_path), table, 'yearreport=*', 'sector_unique_id=*', '*.parquet'))
+        schemas = {str(pq.read_schema(path)) for path in files}
+        assert len(schemas) == 1, table
+        # LRU max_open_files=3 với 8 partition -> có partition phải mở file mới
+        assert len(files) > 8
+
+    schema = pq.read_schema(files[0])
+    assert 'yearreport' not in schema.names and 'sector_unique_id' not in schema.names
+    assert not any(name in schema.names for name in GOOD_BAD_MAPPING)
+
+
+def test_read_back_matches_results(results, tmp_path):
+    write_results_parquet(results, str(tmp_path))
+
+    final = sorted_frame(read_results_parquet(str(tmp_path), 'final_scores'))
+    expected = sorted_frame(results['final_scores'])
+    assert final['taxcode'].tolist() == expected['taxcode'].tolist()
+    assert final['yearreport'].astype(int).tolist() == expected['yearreport'].tolist()
+    for group in FIELD_MAPPING:
+        assert final[f"{group}_TScore"].dtype == TSCORE_DTYPE
+        assert labels(final[f"{group}_TScore"]) == labels(expected[f"{group}_TScore"]), group
+
+    field_scores = sorted_frame(read_results_parquet(str(tmp_path), 'field_scores'))
+    expected = sorted_frame(results['field_scores'])
+    assert field_scores['Liquidity_Score'].dtype == np.float32
+    np.testing.assert_allclose(field_scores['Liquidity_Score'], expected['Liquidity_Score'], rtol=1e-6)
+
+    subset = read_results_parquet(str(tmp_path), 'final_scores', filters=[('yearreport', '=', 2023)])
+    assert len(subset) == (results['final_scores']['yearreport'] == 2023).sum()
@@ -0,0 +1,226 @@
+"""
+API /process-groups: plan biên dịch sẵn, các định dạng request và các cách trả kết quả.
+"""
+
+import copy
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.api.scoring_api import FinancialScoringAPI
+from src.config import field_mapping
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.calibration import Calibration
+from src.core.field_score import assign_scores_field, field_score
+from tests.data import columnar_payload, companies_payload, labels, make_population
+
+
+@pytest.fixture(scope='module')
+def population():
+    return make_population(200, seed=4)
+
+
+@pytest.fixture
+def api():
+    return FinancialScoringAPI()
+
+
+@pytest.fixture(scope='module')
+def calibration_path(population, tmp_path_factory):
+    path = tmp_path_factory.mktemp('calibration') / "calibration.json"
+    Calibration.from_population(population, FIELD_MAPPING, GOOD_BAD_MAPPING).save(str(path))
+    return str(path)
+
+
+def ndjson(companies):
+    return "".join(json.dumps(c) + "\n" for c in companies)
+
+
+def post(client, body, path='/process-groups'):
+    response = client.post(path, json=body)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['results']
+
+
+def expected_labels(df, weights=None):
+    scores = assign_scores_field(field_score(df, FIELD_MAPPING, GOOD_BAD_MAPPING, weights), FIELD_MAPPING)
+    return {group: labels(scores[f"{group}_TScore"]) for group in FIELD_MAPPING}
+
+
+def result_labels(results, groups=FIELD_MAPPING):
+    return {group: labels([r.get(f"{group}_TScore") for r in results]) for group in groups}
+
+
+def test_rows_match_field_score(api, population):
+    weights = {'STD_RTD8': 2.0, 'STD_RTD71': 0.5}
+    results = post(api.get_app().test_client(), {'weights': weights, 'companies': companies_payload(population)})
+    assert [r['taxcode'] for r in results] == population['taxcode'].tolist()
+    assert result_labels(results) == expected_labels(population, weights)
+
+
+def test_reload_plan(api, population, monkeypatch):
+    client = api.get_app().test_client()
+    old_plan = api.plan
+    monkeypatch.setattr(field_mapping, 'FIELD_MAPPING', {'Growth': FIELD_MAPPING['Growth']})
+    plan = api.reload_plan(reload_config=False)
+    assert plan is api.plan and plan is not old_plan
+    assert plan.groups == ['Growth']
+
+    results = post(client, {'companies': companies_payload(population)})
+    assert not any(k.endswith('_TScore') and k != 'Growth_TScore' for k in results[0])
+    assert result_labels(results, ['Growth'])['Growth'] == expected_labels(population)['Growth']
+
+
+def test_columnar_matches_rows(api, population):
+    client = api.get_app().test_client()
+    weights = {'STD_RTD8': 2.0}
+    rows = post(client, {'weights': weights, 'companies': companies_payload(population)})
+
+    response = client.post('/process-groups', json={'weights': weights, **columnar_payload(population)})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['taxcodes'] == population['taxcode'].tolist()
+    for group in FIELD_MAPPING:
+        assert labels(body['scores'][f"{group}_TScore"]) == labels([r[f"{group}_TScore"] for r in rows]), group
+
+
+@pytest.mark.parametrize('indicators', [
+    {'STD_RTD8': [1.0]},
+    {'STD_RTD8': "1.0, 2.0"},
+])
+def test_columnar_bad_shape_is_400(api, indicators):
+    response = api.get_app().test_client().post(
+        '/process-groups', json={'taxcodes': ['a', 'b'], 'indicators': indicators})
+    assert response.status_code == 400
+    assert 'STD_RTD8' in response.get_json()['error']
+
+
+def test_non_numeric_values_are_treated_as_missing(api, population):
+    client = api.get_app().test_client()
+    payload = columnar_payload(population.head(40))
+    payload['indicators']['STD_RTD8'][3] = None
+    bad = copy.deepcopy(payload)
+    bad['indicators']['STD_RTD8'][3] = "abc"
+    response = client.post('/process-groups', json=bad)
+    assert response.status_code == 200
+    assert response.get_json() == client.post('/process-groups', json=payload).get_json()
+
+    companies = companies_payload(population.head(40))
+    bad = copy.deepcopy(companies)
+    indicators = next(iter(bad[3]['scores'].values()))
+    indicators[0]['value'] = "abc"
+    del next(iter(companies[3]['scores'].values()))[0]
+    assert post(client, {'companies': bad}) == post(client, {'companies': companies})
+
+
+def test_stream_matches_process_groups(population, calibration_path):
+    client = FinancialScoringAPI(calibration_path=calibration_path).get_app().test_client()
+    weights = {'STD_RTD8': 2.0}
+    companies = companies_payload(population)
+    expected = post(client, {'weights': weights, 'companies': companies})
+
+    response = client.post(f"/process-groups/stream?chunk_size=37&weights={json.dumps(weights)}",
+                           data=ndjson(companies), content_type='application/x-ndjson')
+    assert response.status_code == 200
+    streamed = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r['taxcode'] for r in streamed] == population['taxcode'].tolist()
+    assert result_labels(streamed) == result_labels(expected)
+
+
+def test_all_paths_return_the_same_record_shape(population, calibration_path):
+    companies = companies_payload(population.head(6))
+    del companies[1]['yearreport']
+    body = {'companies': companies}
+
+    dataframe = post(FinancialScoringAPI().get_app().test_client(), body)
+    calibrated = post(FinancialScoringAPI(calibration_path=calibration_path).get_app().test_client(), body)
+    batched = post(FinancialScoringAPI(calibration_path=calibration_path, micro_batch=True).get_app().test_client(), body)
+    response = FinancialScoringAPI(calibration_path=calibration_path).get_app().test_client().post(
+        '/process-groups/stream', data=ndjson(companies), content_type='application/x-ndjson')
+    streamed = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    keys = {'taxcode', 'sector_unique_id_raw', 'yearreport'} | {f"{g}_TScore" for g in FIELD_MAPPING}
+    for records in (dataframe, calibrated, batched, streamed):
+        assert [set(r) for r in records] == [keys] * len(companies)
+        assert [r['yearreport'] for r in records] == [c.get('yearreport') for c in companies]
+        assert [r['sector_unique_id_raw'] for r in records] == [c['sector_unique_id_raw'] for c in companies]
+    assert calibrated == batched == streamed
+
+
+def test_stream_requires_calibration(api, population):
+    response = api.get_app().test_client().post(
+        '/process-groups/stream', data=ndjson(companies_payload(population.head(2))))
+    assert response.status_code == 400
+
+
+def test_stream_reports_error_in_last_line(population, calibration_path):
+    client = FinancialScoringAPI(calibration_path=calibration_path).get_app().test_client()
+    body = ndjson(companies_payload(population.head(3))) + "{not json\n"
+    lines = client.post('/process-groups/stream?chunk_size=2', data=body).get_data(as_text=True).splitlines()
+    assert [json.loads(line)['taxcode'] for line in lines[:2]] == population['taxcode'].tolist()[:2]
+    assert 'error' in json.loads(lines[-1])
+
+
+def test_micro_batch_requires_calibration():
+    with pytest.raises(ValueError):
+        FinancialScoringAPI(micro_batch=True)
+
+
+def test_micro_batched_requests_match_direct(population, calibration_path):
+    direct = FinancialScoringAPI(calibration_path=calibration_path).get_app().test_client()
+    batched_api = FinancialScoringAPI(calibration_path=calibration_path, micro_batch=True, batch_window_ms=20)
+    companies = companies_payload(population.head(60))
+    bodies = [
+        {'weights': {'STD_RTD8': 2.0} if i % 2 else None, 'companies': companies[i * 5:(i + 1) * 5]}
+        for i in range(12)
+    ]
+    barrier = threading.Barrier(len(bodies))
+
+    def send(body):
+        client = batched_api.get_app().test_client()
+        barrier.wait()
+        return post(client, body)
+
+    with ThreadPoolExecutor(len(bodies)) as pool:
+        batched = list(pool.map(send, bodies))
+
+    for body, results in zip(bodies, batched):
+        expected = post(direct, body)
+        assert [r['taxcode'] for r in results] == [c['taxcode'] for c in body['companies']]
+        assert result_labels(results) == result_labels(expected)
+
+    # Định dạng dạng cột cũng đi qua micro-batcher
+    columnar = batched_api.get_app().test_client().post('/process-groups', json=columnar_payload(population.head(60)))
+    expected = post(direct, {'companies': companies})
+    for group in FIELD_MAPPING:
+        assert labels(columnar.get_json()['scores'][f"{group}_TScore"]) == result_labels(expected)[group]
+
+
+def test_partition_by_bins_each_sector_year(api):
+    df = make_population(300, seed=11)
+    # 3 ngành × 2 năm, 50 công ty mỗi partition (không partition nào phải lùi về cấp cha)
+    df['sector_unique_id_raw'] = [(i % 3 + 1) * 100 for i in range(len(df))]
+    df['yearreport'] = [2022 + (i // 3) % 2 for i in range(len(df))]
+    results = post(api.get_app().test_client(), {
+        'partition_by': ['sector_unique_id_raw', 'yearreport'],
+        'companies': companies_payload(df),
+    })
+    assert all(r['yearreport'] == y for r, y in zip(results, df['yearreport']))
+
+    got = result_labels(results)
+    expected = {group: [None] * len(df) for group in FIELD_MAPPING}
+    for rows in df.groupby(['sector_unique_id_raw', 'yearreport']).indices.values():
+        part = expected_labels(df.iloc[rows])
+        for group in FIELD_MAPPING:
+            for row, label in zip(rows, part[group]):
+                expected[group][row] = label
+    assert got == expected
+
+
+@pytest.mark.parametrize('partition_by', ['yearreport', ['sector_label']])
+def test_partition_by_invalid_is_400(api, population, partition_by):
+    body = {'partition_by': partition_by, 'companies': companies_payload(population.head(5))}
+    assert api.get_app().test_client().post('/process-groups', json=body).status_code == 400
@@ -0,0 +1,93 @@
+"""
+Chế độ chạy server: cấu hình từ biến môi trường / dòng lệnh và các probe liveness / readiness.
+"""
+
+import pandas as pd
+import pytest
+
+import app
+from src.api.scoring_api import FinancialScoringAPI
+from src.api.server import serving_config_from_env
+from src.config.field_mapping import FIELD_MAPPING
+from src.config.good_bad_mapping import GOOD_BAD_MAPPING
+from src.core.calibration import Calibration
+from src.utils.result_store import ResultStore
+from tests.data import make_population
+
+
+@pytest.fixture(scope='module')
+def population_calibration(tmp_path_factory):
+    path = tmp_path_factory.mktemp('calibration') / "calibration.json"
+    Calibration.from_population(make_population(200, seed=7), FIELD_MAPPING, GOOD_BAD_MAPPING).save(str(path))
+    return str(path)
+
+
+def test_config_from_env(monkeypatch):
+    monkeypatch.setenv('SCORING_PORT', '8080')
+    monkeypatch.setenv('SCORING_WORKERS', '3')
+    config = serving_config_from_env()
+    assert config['port'] == 8080 and config['workers'] == 3 and config['host'] == '0.0.0.0'
+
+
+def test_cli_overrides_env(monkeypatch):
+    monkeypatch.setenv('SCORING_PORT', '8080')
+    monkeypatch.setenv('SCORING_SERVER_MODE', 'production')
+    args = app.parse_args(['--port', '9000', '--threads', '2'])
+    assert args.production and args.port == 9000 and args.threads == 2
+    monkeypatch.delenv('SCORING_SERVER_MODE')
+    assert not app.parse_args([]).production and app.parse_args([]).port == 8080
+
+
+def test_health_probes():
+    api = FinancialScoringAPI()
+    client = api.get_app().test_client()
+    assert client.get('/health/live').status_code == 200
+    ready = client.get('/health/ready')
+    assert ready.status_code == 200 and ready.get_json()['status'] == 'ready'
+
+
+def test_not_ready_when_result_store_is_unreadable(tmp_path):
+    path = tmp_path / "scores.db"
+    with ResultStore(str(path)) as store:
+        store.write_frame(pd.DataFrame({
+            'taxcode': ['0100000001'], 'yearreport': [2022], 'sector_unique_id': [1], 'Growth_Score': [1.0]
+        }))
+    client = FinancialScoringAPI(result_store_path=str(path)).get_app().test_client()
+    assert client.get('/health/ready').get_json()['checks'] == {'result_store': True}
+
+    path.write_bytes(b"not a database" * 100)
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.get_json()['checks'] == {'result_store': False}
+    assert client.get('/health/live').status_code == 200
+
+
+def test_not_ready_when_micro_batcher_cannot_start(population_calibration, monkeypatch):
+    api = FinancialScoringAPI(calibration_path=population_calibration, micro_batch=True)
+    client = api.get_app().test_client()
+    assert client.get('/health/ready').status_code == 200
+
+    def cannot_start():
+        raise RuntimeError("can't start new thread")
+
+    monkeypatch.setattr(api.batcher, '_ensure_worker', cannot_start)
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.get_json()['checks'] == {'micro_batcher': False}
+
+
+@pytest.mark.parametrize('mode', ['development', 'production'])
+def test_banner_mentions_mode(capsys, mode):
+    app.print_startup_banner(mode)
+    assert f"({mode})" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('host, port, expected', [
+    ('0.0.0.0', 8080, "http://localhost:8080 (bind 0.0.0.0)"),
+    ('127.0.0.1', 9000, "http://127.0.0.1:9000"),
+])
+def test_banner_shows_bound_address(capsys, host, port, expected):
+    app.print_startup_banner('production', host, port)
+    out = capsys.readouterr().out
+    assert f"Server running at: {expected}\n" in out
+    assert "localhost:5000" not in out
@@ -0,0 +1,42 @@
+"""
+SharedDataset: dữ liệu dùng chung giữa các tiến trình (shared_memory / memmap).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.shared_dataset import SharedDataset
+from tests.data import INDICATOR_MAPPING, make_indicator_frame
+
+
+@pytest.fixture(scope='module')
+def data():
+    return make_indicator_frame(500)
+
+
+@pytest.mark.parametrize('backend', ['shm', 'memmap'])
+def test_round_trip(data, backend, tmp_path):
+    directory = str(tmp_path) if backend == 'memmap' else None
+    with SharedDataset.from_dataframe(data, value_columns=list(INDICATOR_MAPPING), backend=backend,
+                                      directory=directory) as dataset:
+        attached = SharedDataset.attach(dataset.handle)
+        try:
+            assert not attached.values.flags.writeable
+            np.testing.assert_array_equal(attached.values, data[list(INDICATOR_MAPPING)].to_numpy())
+            np.testing.assert_array_equal(attached['taxcode'], data['taxcode'].to_numpy(dtype=str))
+            rebuilt = attached.to_dataframe()
+        finally:
+            attached.close()
+    assert dataset.closed
+    pd.testing.assert_frame_equal(rebuilt[data.columns], data, check_dtype=False)
+    if backend == 'memmap':
+        assert not list(tmp_path.iterdir())
+
+
+def test_attach_after_close_fails(data):
+    dataset = SharedDataset.from_dataframe(data, value_columns=list(INDICATOR_MAPPING))
+    handle = dataset.handle
+    dataset.close()
+    with pytest.raises(FileNotFoundError):
+        SharedDataset.attach(handle)